@@ -0,0 +1,159 @@
+import json
+import time
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from lexical_index import atomic_write
+from scorers import weighted_jaccard
+from tokenizer import tokenize
+
+
+class AnswerCache:
+    """
+    Cache das respostas geradas pelo LLM, consultado antes de chamar o modelo.
+
+    A chave é o modelo, os documentos recuperados para o contexto e a pergunta.
+    Uma pergunta parecida com outra já respondida (mesmo modelo e mesmos documentos
+    no contexto) reaproveita a resposta quando a similaridade entre os termos das
+    duas (Jaccard ponderado, a mesma do JaccardScorer) atinge threshold. Cada
+    entrada guarda o hash do texto do contexto: se os pares de QA usados mudarem, a
+    entrada deixa de valer. Entradas expiram após ttl segundos, as menos usadas
+    saem quando há mais de max_size e, com path, o cache é gravado em disco e
+    recarregado ao iniciar. É seguro para uso concorrente entre as sessões do Streamlit.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = 512, ttl: float = 7 * 24 * 3600.0,
+                 threshold: float = 0.75):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        # (modelo, documentos do contexto, pergunta normalizada) -> entrada
+        self._entries: 'OrderedDict[Tuple[str, Tuple[int, ...], str], Dict[str, Any]]' = OrderedDict()
+        # (modelo, documentos do contexto) -> perguntas em cache com esse contexto
+        self._groups: Dict[Tuple[str, Tuple[int, ...]], Set[str]] = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load()
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    @staticmethod
+    def _digest(context: str) -> str:
+        return hashlib.sha256(context.encode('utf-8')).hexdigest()
+
+    def get(self, model: str, query: str, context_ids: Sequence[int], context: str) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: resposta gerada para a mesma pergunta (ou uma parecida) com o
+            mesmo contexto, ou None
+        """
+        group = (model, tuple(context_ids))
+        normalized = self._normalize(query)
+        digest = self._digest(context)
+        now = time.time()
+        with self._lock:
+            candidates = self._groups.get(group, ())
+            best_key, best_similarity = None, 0.0
+            if normalized in candidates:
+                best_key, best_similarity = group + (normalized,), 1.0
+            elif candidates:
+                terms = Counter(tokenize(query))
+                for candidate in candidates:
+                    similarity = weighted_jaccard(terms, self._entries[group + (candidate,)]['terms'])
+                    if similarity > best_similarity:
+                        best_key, best_similarity = group + (candidate,), similarity
+
+            if best_key is not None and best_similarity >= self.threshold:
+                entry = self._entries[best_key]
+                if entry['context_digest'] == digest and entry['expires_at'] > now:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    return entry['answer']
+                # Contexto alterado (pares de QA editados) ou entrada expirada
+                self._remove(best_key)
+            self.misses += 1
+            return None
+
+    def put(self, model: str, query: str, context_ids: Sequence[int], context: str, answer: str) -> None:
+        if not answer.strip():
+            return
+        key = (model, tuple(context_ids), self._normalize(query))
+        with self._lock:
+            self._entries[key] = {
+                'terms': Counter(tokenize(query)),
+                'answer': answer,
+                'context_digest': self._digest(context),
+                'expires_at': time.time() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            self._groups.setdefault(key[:2], set()).add(key[2])
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+            self._save()
+
+    def _remove(self, key: Tuple[str, Tuple[int, ...], str]) -> None:
+        del self._entries[key]
+        group = self._groups[key[:2]]
+        group.discard(key[2])
+        if not group:
+            del self._groups[key[:2]]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        entries: List[Dict[str, Any]] = [
+            {'model': model, 'context_ids': list(context_ids), 'query': query, **entry}
+            for (model, context_ids, query), entry in self._entries.items()
+        ]
+        try:
+            with atomic_write(self.path) as f:
+                json.dump(entries, f, ensure_ascii=False)
+        except OSError:
+            pass  # O cache em memória continua valendo
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        try:
+            for entry in entries[-self.max_size:]:
+                if entry['expires_at'] <= now:
+                    continue
+                key = (entry['model'], tuple(entry['context_ids']), entry['query'])
+                self._entries[key] = {
+                    'terms': Counter(entry['terms']),
+                    'answer': entry['answer'],
+                    'context_digest': entry['context_digest'],
+                    'expires_at': entry['expires_at'],
+                }
+                self._groups.setdefault(key[:2], set()).add(key[2])
+        except (KeyError, TypeError):
+            # Arquivo em outro formato: começar vazio
+            self._entries.clear()
+            self._groups.clear()
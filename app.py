@@ -4,15 +4,14 @@ os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 os.environ["TORCH_DEVICE"] = "cpu"
 
 import streamlit as st
-import requests
 import json
 import time
-import random
-from langchain_community.llms import Ollama
-from langchain.callbacks.manager import CallbackManager
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from background_animation import add_background_animation
 from rag_manager import RAGManager
+from dense_index import HashingEmbedder
+from ollama_client import OllamaClient, OllamaStream, OllamaUnavailable, build_prompt, context_budget
+from answer_cache import AnswerCache
+from tracing import Tracer
 
 # Configuração da página com tema personalizado (DEVE ser a primeira chamada Streamlit)
 st.set_page_config(
@@ -26,9 +25,23 @@ st.set_page_config(
 add_background_animation(particle_count=10)  # Reduzido para 10 partículas
 
 # Inicializar o RAG Manager com cache otimizado
-@st.cache_resource(ttl=3600)  # Cache por 1 hora
+# Latência por etapa compartilhada entre as sessões, com log JSONL e métricas do Prometheus
+@st.cache_resource
+def get_tracer():
+    return Tracer(trace_file="nabu_traces.jsonl", metrics_file="nabu_metrics.prom")
+
+tracer = get_tracer()
+
+# Busca semântica local com embeddings por hashing (não depende de GPU nem de rede), opcional:
+# os embeddings de todas as perguntas e o k-means são refeitos a cada início e recarga, o que leva
+# segundos em bases grandes (o índice lexical inicia pelo snapshot). Ativar com NABU_DENSE=1
+DENSE_SEARCH = os.environ.get("NABU_DENSE") == "1"
+
+@st.cache_resource
 def get_rag_manager():
-    return RAGManager(max_documents=2)
+    # Edições em qa_pairs.json são recarregadas em segundo plano (só as entradas alteradas)
+    return RAGManager(max_documents=2, embedder=HashingEmbedder() if DENSE_SEARCH else None,
+                      tracer=tracer, watch_interval=2.0)
 
 rag_manager = get_rag_manager()
 
@@ -219,56 +232,27 @@ st.markdown("""
 </script>
 """, unsafe_allow_html=True)
 
-# Função para verificar se o modelo está disponível
-def check_model_availability(model_name):
-    try:
-        response = requests.get(f"http://localhost:11434/api/tags")
-        if response.status_code == 200:
-            models = response.json().get("models", [])
-            return any(model["name"] == model_name for model in models)
-        return False
-    except:
-        return False
-
-# Função para obter lista de modelos disponíveis
-def get_available_models():
-    try:
-        response = requests.get(f"http://localhost:11434/api/tags")
-        if response.status_code == 200:
-            models = response.json().get("models", [])
-            return [model["name"] for model in models]
-        return []
-    except:
-        return []
-
-# Inicialização do modelo Ollama otimizado
-@st.cache_resource(ttl=3600)  # Cache por 1 hora
-def get_ollama_model(model_name="mistral"):
-    try:
-        callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
-        return Ollama(
-            model=model_name,
-            callback_manager=callback_manager,
-            base_url="http://localhost:11434",
-            temperature=0.3,  # Reduzido para respostas mais diretas
-            num_ctx=512,      # Reduzido o contexto para melhor performance
-            num_thread=4,     # Otimizado para 4 threads
-            stop=["\n\n", "Human:", "Assistant:"]  # Adicionado stops para respostas mais curtas
-        )
-    except Exception as e:
-        st.warning(f"Erro ao inicializar o modelo Ollama: {str(e)}")
-        return None
+# Cliente do Ollama compartilhado entre as sessões (conexões reaproveitadas, lista de modelos em cache
+# e modelos pré-carregados mantidos em memória pelo keep_alive)
+@st.cache_resource
+def get_ollama_client():
+    return OllamaClient(tracer=tracer)
+
+ollama_client = get_ollama_client()
 
-# Cache de respostas frequentes
-@st.cache_data(ttl=3600)  # Cache por 1 hora
-def get_cached_response(query):
-    return None  # Implementar cache de respostas frequentes se necessário
+# Respostas geradas pelo modelo, reaproveitadas entre as sessões e entre reinícios
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(path="nabu_answer_cache.json")
+
+answer_cache = get_answer_cache()
 
 # Função principal de chat otimizada
-def chat_with_rag(user_input, model_name="mistral"):
+def chat_with_rag(user_input, model_name="mistral", scorer="jaccard", generate=False, category=None):
     try:
-        # Obter respostas relevantes do RAG
-        rag_results = rag_manager.get_answer(user_input)
+        # Pontuar a pergunta uma única vez para a resposta e para o contexto do LLM
+        result = rag_manager.retrieve(user_input, scorer=scorer, category=category)
+        rag_results = rag_manager.get_answer(user_input, result)
         
         if not rag_results:
             return "Desculpe, não encontrei informações específicas sobre sua pergunta. Pode reformular ou perguntar sobre outro tema?"
@@ -280,28 +264,39 @@ def chat_with_rag(user_input, model_name="mistral"):
         if best_match['similarity'] < 0.2:
             return "Sua pergunta não está muito clara. Pode reformular ou ser mais específico?"
         
+        # Modo de geração: o modelo responde a partir do contexto recuperado, em streaming
+        if generate:
+            # Contexto dentro da janela num_ctx do modelo (orçamento de tokens estimado)
+            context = rag_manager.get_relevant_context(user_input, result.k, result,
+                                                       max_tokens=context_budget(user_input))
+            if context:
+                # Pergunta igual ou parecida já respondida com o mesmo contexto: sem chamar o modelo
+                context_ids = [doc_id for doc_id, _ in result.hits]
+                cached_answer = answer_cache.get(model_name, user_input, context_ids, context)
+                if cached_answer is not None:
+                    return cached_answer
+                try:
+                    return ollama_client.stream(
+                        model_name, build_prompt(user_input, context),
+                        on_complete=lambda answer: answer_cache.put(model_name, user_input, context_ids, context, answer)
+                    )
+                except OllamaUnavailable:
+                    pass  # Circuito aberto: responder direto pelo RAG
+        
         # Retornar a resposta direta do RAG
         return best_match['answer']
     except Exception as e:
         st.error(f"Erro ao processar sua pergunta: {str(e)}")
         return "Desculpe, estou enfrentando dificuldades técnicas. Por favor, tente novamente mais tarde ou reformule sua pergunta."
 
-# Verificar se o Ollama está rodando
-try:
-    response = requests.get("http://localhost:11434/api/tags")
-    if response.status_code == 200:
-        ollama_running = True
-    else:
-        ollama_running = False
-        st.error(f"O servidor Ollama retornou código de status {response.status_code}. Por favor, verifique se o servidor está funcionando corretamente.")
-        st.warning("Continuando sem o Ollama. Algumas funcionalidades podem não estar disponíveis.")
-except Exception as e:
-    ollama_running = False
-    st.error(f"Não foi possível conectar ao servidor Ollama: {str(e)}")
+# Verificar se o Ollama está rodando (sem rede enquanto a lista de modelos estiver em cache)
+available_models = ollama_client.list_models()
+ollama_running = ollama_client.is_available()
+if not ollama_running:
+    st.error(f"Não foi possível conectar ao servidor Ollama: {ollama_client.last_error or 'falhas recentes de conexão'}")
     st.warning("Continuando sem o Ollama. Algumas funcionalidades podem não estar disponíveis.")
 
 # Verificar modelos disponíveis
-available_models = get_available_models()
 if not available_models:
     st.warning("Nenhum modelo encontrado no Ollama. Por favor, baixe um modelo com 'ollama pull mistral' ou outro modelo de sua preferência.")
     available_models = ["mistral"]  # Usar um modelo padrão para continuar
@@ -337,6 +332,48 @@ with col3:
     </div>
     """, unsafe_allow_html=True)
 
+# Estatísticas reais, atualizadas periodicamente sem reexecutar a página
+STAGE_LABELS = {
+    "request": "Requisição", "normalize": "Normalização", "score": "Pontuação",
+    "rank": "Ranqueamento", "llm_first_token": "LLM (1º token)",
+    "llm_first_token_cold": "LLM (1º token, modelo frio)", "llm_first_token_warm": "LLM (1º token, modelo carregado)",
+    "llm_warmup": "Carregamento do modelo", "llm": "LLM", "render": "Renderização",
+}
+
+@st.fragment(run_every=5)
+def show_statistics():
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Mensagens", st.session_state.message_count)
+    with col2:
+        st.metric("Modelo Atual", model_name)
+    
+    # Pré-carregamento do modelo selecionado no Ollama
+    warmup = ollama_client.warmup_status(model_name) if ollama_running else None
+    if warmup is not None:
+        if warmup.state == 'loading':
+            st.caption("⏳ Carregando o modelo no Ollama...")
+        elif warmup.state == 'ready' and ollama_client.is_warm(model_name):
+            load_time = f" em {warmup.load_time:.1f} s" if warmup.load_time is not None else ""
+            st.caption(f"🔥 Modelo carregado{load_time}")
+        elif warmup.state == 'failed':
+            st.caption(f"⚠️ Não foi possível carregar o modelo: {warmup.error}")
+    
+    # Latência por etapa (janela das requisições recentes de todas as sessões)
+    summary = tracer.summary()
+    rows = [f"| {STAGE_LABELS[stage]} | {summary[stage]['p50'] * 1000:.1f} | {summary[stage]['p95'] * 1000:.1f} "
+            f"| {summary[stage]['p99'] * 1000:.1f} |" for stage in STAGE_LABELS if stage in summary]
+    if rows:
+        st.markdown("| Etapa | p50 (ms) | p95 (ms) | p99 (ms) |\n|---|---:|---:|---:|\n" + "\n".join(rows))
+    
+    # Cache de resultados do RAG (compartilhado entre as sessões)
+    cache_stats = rag_manager.result_cache.stats()
+    st.caption(f"Cache de consultas: {cache_stats['hits']} acertos, {cache_stats['misses']} falhas "
+               f"({cache_stats['hit_rate']:.0%})")
+    answer_stats = answer_cache.stats()
+    st.caption(f"Cache de respostas do modelo: {answer_stats['hits']} acertos, {answer_stats['misses']} falhas "
+               f"({answer_stats['hit_rate']:.0%})")
+
 # Seleção de modelo na barra lateral
 with st.sidebar:
     st.markdown("<h2 style='color: #4a6bff;'>⚙️ Configurações</h2>", unsafe_allow_html=True)
@@ -347,18 +384,40 @@ with st.sidebar:
         index=0 if "mistral" in available_models else 0
     )
     
+    # Carregar o modelo no Ollama em segundo plano (no início e a cada troca de modelo),
+    # para que a primeira pergunta não espere o carregamento; sem efeito se já estiver carregado
+    if ollama_running:
+        ollama_client.warm_up(model_name)
+    
+    # Geração de respostas pelo LLM a partir do contexto do RAG
+    generation_mode = st.toggle(
+        "Gerar respostas com o modelo",
+        value=False,
+        disabled=not ollama_running,
+        help="Usa o modelo do Ollama para redigir a resposta a partir das informações encontradas."
+    )
+    
+    # Algoritmo de similaridade usado pelo RAG nesta sessão
+    scorer_name = st.selectbox(
+        "Algoritmo de busca:",
+        list(rag_manager.scorers),
+        format_func=lambda name: rag_manager.scorers[name].label
+    )
+    
+    # Restringir a busca a uma categoria da base (None: todas)
+    category_name = st.selectbox(
+        "Categoria:",
+        [None] + rag_manager.categories(),
+        format_func=lambda category: "Todas" if category is None else category
+    )
+    
     st.markdown("<div class='sidebar-content'>", unsafe_allow_html=True)
     st.markdown("<h3 style='color: #ff6b6b;'>📊 Estatísticas</h3>", unsafe_allow_html=True)
     
-    # Estatísticas simuladas
     if "message_count" not in st.session_state:
         st.session_state.message_count = 0
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric("Mensagens", st.session_state.message_count, delta=random.randint(1, 5))
-    with col2:
-        st.metric("Modelo Atual", model_name)
+    show_statistics()
     
     st.markdown("</div>", unsafe_allow_html=True)
     
@@ -398,6 +457,10 @@ with st.sidebar:
 # Área de chat com animação
 st.markdown("<h2 style='color: #4a6bff;'>💬 Chat com o Nabu</h2>", unsafe_allow_html=True)
 
+# Mensagens exibidas por página do histórico e limite guardado na sessão
+HISTORY_WINDOW = 20
+MAX_STORED_MESSAGES = 500
+
 # Inicializar histórico de mensagens
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -416,36 +479,85 @@ if "messages" not in st.session_state:
     """
     st.session_state.messages.append({"role": "assistant", "content": welcome_message})
 
-# Exibir mensagens anteriores com animação
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-# Input do usuário com estilo personalizado
-if prompt := st.chat_input("Digite sua pergunta aqui..."):
-    # Adicionar mensagem do usuário
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    st.session_state.message_count += 1
-    
-    with st.chat_message("user"):
-        st.markdown(prompt)
-
-    # Gerar resposta
-    with st.chat_message("assistant"):
-        with st.spinner("Pensando..."):
-            try:
-                response = chat_with_rag(prompt, model_name)
-                st.markdown(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                st.session_state.message_count += 1
-            except Exception as e:
-                st.error(f"Desculpe, ocorreu um erro: {str(e)}")
-                st.info("Certifique-se de que o Ollama está rodando localmente na porta 11434.")
+def append_message(role, content):
+    st.session_state.messages.append({"role": role, "content": content})
+    # Limitar a memória da sessão: descartar as mensagens mais antigas
+    if len(st.session_state.messages) > MAX_STORED_MESSAGES:
+        del st.session_state.messages[:-MAX_STORED_MESSAGES]
+
+def show_older_messages():
+    st.session_state.history_pages += 1
+
+# Área de chat isolada em um fragmento: enviar uma mensagem reexecuta apenas este trecho,
+# sem reenviar o cabeçalho, os cards, o CSS e a barra lateral
+@st.fragment
+def chat_area():
+    if "history_pages" not in st.session_state:
+        st.session_state.history_pages = 1
+    
+    # Exibir apenas a janela mais recente do histórico; as anteriores são paginadas sob demanda
+    messages = st.session_state.messages
+    visible = HISTORY_WINDOW * st.session_state.history_pages
+    hidden = max(0, len(messages) - visible)
+    if hidden:
+        st.button(f"⬆️ Mostrar mensagens anteriores ({hidden} ocultas)", on_click=show_older_messages)
+    for message in messages[hidden:]:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+    
+    # Input do usuário com estilo personalizado
+    if prompt := st.chat_input("Digite sua pergunta aqui..."):
+        # Adicionar mensagem do usuário
+        append_message("user", prompt)
+        st.session_state.message_count += 1
+
+        with st.chat_message("user"):
+            st.markdown(prompt)
+
+        # Gerar resposta (cada etapa é registrada no trace da requisição)
+        with tracer.trace("request", scorer=scorer_name, model=model_name, category=category_name,
+                          generate=generation_mode and ollama_running):
+            with st.chat_message("assistant"):
+                with st.spinner("Pensando..."):
+                    response = chat_with_rag(prompt, model_name, scorer_name, generate=generation_mode and ollama_running,
+                                             category=category_name)
+                try:
+                    if isinstance(response, OllamaStream):
+                        try:
+                            # Exibir os tokens à medida que chegam
+                            with tracer.span("llm"):
+                                response_text = st.write_stream(response)
+                            stats = response.stats
+                            if stats.time_to_first_token is not None:
+                                tracer.record("llm_first_token", stats.time_to_first_token)
+                                # Separado por modelo já carregado ou não, para comparar as latências
+                                tracer.record("llm_first_token_warm" if stats.warm else "llm_first_token_cold",
+                                              stats.time_to_first_token)
+                                st.caption(f"⏱️ Primeiro token em {stats.time_to_first_token:.2f} s"
+                                           f"{'' if stats.warm else ' (modelo frio)'} · "
+                                           f"{stats.tokens_per_second:.1f} tokens/s")
+                        except Exception as e:
+                            st.warning(f"Não foi possível gerar a resposta com o modelo: {str(e)}")
+                            response_text = chat_with_rag(prompt, model_name, scorer_name, category=category_name)
+                            with tracer.span("render"):
+                                st.markdown(response_text)
+                    else:
+                        response_text = response
+                        with tracer.span("render"):
+                            st.markdown(response_text)
+                    append_message("assistant", response_text)
+                    st.session_state.message_count += 1
+                except Exception as e:
+                    st.error(f"Desculpe, ocorreu um erro: {str(e)}")
+                    st.info("Certifique-se de que o Ollama está rodando localmente na porta 11434.")
+
+chat_area()
 
 # Adicionar botão para limpar o histórico
 if st.button("Limpar Histórico de Chat"):
     st.session_state.messages = []
     st.session_state.message_count = 0
+    st.session_state.history_pages = 1
     st.rerun()
 
 # Adicionar rodapé
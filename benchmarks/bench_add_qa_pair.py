@@ -0,0 +1,60 @@
+"""
+Mede a vazão de RAGManager.add_qa_pair inserindo entradas uma a uma.
+
+Uso:
+    python -m benchmarks.bench_add_qa_pair --entries 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from rag_manager import RAGManager
+
+WORDS = [
+    'benefícios', 'férias', 'salário', 'plano', 'carreira', 'recrutamento', 'processo',
+    'documento', 'aprovação', 'política', 'home', 'office', 'treinamento', 'gestor',
+    'promoção', 'avaliação', 'desempenho', 'contratação', 'reembolso', 'despesas',
+]
+
+
+def make_question(rng: random.Random) -> str:
+    return "Como funciona " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))) + "?"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_file = os.path.join(tmp, 'qa_pairs.json')
+        manager = RAGManager(qa_file=qa_file)
+
+        start = time.perf_counter()
+        for i in range(args.entries):
+            manager.add_qa_pair(make_question(rng), f"Resposta {i}", 'Recursos Humanos')
+        elapsed = time.perf_counter() - start
+        if manager._compaction_thread is not None:
+            manager._compaction_thread.join()
+
+        print(f"entradas:            {args.entries}")
+        print(f"tempo total:         {elapsed:.2f} s")
+        print(f"vazão:               {args.entries / elapsed:,.0f} inclusões/s")
+        print(f"custo médio:         {elapsed / args.entries * 1e6:.1f} µs/inclusão")
+
+        start = time.perf_counter()
+        manager.compact()
+        print(f"compactação final:   {time.perf_counter() - start:.2f} s")
+
+        start = time.perf_counter()
+        reloaded = RAGManager(qa_file=qa_file)
+        print(f"recarga:             {time.perf_counter() - start:.2f} s "
+              f"({len(reloaded.qa_pairs)} entradas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Teste de estresse das leituras concorrentes com inclusões e recargas (IndexVersion).
+
+Threads de leitura fazem retrieve + get_answer continuamente, primeiro sem
+escritas e depois com threads de escrita chamando add_qa_pair e uma recarga
+(reload) do arquivo principal editado no meio da execução. Cada leitura confere
+a consistência da versão lida: documentos dos resultados dentro da versão,
+respostas iguais às dos documentos da versão, versão nunca anterior à da leitura
+anterior da mesma thread e, a cada check_every leituras, a pontuação refeita
+sobre a mesma versão igual ao resultado. Relata a vazão e a latência p50/p99
+das leituras nas duas fases, as inclusões por segundo e as violações encontradas;
+termina com código 1 se houver alguma violação. A mesma verificação, em uma versão
+curta, roda nos testes (tests/test_concurrency.py).
+
+Uso:
+    python -m benchmarks.bench_concurrency --entries 100000 --readers 4 --writers 1 --output concurrency.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence
+
+from rag_manager import RAGManager
+from scorers import select_top_k
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.bench_scaling import git_commit, percentiles
+
+
+class Reader(threading.Thread):
+    def __init__(self, manager: RAGManager, questions: List[str], scorers: List[str], categories: List[str],
+                 check_every: int, seed: int):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.questions = questions
+        self.scorers = scorers
+        self.categories = categories
+        self.check_every = check_every
+        self.rng = random.Random(seed)
+        self.phase = 'leitura'
+        self.stop = threading.Event()
+        self.latencies: Dict[str, List[float]] = {'leitura': [], 'escrita': []}
+        self.violations: List[str] = []
+
+    def check(self, question: str, result: Any, answers: List[Dict[str, Any]], last_documents: int) -> None:
+        version = result.version
+        n_documents = version.n_documents
+        if len(version.documents) != n_documents:
+            self.violations.append(f"documentos ({len(version.documents)}) != índice ({n_documents})")
+        if n_documents < last_documents:
+            self.violations.append(f"versão anterior à já lida ({n_documents} < {last_documents})")
+        if any(doc_id >= n_documents for doc_id, _ in result.hits):
+            self.violations.append(f"documento fora da versão em {question!r}")
+        expected = [version.documents[doc_id].answer for doc_id, similarity in result.hits[:self.manager.max_documents]
+                    if similarity > 0.1]
+        if expected and [answer['answer'] for answer in answers] != expected:
+            self.violations.append(f"resposta diferente do documento da versão em {question!r}")
+
+    def rescore(self, question: str, result: Any) -> None:
+        # Pontuação refeita sobre a mesma versão (sem cache) deve dar o mesmo top-k
+        version = result.version
+        scorer = version.scorers[result.scorer]
+        query_counts = self.manager._encode_query(question, version)
+        if result.category is None:
+            hits = select_top_k(scorer.score(query_counts, question).items(), result.k)
+        else:
+            index, doc_ids = version.category_index.get(result.category, version.n_documents)
+            hits = [(doc_ids[doc_id], score) for doc_id, score in
+                    select_top_k(scorer.score(query_counts, question, index=index).items(), result.k)]
+        if hits != result.hits:
+            self.violations.append(f"pontuação refeita diferente em {question!r} ({result.scorer})")
+
+    def run(self) -> None:
+        last_documents = 0
+        reads = 0
+        while not self.stop.is_set():
+            question = self.rng.choice(self.questions)
+            scorer = self.rng.choice(self.scorers)
+            category = self.rng.choice(self.categories) if self.categories and self.rng.random() < 0.25 else None
+            phase = self.phase
+            try:
+                start = time.perf_counter()
+                result = self.manager.retrieve(question, scorer=scorer, category=category)
+                answers = self.manager.get_answer(question, result)
+                self.latencies[phase].append(time.perf_counter() - start)
+                self.check(question, result, answers, last_documents)
+                last_documents = result.version.n_documents
+                reads += 1
+                if reads % self.check_every == 0:
+                    self.rescore(question, result)
+            except Exception as e:
+                self.violations.append(f"{type(e).__name__}: {e}")
+
+
+def edit_main_file(qa_file: str, rng: random.Random, edits: int) -> None:
+    # Edição externa do arquivo principal (respostas alteradas), gravada de forma atômica
+    with open(qa_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for qa in rng.sample(data['qa_pairs'], edits):
+        qa['answer'] += ' (revisado)'
+    with open(f"{qa_file}.edit", 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(f"{qa_file}.edit", qa_file)
+
+
+def stress(entries: int = 20_000, readers: int = 4, writers: int = 1, duration: float = 5.0,
+           scorers: Sequence[str] = ('jaccard', 'bm25'), shards: int = 0, cache_size: int = 0,
+           check_every: int = 5, seed: int = 42) -> Dict[str, Any]:
+    """
+    Executa as duas fases (só leituras e leituras com escritas) e retorna as
+    medições e as violações de consistência encontradas (ver Reader.check).
+    """
+    generator = CorpusGenerator(entries, seed)
+    questions = generator.queries(2000)
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_file = os.path.join(tmp, 'qa_pairs.json')
+        generator.write(qa_file)
+        # Sem compactação: as inclusões ficam no journal e sobrevivem à recarga do arquivo editado
+        manager = RAGManager(qa_file=qa_file, cache_size=cache_size, shards=shards,
+                             compact_threshold=10 ** 9)
+        categories = manager.categories()
+        threads = [Reader(manager, questions, list(scorers), categories, check_every, seed + i)
+                   for i in range(readers)]
+        for reader in threads:
+            reader.start()
+        time.sleep(duration)
+
+        # Fase com escritas: inclusões contínuas e uma recarga no meio
+        for reader in threads:
+            reader.phase = 'escrita'
+        stop_writers = threading.Event()
+        added = [0] * writers
+
+        def write(writer: int) -> None:
+            for qa in generator.qa_pairs(10 ** 9, offset=entries + writer * 10 ** 9):
+                if stop_writers.is_set():
+                    break
+                added[writer] += manager.add_qa_pair(qa['question'], qa['answer'], qa['category'])
+
+        writer_threads = [threading.Thread(target=write, args=(writer,), daemon=True) for writer in range(writers)]
+        start = time.perf_counter()
+        for writer in writer_threads:
+            writer.start()
+        time.sleep(duration / 2)
+        edit_main_file(qa_file, rng, 100)
+        reload_start = time.perf_counter()
+        changes = manager.reload()
+        reload_s = time.perf_counter() - reload_start
+        time.sleep(duration / 2)
+        stop_writers.set()
+        for writer in writer_threads:
+            writer.join()
+        write_s = time.perf_counter() - start
+        for reader in threads:
+            reader.stop.set()
+            reader.join()
+        final_documents = len(manager.qa_pairs)
+        manager.close()
+
+    phases = {}
+    for phase in ('leitura', 'escrita'):
+        latencies = [latency for reader in threads for latency in reader.latencies[phase]]
+        phases[phase] = {
+            'reads': len(latencies),
+            'reads_per_s': len(latencies) / duration,
+            **(percentiles(latencies) if latencies else {}),
+            'max_ms': max(latencies) * 1000 if latencies else None,
+        }
+    return {
+        'phases': phases,
+        'adds': sum(added),
+        'adds_per_s': sum(added) / write_s,
+        'reload': {'seconds': reload_s, 'changes': changes},
+        'final_documents': final_documents,
+        'violations': [violation for reader in threads for violation in reader.violations],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=20_000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=5.0, help='segundos de cada fase')
+    parser.add_argument('--scorers', nargs='+', default=['jaccard', 'bm25'])
+    parser.add_argument('--shards', type=int, default=0)
+    parser.add_argument('--cache-size', type=int, default=0)
+    parser.add_argument('--check-every', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='arquivo JSON com o relatório (opcional)')
+    args = parser.parse_args()
+
+    result = stress(args.entries, args.readers, args.writers, args.duration, args.scorers, args.shards,
+                    args.cache_size, args.check_every, args.seed)
+    violations = result['violations']
+    phases = result['phases']
+    print(f"{args.entries} entradas, {args.readers} leitores, {args.writers} escritores, {args.shards} shards")
+    print(f"{'fase':>10}{'leituras/s':>13}{'p50 (ms)':>11}{'p99 (ms)':>11}{'máx (ms)':>11}")
+    for phase, entry in phases.items():
+        print(f"{phase:>10}{entry['reads_per_s']:>13.0f}{entry['p50_ms']:>11.2f}{entry['p99_ms']:>11.2f}"
+              f"{entry['max_ms']:>11.1f}")
+    print(f"inclusões: {result['adds']} ({result['adds_per_s']:.0f}/s); "
+          f"recarga em {result['reload']['seconds']:.2f} s: {result['reload']['changes']}")
+    print(f"violações de consistência: {len(violations)}")
+    for violation in violations[:5]:
+        print(f"  {violation}")
+
+    if args.output:
+        report = {
+            'benchmark': 'bench_concurrency',
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'parameters': {'entries': args.entries, 'readers': args.readers, 'writers': args.writers,
+                           'duration': args.duration, 'scorers': args.scorers, 'shards': args.shards,
+                           'cache_size': args.cache_size, 'seed': args.seed},
+            **result,
+            'violations': len(violations),
+            'violation_samples': violations[:20],
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+    if violations:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
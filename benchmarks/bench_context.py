@@ -0,0 +1,139 @@
+"""
+Compara o contexto completo de get_relevant_context com o contexto empacotado no
+orçamento de tokens (max_tokens=context_budget(pergunta)).
+
+Para cada quantidade de documentos no contexto: tokens estimados do prompt
+(média/p95), redução, prompts que passam de num_ctx e tempo de empacotamento. As
+respostas da base sintética ganham extra_sentences frases de procedimento, como
+as respostas longas de uma base real. Com --ollama-url e --model, cada prompt
+também é enviado ao Ollama (num_predict=1) para medir os tokens de prompt
+avaliados pelo modelo e o tempo até o primeiro token.
+
+Uso:
+    python -m benchmarks.bench_context --entries 10000 --documents 2 3 5 --output context.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from context_packer import estimate_tokens
+from ollama_client import DEFAULT_OPTIONS, OllamaClient, build_prompt, context_budget
+from rag_manager import RAGManager
+from benchmarks.corpus import ANSWER_STEPS, CorpusGenerator
+from benchmarks.bench_scaling import git_commit, percentiles
+
+
+def write_corpus(generator: CorpusGenerator, path: str, extra_sentences: int) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"qa_pairs": [\n')
+        for i, qa in enumerate(generator.qa_pairs()):
+            rng = random.Random(f"{generator.seed}:extra:{i}")
+            steps = [step.format(days=rng.choice((2, 5, 10))) for step in rng.sample(ANSWER_STEPS, extra_sentences)]
+            qa['answer'] = ' '.join([qa['answer']] + steps)
+            f.write((',\n' if i else '') + json.dumps(qa, ensure_ascii=False))
+        f.write('\n]}\n')
+
+
+def measure(manager: RAGManager, questions: List[str], documents: int, packed: bool,
+            client: Optional[OllamaClient], model: Optional[str]) -> Dict[str, Any]:
+    tokens = []
+    pack_times = []
+    prompt_tokens = []
+    first_token = []
+    for question in questions:
+        result = manager.retrieve(question, documents)
+        start = time.perf_counter()
+        if packed:
+            context = manager.get_relevant_context(question, documents, result, max_tokens=context_budget(question))
+        else:
+            context = manager.get_relevant_context(question, documents, result)
+        pack_times.append(time.perf_counter() - start)
+        prompt = build_prompt(question, context)
+        tokens.append(estimate_tokens(prompt))
+
+        if client is not None:
+            stream = client.stream(model, prompt, {**DEFAULT_OPTIONS, 'num_predict': 1})
+            for _ in stream:
+                pass
+            prompt_tokens.append(stream.stats.prompt_tokens)
+            if stream.stats.time_to_first_token is not None:
+                first_token.append(stream.stats.time_to_first_token)
+
+    tokens.sort()
+    entry = {
+        'prompt_tokens_mean': statistics.fmean(tokens),
+        'prompt_tokens_p95': tokens[min(len(tokens) - 1, int(len(tokens) * 0.95))],
+        'over_num_ctx': sum(count > DEFAULT_OPTIONS['num_ctx'] for count in tokens),
+        'context_ms_p50': percentiles(pack_times)['p50_ms'],
+    }
+    if client is not None:
+        entry['ollama_prompt_tokens_mean'] = statistics.fmean(prompt_tokens) if prompt_tokens else None
+        entry['ollama_first_token'] = percentiles(first_token) if first_token else None
+    return entry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=10_000)
+    parser.add_argument('--documents', type=int, nargs='+', default=[2, 3, 5])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--extra-sentences', type=int, default=3, choices=range(len(ANSWER_STEPS) + 1))
+    parser.add_argument('--ollama-url', default=None)
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_context.json')
+    args = parser.parse_args()
+    if args.ollama_url and not args.model:
+        parser.error('--ollama-url requer --model')
+
+    generator = CorpusGenerator(args.entries, args.seed)
+    questions = generator.queries(args.queries)
+    client = OllamaClient(args.ollama_url, generate_timeout=(3.05, 300)) if args.ollama_url else None
+    results = []
+    print(f"{args.entries} entradas, {args.queries} consultas, num_ctx={DEFAULT_OPTIONS['num_ctx']}")
+    print(f"{'docs':>5}{'tokens completo (média/p95)':>30}{'empacotado (média/p95)':>25}"
+          f"{'redução':>10}{'> num_ctx':>12}{'empacotar p50 (ms)':>20}")
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_file = os.path.join(tmp, 'qa_pairs.json')
+        write_corpus(generator, qa_file, args.extra_sentences)
+        manager = RAGManager(qa_file=qa_file)
+        for documents in args.documents:
+            full = measure(manager, questions, documents, False, client, args.model)
+            packed = measure(manager, questions, documents, True, client, args.model)
+            reduction = 1 - packed['prompt_tokens_mean'] / full['prompt_tokens_mean']
+            results.append({'documents': documents, 'full': full, 'packed': packed, 'reduction': reduction})
+            print(f"{documents:>5}{full['prompt_tokens_mean']:>22.0f}/{full['prompt_tokens_p95']:<7}"
+                  f"{packed['prompt_tokens_mean']:>17.0f}/{packed['prompt_tokens_p95']:<7}"
+                  f"{reduction:>10.0%}{full['over_num_ctx']:>6} -> {packed['over_num_ctx']:<3}"
+                  f"{packed['context_ms_p50']:>18.3f}")
+            if client is not None and full['ollama_first_token'] and packed['ollama_first_token']:
+                print(f"{'':>5}Ollama: {full['ollama_prompt_tokens_mean']:.0f} -> "
+                      f"{packed['ollama_prompt_tokens_mean']:.0f} tokens de prompt, primeiro token p50 "
+                      f"{full['ollama_first_token']['p50_ms']:.0f} -> {packed['ollama_first_token']['p50_ms']:.0f} ms")
+        manager.close()
+
+    report = {
+        'benchmark': 'bench_context',
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parameters': {'entries': args.entries, 'queries': args.queries, 'extra_sentences': args.extra_sentences,
+                       'model': args.model, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
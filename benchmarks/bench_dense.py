@@ -0,0 +1,67 @@
+"""
+Mede construção, latência e recall do índice ANN (IVF + int8) da busca densa.
+
+Os vetores são sintéticos (agrupados em torno de centros aleatórios) para isolar o
+custo do índice do custo do embedder.
+
+Uso:
+    python -m benchmarks.bench_dense --entries 1000000 --queries 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from dense_index import IVFIndex
+
+
+def clustered_vectors(rng: np.random.Generator, n: int, dim: int, centers: np.ndarray,
+                      noise: float, chunk_size: int = 100_000) -> np.ndarray:
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk_size):
+        size = min(chunk_size, n - start)
+        chunk = centers[rng.integers(0, len(centers), size)] + noise * rng.standard_normal((size, dim), dtype=np.float32)
+        vectors[start:start + size] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return vectors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--n-probe', type=int, default=8)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.entries // 100 + 1, args.dim), dtype=np.float32)
+    vectors = clustered_vectors(rng, args.entries, args.dim, centers, noise=0.3)
+    queries = clustered_vectors(rng, args.queries, args.dim, centers, noise=0.3)
+
+    index = IVFIndex(args.dim, n_probe=args.n_probe)
+    start = time.perf_counter()
+    index.build(vectors)
+    build = time.perf_counter() - start
+    codes_mb = index._lists[1].nbytes / 2 ** 20
+
+    latencies, recall = [], 0.0
+    for query in queries:
+        start = time.perf_counter()
+        ids, _ = index.search(query, args.k)
+        latencies.append(time.perf_counter() - start)
+        exact = np.argpartition(-(vectors @ query), args.k - 1)[:args.k]
+        recall += len(set(ids.tolist()) & set(exact.tolist())) / args.k
+    latencies = np.array(latencies) * 1000
+
+    print(f"vetores:        {args.entries} x {args.dim}")
+    print(f"listas (IVF):   {len(index.centroids)}, n_probe={args.n_probe}")
+    print(f"construção:     {build:.1f} s")
+    print(f"memória int8:   {codes_mb:.0f} MB (float32: {vectors.nbytes / 2 ** 20:.0f} MB)")
+    print(f"latência:       p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms")
+    print(f"recall@{args.k}:      {recall / len(queries):.3f}")
+
+
+if __name__ == '__main__':
+    main()
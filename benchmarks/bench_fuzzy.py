@@ -0,0 +1,170 @@
+"""
+Mede a tolerância a erros de digitação (FuzzyTermIndex) por tamanho de base.
+
+Para cada tamanho: perguntas de consulta com um erro de digitação em uma palavra
+(letra removida, trocada, incluída ou duas letras vizinhas invertidas), a fração
+em que o primeiro resultado é o mesmo da pergunta sem erro (com e sem a correção)
+e a latência p50/p99 da correção de um termo desconhecido, comparada com a
+distância de edição contra o vocabulário inteiro.
+
+Uso:
+    python -m benchmarks.bench_fuzzy --sizes 10000 100000 1000000 --output fuzzy.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rag_manager import RAGManager
+from fuzzy_index import MAX_TERM_LENGTH, edit_distances
+from tokenizer import normalize_token
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.bench_scaling import git_commit, percentiles
+
+
+def misspell(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word) - 1)
+    letter = rng.choice('abcdefghijlmnopqrstuvxz')
+    return rng.choice([
+        word[:i] + word[i + 1:],
+        word[:i] + letter + word[i + 1:],
+        word[:i] + letter + word[i:],
+        word[:i] + word[i + 1] + word[i] + word[i + 2:],
+    ])
+
+
+def misspell_query(rng: random.Random, query: str, manager: RAGManager) -> Optional[str]:
+    # Um erro em uma palavra que é termo do vocabulário (com 5 letras ou mais)
+    words = query.split()
+    positions = [i for i, word in enumerate(words)
+                 if len(word) >= 5 and word.isalpha() and normalize_token(word.lower()) in manager.index.vocabulary]
+    if not positions:
+        return None
+    i = rng.choice(positions)
+    words[i] = misspell(rng, words[i])
+    if normalize_token(words[i].lower()) in manager.index.vocabulary:
+        return None
+    return ' '.join(words)
+
+
+def brute_force(manager: RAGManager, term: str, chars: np.ndarray, lengths: np.ndarray) -> Optional[int]:
+    max_distance = manager.fuzzy_index.max_distance(term)
+    distances = edit_distances(term, chars, np.minimum(lengths, chars.shape[0]), max_distance)
+    distances[lengths > MAX_TERM_LENGTH] = max_distance + 1
+    best = int(distances.min())
+    if best > max_distance:
+        return None
+    return min(np.flatnonzero(distances == best).tolist(),
+               key=lambda term_id: (-manager.index.document_frequency(term_id), term_id))
+
+
+def measure(entries: int, queries: int, seed: int) -> Dict[str, Any]:
+    generator = CorpusGenerator(entries, seed)
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_file = os.path.join(tmp, 'qa_pairs.json')
+        generator.write(qa_file)
+        manager = RAGManager(qa_file=qa_file, cache_size=0)
+        exact = RAGManager(qa_file=qa_file, cache_size=0, fuzzy=False)
+        fuzzy_index = manager.fuzzy_index
+        start = time.perf_counter()
+        fuzzy_index.correct('inicializar')
+        build = time.perf_counter() - start
+
+        pairs = []
+        for query in generator.queries(queries * 2, seed=1):
+            misspelled = misspell_query(rng, query, manager)
+            if misspelled is not None:
+                pairs.append((query, misspelled))
+            if len(pairs) == queries:
+                break
+        same = {'fuzzy': 0, 'exact': 0}
+        for query, misspelled in pairs:
+            expected = manager.retrieve(query, 1).hits[:1]
+            same['fuzzy'] += manager.retrieve(misspelled, 1).hits[:1] == expected
+            same['exact'] += exact.retrieve(misspelled, 1).hits[:1] == expected
+
+        # Latência por termo desconhecido corrigível (sem o cache de correções)
+        terms = []
+        for _, misspelled in pairs:
+            for word in misspelled.lower().split():
+                term = normalize_token(''.join(filter(str.isalnum, word)))
+                if term is not None and term not in manager.index.vocabulary \
+                        and len(term) >= fuzzy_index.min_length:
+                    terms.append(term)
+        lengths = np.array([len(term) for term in manager.index.terms])
+        width = min(MAX_TERM_LENGTH, int(lengths.max()))
+        chars = np.ascontiguousarray(np.array(manager.index.terms, dtype=f'U{width}').view(np.uint32)
+                                     .reshape(-1, width).T)
+        fuzzy_latencies: List[float] = []
+        brute_latencies: List[float] = []
+        agree = 0
+        for term in terms:
+            fuzzy_index._corrections.clear()
+            start = time.perf_counter()
+            correction = fuzzy_index.correct(term)
+            fuzzy_latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            agree += brute_force(manager, term, chars, lengths) == correction
+            brute_latencies.append(time.perf_counter() - start)
+        manager.close()
+        exact.close()
+
+    return {
+        'entries': entries,
+        'vocabulary': len(lengths),
+        'build_s': build,
+        'queries': len(pairs),
+        'top1_same_fuzzy': same['fuzzy'] / len(pairs),
+        'top1_same_exact': same['exact'] / len(pairs),
+        'terms': len(terms),
+        'same_as_brute_force': agree / len(terms),
+        'correct_p50_ms': percentiles(fuzzy_latencies)['p50_ms'],
+        'correct_p99_ms': percentiles(fuzzy_latencies)['p99_ms'],
+        'brute_force_p50_ms': percentiles(brute_latencies)['p50_ms'],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_fuzzy.json')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'entradas':>10}{'vocabulário':>13}{'top-1 igual (com/sem)':>24}{'= força bruta':>15}"
+          f"{'correção p50/p99 (ms)':>24}{'força bruta p50 (ms)':>22}")
+    for entries in args.sizes:
+        entry = measure(entries, args.queries, args.seed)
+        results.append(entry)
+        print(f"{entries:>10}{entry['vocabulary']:>13}"
+              f"{entry['top1_same_fuzzy']:>15.0%}/{entry['top1_same_exact']:<8.0%}"
+              f"{entry['same_as_brute_force']:>15.0%}"
+              f"{entry['correct_p50_ms']:>15.3f}/{entry['correct_p99_ms']:<8.3f}"
+              f"{entry['brute_force_p50_ms']:>22.2f}")
+
+    report = {
+        'benchmark': 'bench_fuzzy',
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'sizes': args.sizes, 'queries': args.queries, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Mede a memória do RAGManager por tamanho da base.
+
+Para cada tamanho, em processos separados: RSS e pico de RSS da primeira
+inicialização (construção a partir do JSON), RSS de uma nova inicialização (a
+partir do snapshot) e após responder perguntas, além dos bytes por documento.
+Os resultados são gravados em JSON para comparação entre commits.
+
+Uso:
+    python -m benchmarks.bench_memory --sizes 100000 1000000 --output memoria.json
+    python -m benchmarks.bench_memory --sizes 100000 --compare memoria.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from rag_manager import RAGManager
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.bench_scaling import REPO_DIR, compare, git_commit, peak_rss_mb
+
+# Métricas comparadas com --compare (menor é melhor em todas)
+METRICS = ['build_rss_mb', 'build_peak_mb', 'load_rss_mb', 'query_rss_mb', 'bytes_per_document']
+
+
+def current_rss_mb() -> Optional[float]:
+    # RSS atual (não o pico): disponível no Linux via /proc
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def measure(phase: str, qa_file: str, entries: int, queries: int, seed: int) -> Dict[str, Any]:
+    questions = CorpusGenerator(entries, seed).queries(queries) if phase == 'load' else []
+    gc.collect()
+    result: Dict[str, Any] = {'baseline_mb': current_rss_mb()}
+
+    start = time.perf_counter()
+    manager = RAGManager(qa_file=qa_file, cache_size=0)
+    result['init_s'] = time.perf_counter() - start
+    gc.collect()
+    result['rss_mb'] = current_rss_mb()
+
+    # Consultas tocam as listas de postings e os textos das respostas selecionadas
+    for question in questions:
+        manager.get_answer(question)
+        manager.get_relevant_context(question, 2)
+    gc.collect()
+    result['query_rss_mb'] = current_rss_mb()
+    result['peak_rss_mb'] = peak_rss_mb()
+    result['documents'] = len(manager.qa_pairs)
+    return result
+
+
+def run_worker(phase: str, qa_file: str, entries: int, queries: int, seed: int) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_memory', '--worker', phase, '--qa-file', qa_file,
+         '--sizes', str(entries), '--queries', str(queries), '--seed', str(seed)],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_memory.json')
+    parser.add_argument('--compare', help='Arquivo JSON de uma execução anterior')
+    parser.add_argument('--worker', choices=['build', 'load'], help=argparse.SUPPRESS)
+    parser.add_argument('--qa-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(measure(args.worker, args.qa_file, args.sizes[0], args.queries, args.seed)))
+        return
+
+    results = []
+    print(f"{'entradas':>9}{'corpus (MB)':>13}{'build RSS':>11}{'build pico':>12}"
+          f"{'load RSS':>10}{'após queries':>14}{'bytes/doc':>11}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            qa_file = os.path.join(tmp, 'qa_pairs.json')
+            CorpusGenerator(size, args.seed).write(qa_file)
+            corpus_mb = os.path.getsize(qa_file) / 2 ** 20
+            # Primeira inicialização constrói a partir do JSON; a segunda usa o snapshot
+            build = run_worker('build', qa_file, size, args.queries, args.seed)
+            load = run_worker('load', qa_file, size, args.queries, args.seed)
+
+        entry = {
+            'entries': size,
+            'corpus_mb': corpus_mb,
+            'build_s': build['init_s'],
+            'build_rss_mb': build['rss_mb'],
+            'build_peak_mb': build['peak_rss_mb'],
+            'load_s': load['init_s'],
+            'load_rss_mb': load['rss_mb'],
+            'query_rss_mb': load['query_rss_mb'],
+            'bytes_per_document': None,
+        }
+        if build['rss_mb'] is not None:
+            entry['bytes_per_document'] = (build['rss_mb'] - build['baseline_mb']) * 2 ** 20 / size
+        results.append(entry)
+
+        def mb(value: Optional[float]) -> str:
+            return f"{value:.0f}" if value is not None else '-'
+        per_document = f"{entry['bytes_per_document']:.0f}" if entry['bytes_per_document'] is not None else '-'
+        print(f"{size:>9}{corpus_mb:>13.1f}{mb(entry['build_rss_mb']):>11}{mb(entry['build_peak_mb']):>12}"
+              f"{mb(entry['load_rss_mb']):>10}{mb(entry['query_rss_mb']):>14}{per_document:>11}")
+
+    report = {
+        'benchmark': 'bench_memory',
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'queries': args.queries, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados gravados em {args.output}")
+
+    if args.compare:
+        compare(results, args.compare, METRICS)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Mede como o RAGManager escala com o tamanho da base (1 mil a 1 milhão de entradas).
+
+Para cada tamanho, em um processo separado (para isolar o pico de memória):
+construção do índice a partir do JSON, carga a partir do snapshot, pico de RSS,
+latência p50/p99 de get_answer e get_relevant_context e custo de add_qa_pair.
+Os resultados são gravados em JSON para comparação entre commits.
+
+Uso:
+    python -m benchmarks.bench_scaling --sizes 1000 10000 100000 1000000 --output resultados.json
+    python -m benchmarks.bench_scaling --sizes 1000 10000 --compare resultados.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rag_manager import RAGManager
+from benchmarks.corpus import CorpusGenerator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Métricas comparadas com --compare (menor é melhor em todas)
+METRICS = [
+    'build_s', 'snapshot_load_s', 'peak_rss_mb', 'get_answer_p50_ms', 'get_answer_p99_ms',
+    'get_relevant_context_p50_ms', 'get_relevant_context_p99_ms', 'add_qa_pair_us',
+]
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    values = np.array(latencies) * 1000
+    return {'p50_ms': float(np.percentile(values, 50)), 'p99_ms': float(np.percentile(values, 99))}
+
+
+def measure(entries: int, queries: int, adds: int, seed: int) -> Dict[str, Any]:
+    generator = CorpusGenerator(entries, seed)
+    questions = generator.queries(queries)
+    result: Dict[str, Any] = {'entries': entries}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_file = os.path.join(tmp, 'qa_pairs.json')
+        generator.write(qa_file)
+        result['corpus_mb'] = os.path.getsize(qa_file) / 2 ** 20
+
+        # Construção do índice a partir do JSON (sem snapshot; inclui gravar o snapshot)
+        start = time.perf_counter()
+        manager = RAGManager(qa_file=qa_file, cache_size=0)
+        result['build_s'] = time.perf_counter() - start
+        result['terms'] = len(manager.index.terms)
+
+        # Latências sem o cache de resultados, para medir o caminho de pontuação
+        for name, call in (('get_answer', lambda q: manager.get_answer(q)),
+                           ('get_relevant_context', lambda q: manager.get_relevant_context(q, 2))):
+            latencies = []
+            for question in questions:
+                start = time.perf_counter()
+                call(question)
+                latencies.append(time.perf_counter() - start)
+            for key, value in percentiles(latencies).items():
+                result[f"{name}_{key}"] = value
+
+        # Inclusões individuais (journal + índice), aguardando a compactação em segundo plano
+        start = time.perf_counter()
+        for qa in generator.qa_pairs(adds, offset=entries):
+            manager.add_qa_pair(qa['question'], qa['answer'], qa['category'])
+        result['add_qa_pair_us'] = (time.perf_counter() - start) * 1e6 / adds
+        if manager._compaction_thread is not None:
+            manager._compaction_thread.join()
+        result['peak_rss_mb'] = peak_rss_mb()
+
+        # Carga a partir do snapshot (segunda inicialização)
+        del manager
+        start = time.perf_counter()
+        RAGManager(qa_file=qa_file, cache_size=0)
+        result['snapshot_load_s'] = time.perf_counter() - start
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, metrics: List[str] = METRICS) -> None:
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {entry['entries']: entry for entry in baseline['results']}
+    print(f"\nComparação com {baseline_path} (commit {baseline.get('commit')}): atual / anterior")
+    for entry in results:
+        old = previous.get(entry['entries'])
+        if old is None:
+            continue
+        ratios = [f"{metric}={entry[metric] / old[metric]:.2f}x" for metric in metrics
+                  if entry.get(metric) and old.get(metric)]
+        print(f"  {entry['entries']:>9}: " + ', '.join(ratios))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=1_000)
+    parser.add_argument('--adds', type=int, default=1_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_scaling.json')
+    parser.add_argument('--compare', help='Arquivo JSON de uma execução anterior')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(measure(args.worker, args.queries, args.adds, args.seed)))
+        return
+
+    results = []
+    print(f"{'entradas':>9}{'build (s)':>11}{'snapshot (s)':>14}{'RSS (MB)':>10}"
+          f"{'answer p50/p99 (ms)':>22}{'context p50/p99 (ms)':>23}{'add (µs)':>10}")
+    for size in args.sizes:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_scaling', '--worker', str(size), '--queries', str(args.queries),
+             '--adds', str(args.adds), '--seed', str(args.seed)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        entry = json.loads(output.strip().splitlines()[-1])
+        results.append(entry)
+        rss = f"{entry['peak_rss_mb']:.0f}" if entry['peak_rss_mb'] is not None else '-'
+        print(f"{size:>9}{entry['build_s']:>11.2f}{entry['snapshot_load_s']:>14.2f}{rss:>10}"
+              f"{entry['get_answer_p50_ms']:>12.2f}/{entry['get_answer_p99_ms']:<9.2f}"
+              f"{entry['get_relevant_context_p50_ms']:>13.2f}/{entry['get_relevant_context_p99_ms']:<9.2f}"
+              f"{entry['add_qa_pair_us']:>10.0f}")
+
+    report = {
+        'benchmark': 'bench_scaling',
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'queries': args.queries, 'adds': args.adds, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados gravados em {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Compara a latência de consulta dos algoritmos de similaridade (Jaccard x BM25).
+
+Uso:
+    python -m benchmarks.bench_scorers --entries 50000 --queries 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from rag_manager import RAGManager
+from scorers import SCORERS
+from benchmarks.bench_add_qa_pair import make_question
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = RAGManager(qa_file=os.path.join(tmp, 'qa_pairs.json'), cache_size=0)
+        manager.add_qa_pairs({'question': make_question(rng), 'answer': f"Resposta {i}"}
+                             for i in range(args.entries))
+        queries = [make_question(rng) for _ in range(args.queries)]
+
+        print(f"{'algoritmo':<20}{'p50 (ms)':>10}{'p99 (ms)':>10}{'lote (ms/q)':>13}")
+        for name, scorer_class in SCORERS.items():
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                manager.retrieve(query, scorer=name)
+                latencies.append(time.perf_counter() - start)
+            latencies = np.array(latencies) * 1000
+
+            manager.retrieve_batch(queries[:1], scorer=name)  # construir a matriz do lote
+            start = time.perf_counter()
+            manager.retrieve_batch(queries, scorer=name)
+            batch = (time.perf_counter() - start) * 1000 / len(queries)
+
+            print(f"{scorer_class.label:<20}{np.percentile(latencies, 50):>10.2f}"
+                  f"{np.percentile(latencies, 99):>10.2f}{batch:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
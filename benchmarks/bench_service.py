@@ -0,0 +1,121 @@
+"""
+Teste de carga do serviço HTTP (query_service.py): vazão e latência p50/p99 de
+/answer com 1, 16 e 256 clientes concorrentes, com e sem micro-batching.
+
+O serviço roda em um processo separado, sobre um corpus sintético; cada cliente
+mantém uma conexão keep-alive e envia as perguntas em sequência.
+
+Uso:
+    python -m benchmarks.bench_service --entries 50000 --requests 4000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from rag_manager import RAGManager
+from benchmarks.bench_add_qa_pair import make_question
+
+SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'query_service.py')
+
+
+async def client(host: str, port: int, questions: List[str], latencies: List[float]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for question in questions:
+            body = json.dumps({'question': question}).encode('utf-8')
+            start = time.perf_counter()
+            writer.write(b"POST /answer HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, questions: List[str], concurrency: int) -> Tuple[float, np.ndarray]:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, questions[i::concurrency], latencies) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.array(latencies) * 1000
+
+
+async def health(host: str, port: int) -> dict:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /health HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+
+def start_service(qa_file: str, window_ms: float, max_batch: int) -> Tuple[subprocess.Popen, str, int]:
+    process = subprocess.Popen(
+        [sys.executable, SERVICE, '--qa-file', qa_file, '--port', '0',
+         '--window-ms', str(window_ms), '--max-batch', str(max_batch)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    match = re.search(r'http://([\d.]+):(\d+)', process.stdout.readline())
+    if match is None:
+        process.kill()
+        raise RuntimeError('O serviço não iniciou')
+    return process, match.group(1), int(match.group(2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=4_000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 256])
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_file = os.path.join(tmp, 'qa_pairs.json')
+        manager = RAGManager(qa_file=qa_file, cache_size=0)
+        manager.add_qa_pairs({'question': make_question(rng), 'answer': f"Resposta {i}"}
+                             for i in range(args.entries))
+        manager.compact()
+        questions = [make_question(rng) for _ in range(args.requests)]
+
+        print(f"{'modo':<16}{'clientes':>9}{'req/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'lote médio':>12}")
+        for label, window_ms, max_batch in (('sem batching', 0.0, 1), ('micro-batching', args.window_ms, 256)):
+            process, host, port = start_service(qa_file, window_ms, max_batch)
+            try:
+                for concurrency in args.concurrency:
+                    asyncio.run(run_load(host, port, questions[:200], concurrency))  # aquecimento
+                    before = asyncio.run(health(host, port))
+                    throughput, latencies = asyncio.run(run_load(host, port, questions, concurrency))
+                    after = asyncio.run(health(host, port))
+                    batches = after['batches'] - before['batches']
+                    mean_batch = (after['requests'] - before['requests']) / batches if batches else 0.0
+                    print(f"{label:<16}{concurrency:>9}{throughput:>10,.0f}{np.percentile(latencies, 50):>10.2f}"
+                          f"{np.percentile(latencies, 99):>10.2f}{mean_batch:>12.1f}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
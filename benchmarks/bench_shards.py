@@ -0,0 +1,99 @@
+"""
+Compara a recuperação em um único processo com o modo distribuído (RAGManager(shards=N)).
+
+Para cada quantidade de shards: latência p50/p99 de retrieve (sem o cache de
+resultados), tempo de pontuação do shard mais lento por consulta (o caminho
+crítico quando há um núcleo por shard) e conferência de que os resultados são
+idênticos aos do processo único.
+
+Uso:
+    python -m benchmarks.bench_shards --entries 1000000 --shards 1 2 4 8 --output shards.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from rag_manager import RAGManager
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.bench_scaling import git_commit, percentiles
+
+
+def measure(manager: RAGManager, questions: List[str], scorer: str) -> Dict[str, Any]:
+    latencies = []
+    hits = []
+    for question in questions:
+        start = time.perf_counter()
+        hits.append(manager.retrieve(question, 3, scorer).hits)
+        latencies.append(time.perf_counter() - start)
+    return {'latency': percentiles(latencies), 'hits': hits}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--scorer', default='jaccard', choices=['jaccard', 'bm25'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_shards.json')
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(args.entries, args.seed)
+    questions = generator.queries(args.queries)
+    results = []
+    print(f"{os.cpu_count()} CPUs, {args.entries} entradas, {args.queries} consultas ({args.scorer})")
+    print(f"{'shards':>7}{'início (s)':>12}{'retrieve p50/p99 (ms)':>24}{'shard mais lento p50/p99 (ms)':>32}{'idêntico':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        qa_file = os.path.join(tmp, 'qa_pairs.json')
+        generator.write(qa_file)
+        # Primeira inicialização grava o snapshot usado pelos shards
+        reference = measure(RAGManager(qa_file=qa_file, cache_size=0), questions, args.scorer)
+
+        for n_shards in [0] + args.shards:
+            start = time.perf_counter()
+            manager = RAGManager(qa_file=qa_file, cache_size=0, shards=n_shards)
+            startup = time.perf_counter() - start
+            try:
+                run = measure(manager, questions, args.scorer)
+                shard_score = manager.tracer.summary().get('shard_score')
+            finally:
+                manager.close()
+
+            entry = {
+                'shards': n_shards,
+                'startup_s': startup,
+                'retrieve_p50_ms': run['latency']['p50_ms'],
+                'retrieve_p99_ms': run['latency']['p99_ms'],
+                'shard_score_p50_ms': shard_score['p50'] * 1000 if shard_score else None,
+                'shard_score_p99_ms': shard_score['p99'] * 1000 if shard_score else None,
+                'identical': run['hits'] == reference['hits'],
+            }
+            results.append(entry)
+            critical = (f"{entry['shard_score_p50_ms']:.2f}/{entry['shard_score_p99_ms']:.2f}"
+                        if shard_score else '-')
+            print(f"{n_shards:>7}{startup:>12.2f}"
+                  f"{entry['retrieve_p50_ms']:>15.2f}/{entry['retrieve_p99_ms']:<8.2f}"
+                  f"{critical:>32}{'sim' if entry['identical'] else 'NÃO':>10}")
+
+    report = {
+        'benchmark': 'bench_shards',
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parameters': {'entries': args.entries, 'queries': args.queries, 'scorer': args.scorer, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Compara o tempo até o primeiro token com o modelo frio e com o modelo pré-carregado
+(OllamaClient.warm_up).
+
+Em cada rodada o modelo é descarregado (keep_alive=0) e a pergunta seguinte mede o
+caso frio: o carregamento entra no tempo até o primeiro token. Depois o modelo é
+descarregado de novo, aquecido com warm_up (tempo de carregamento em segundo plano)
+e a pergunta seguinte mede o caso aquecido. Funciona com qualquer servidor com a
+API do Ollama, inclusive um servidor simulado local.
+
+Uso:
+    python -m benchmarks.bench_warmup --ollama-url http://localhost:11434 --model mistral --rounds 5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from ollama_client import DEFAULT_OPTIONS, OllamaClient, build_prompt
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.bench_scaling import git_commit
+
+
+def generate(client: OllamaClient, model: str, prompt: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    stream = client.stream(model, prompt, options)
+    for _ in stream:
+        pass
+    stats = stream.stats
+    return {'warm': stats.warm, 'time_to_first_token': stats.time_to_first_token,
+            'total_time': stats.total_time, 'load_time': stats.load_time}
+
+
+def median(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ollama-url', default='http://localhost:11434')
+    parser.add_argument('--model', default='mistral')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--num-predict', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_warmup.json')
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(1000, args.seed)
+    # Mesmas opções no aquecimento e nas gerações: opções diferentes fariam o Ollama recarregar o modelo
+    options = {**DEFAULT_OPTIONS, 'num_predict': args.num_predict}
+    client = OllamaClient(args.ollama_url, generate_timeout=(3.05, 600))
+    rounds = []
+    print(f"{'rodada':>7}{'frio: 1º token (s)':>20}{'aquecimento (s)':>17}{'aquecido: 1º token (s)':>24}")
+    for i in range(args.rounds):
+        qa = generator.qa_pair(i)
+        prompt = build_prompt(qa['question'], f"Pergunta: {qa['question']}\nResposta: {qa['answer']}")
+
+        client.unload(args.model)
+        cold = generate(client, args.model, prompt, options)
+
+        client.unload(args.model)
+        status = client.warm_up(args.model, options, wait=True)
+        if status.state != 'ready':
+            raise SystemExit(f"Falha ao carregar {args.model}: {status.error}")
+        warm = generate(client, args.model, prompt, options)
+
+        rounds.append({'cold': cold, 'warmup_s': status.load_time, 'warm': warm})
+        print(f"{i + 1:>7}{cold['time_to_first_token'] or 0:>20.3f}{status.load_time:>17.3f}"
+              f"{warm['time_to_first_token'] or 0:>24.3f}")
+
+    summary = {
+        'cold_first_token_s': median([entry['cold']['time_to_first_token'] for entry in rounds]),
+        'warm_first_token_s': median([entry['warm']['time_to_first_token'] for entry in rounds]),
+        'warmup_s': median([entry['warmup_s'] for entry in rounds]),
+        'cold_load_time_s': median([entry['cold']['load_time'] for entry in rounds]),
+        'warm_load_time_s': median([entry['warm']['load_time'] for entry in rounds]),
+    }
+    print(f"\nmediana do 1º token: frio {summary['cold_first_token_s']:.3f} s, "
+          f"aquecido {summary['warm_first_token_s']:.3f} s (aquecimento em segundo plano: {summary['warmup_s']:.3f} s)")
+
+    report = {
+        'benchmark': 'bench_warmup',
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parameters': {'ollama_url': args.ollama_url, 'model': args.model, 'rounds': args.rounds,
+                       'num_predict': args.num_predict, 'seed': args.seed},
+        'summary': summary,
+        'rounds': rounds,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Gerador determinístico de bases sintéticas de perguntas e respostas em português.
+
+As perguntas combinam assuntos reais de cada categoria (RH, processos, carreira...)
+com modelos de frase e complementos (público, área, unidade, período). Códigos de
+projetos e sistemas formam uma cauda longa de vocabulário que cresce com a base,
+como acontece com os termos específicos de uma base corporativa real. A escolha dos
+assuntos segue uma distribuição enviesada: poucos assuntos aparecem em muitas
+perguntas e a maioria aparece em poucas.
+
+Uso:
+    python -m benchmarks.corpus --entries 100000 --output qa_pairs_100k.json
+"""
+import argparse
+import json
+import random
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CATEGORIES = {
+    'Recursos Humanos': [
+        'férias', 'benefícios', 'plano de saúde', 'vale refeição', 'home office', 'banco de horas',
+        'licença maternidade', 'licença paternidade', 'reembolso de despesas', 'auxílio educação',
+        'seguro de vida', 'folha de pagamento', 'décimo terceiro', 'horas extras', 'atestado médico',
+        'plano odontológico', 'vale transporte', 'participação nos lucros', 'auxílio creche',
+    ],
+    'Processos Internos': [
+        'solicitação de compras', 'aprovação de orçamento', 'viagens corporativas', 'acesso aos sistemas',
+        'troca de equipamento', 'abertura de chamado', 'cadastro de fornecedores', 'política de segurança',
+        'emissão de notas fiscais', 'controle de ponto', 'aprovação de documentos', 'gestão de contratos',
+        'reserva de salas', 'descarte de documentos', 'prestação de contas',
+    ],
+    'Recrutamento': [
+        'processo seletivo', 'vagas internas', 'indicação de candidatos', 'entrevista técnica',
+        'período de experiência', 'integração de novos colaboradores', 'programa de estágio',
+        'programa de trainee', 'teste de aptidão', 'contratação temporária',
+    ],
+    'Plano de Carreira': [
+        'promoção', 'avaliação de desempenho', 'mentoria', 'progressão salarial',
+        'plano de desenvolvimento individual', 'certificações', 'mudança de área', 'feedback',
+        'trilha de liderança', 'cursos de capacitação',
+    ],
+    'Informativos': [
+        'comunicados internos', 'calendário de feriados', 'eventos da empresa', 'campanhas de vacinação',
+        'resultados trimestrais', 'código de conduta', 'canal de ética', 'programa de voluntariado',
+    ],
+}
+
+QUESTION_TEMPLATES = [
+    'Como funciona {subject}{detail}?',
+    'Qual é o prazo para solicitar {subject}{detail}?',
+    'Quem aprova {subject}{detail}?',
+    'Quais documentos são necessários para {subject}{detail}?',
+    'Onde encontro informações sobre {subject}{detail}?',
+    'Posso pedir {subject}{detail}?',
+    'Qual a política de {subject}{detail}?',
+    'Como solicitar {subject}{detail}?',
+    'O que muda em {subject}{detail}?',
+    'Quais são as regras de {subject}{detail}?',
+]
+
+AUDIENCES = ['colaboradores CLT', 'estagiários', 'terceirizados', 'gestores', 'novos contratados',
+             'colaboradores em home office', 'aprendizes', 'diretores']
+AREAS = ['setor financeiro', 'time de tecnologia', 'departamento jurídico', 'área comercial', 'logística',
+         'marketing', 'operações', 'atendimento', 'controladoria', 'suprimentos']
+CITIES = ['São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Curitiba', 'Porto Alegre', 'Recife',
+          'Salvador', 'Fortaleza', 'Manaus', 'Goiânia', 'Campinas', 'Florianópolis']
+PERIODS = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho', 'agosto', 'setembro',
+           'outubro', 'novembro', 'dezembro', 'fim de ano', 'período de experiência']
+DETAILS = [
+    ' para {audience}', ' no {area}', ' na unidade de {city}', ' em {period}',
+    ' do projeto {code}', ' no sistema {code}',
+]
+
+ANSWER_OPENINGS = [
+    'A solicitação de {subject} deve ser feita pelo portal do colaborador',
+    'O processo de {subject} segue a política vigente',
+    'As regras de {subject} estão descritas no manual interno',
+    'Para {subject}, o primeiro passo é falar com o gestor imediato',
+]
+ANSWER_STEPS = [
+    'O pedido precisa ser aprovado pelo gestor e pelo RH em até {days} dias úteis.',
+    'É necessário anexar os comprovantes e aguardar a validação da área responsável.',
+    'O prazo de resposta é de {days} dias úteis a partir da abertura do chamado.',
+    'Casos excepcionais são avaliados individualmente pelo comitê responsável.',
+    'O acompanhamento pode ser feito pelo número de protocolo gerado na solicitação.',
+]
+ANSWER_CONTACTS = [
+    'Em caso de dúvidas, procure o RH da sua unidade.',
+    'Dúvidas podem ser enviadas ao canal de atendimento interno.',
+    'Mais detalhes estão disponíveis na intranet.',
+]
+
+SYLLABLES = ['ba', 'be', 'ca', 'co', 'da', 'de', 'fa', 'fi', 'ga', 'gu', 'la', 'li', 'ma', 'mo', 'na',
+             'ni', 'pa', 'po', 'ra', 'ri', 'sa', 'so', 'ta', 'te', 'va', 'vi', 'xa', 'za', 'tra', 'pre']
+
+
+def skewed_choice(rng: random.Random, items: Sequence, skew: float = 2.5):
+    # Distribuição enviesada para o início da lista (poucos itens muito frequentes)
+    return items[min(int(len(items) * rng.random() ** skew), len(items) - 1)]
+
+
+class CorpusGenerator:
+    """
+    Gera pares de perguntas e respostas e perguntas de consulta a partir de uma semente.
+
+    A mesma semente e o mesmo tamanho geram sempre a mesma base.
+    """
+
+    def __init__(self, entries: int, seed: int = 42):
+        self.entries = entries
+        self.seed = seed
+        code_rng = random.Random(seed)
+        # Cauda longa de vocabulário: ~1 código de projeto/sistema para cada 20 entradas
+        n_codes = max(100, entries // 20)
+        codes = set()
+        while len(codes) < n_codes:
+            word = ''.join(code_rng.choice(SYLLABLES) for _ in range(code_rng.randint(2, 4)))
+            codes.add(word.capitalize())
+        self.codes = sorted(codes)
+        code_rng.shuffle(self.codes)
+        self.subjects = [(category, subject) for category, subjects in CATEGORIES.items() for subject in subjects]
+        code_rng.shuffle(self.subjects)
+
+    def _detail(self, rng: random.Random) -> str:
+        template = rng.choice(DETAILS)
+        return template.format(audience=rng.choice(AUDIENCES), area=rng.choice(AREAS), city=rng.choice(CITIES),
+                               period=rng.choice(PERIODS), code=skewed_choice(rng, self.codes, 1.5))
+
+    def _details(self, rng: random.Random) -> str:
+        return ''.join(self._detail(rng) for _ in range(rng.choice((0, 1, 1, 2))))
+
+    def _pair_parts(self, position: int) -> Tuple[random.Random, str, str, str, str]:
+        # Cada posição tem seu próprio gerador: a base pode ser gerada por partes e
+        # as consultas podem reconstruir qualquer pergunta sem gerar a base inteira
+        rng = random.Random(f"{self.seed}:{position}")
+        category, subject = skewed_choice(rng, self.subjects)
+        return rng, category, subject, self._details(rng), rng.choice(QUESTION_TEMPLATES)
+
+    def qa_pair(self, position: int) -> Dict[str, str]:
+        rng, category, subject, detail, template = self._pair_parts(position)
+        days = rng.choice((2, 3, 5, 10, 15, 30))
+        answer = ' '.join([
+            rng.choice(ANSWER_OPENINGS).format(subject=subject) + '.',
+            rng.choice(ANSWER_STEPS).format(days=days),
+            rng.choice(ANSWER_CONTACTS),
+        ])
+        return {'question': template.format(subject=subject, detail=detail), 'answer': answer, 'category': category}
+
+    def qa_pairs(self, count: Optional[int] = None, offset: int = 0) -> Iterator[Dict[str, str]]:
+        """
+        Gera count pares (padrão: entries) a partir da posição offset da sequência.
+        """
+        count = self.entries if count is None else count
+        for position in range(offset, offset + count):
+            yield self.qa_pair(position)
+
+    def queries(self, count: int, seed: int = 0) -> List[str]:
+        """
+        Perguntas de consulta: metade reformula uma pergunta existente (mesmo assunto
+        e complementos, outro modelo de frase), metade é inédita.
+        """
+        rng = random.Random(f"{self.seed}:queries:{seed}")
+        queries = []
+        for _ in range(count):
+            if rng.random() < 0.5:
+                _, _, subject, detail, template = self._pair_parts(rng.randrange(self.entries))
+                template = rng.choice([other for other in QUESTION_TEMPLATES if other != template])
+            else:
+                subject = skewed_choice(rng, self.subjects)[1]
+                detail, template = self._details(rng), rng.choice(QUESTION_TEMPLATES)
+            queries.append(template.format(subject=subject, detail=detail))
+        return queries
+
+    def write(self, path: str) -> None:
+        """
+        Grava a base no formato de qa_pairs.json, em streaming.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"qa_pairs": [\n')
+            for i, qa in enumerate(self.qa_pairs()):
+                f.write((',\n' if i else '') + json.dumps(qa, ensure_ascii=False))
+            f.write('\n]}\n')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='qa_pairs_sintetico.json')
+    args = parser.parse_args()
+
+    CorpusGenerator(args.entries, args.seed).write(args.output)
+    print(f"{args.entries} pares gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import bisect
+import threading
+import numpy as np
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from lexical_index import LexicalIndex, select_rows
+from document_store import DocumentStore
+
+
+class CategoryIndex:
+    """
+    Sub-índices por categoria, construídos sob demanda na primeira consulta filtrada.
+
+    Cada sub-índice é um LexicalIndex só com os documentos da categoria (IDs locais,
+    termos com os IDs do índice completo) e o mapeamento local -> global. Consultas
+    filtradas percorrem apenas as postings da categoria; as estatísticas dos scorers
+    (IDF, comprimento médio) continuam sendo as do corpus inteiro, de modo que o
+    resultado é o mesmo da pontuação completa restrita à categoria. Uma inclusão só
+    atualiza o sub-índice da sua categoria (se já construído); leituras de uma versão
+    anterior recebem o sub-índice limitado aos documentos daquela versão.
+    """
+
+    def __init__(self, index: LexicalIndex, documents: DocumentStore):
+        self.index = index
+        self.documents = documents
+        self._subindexes: Dict[str, Tuple[LexicalIndex, array]] = {}
+        self._lock = threading.Lock()
+
+    def categories(self) -> List[str]:
+        return sorted(self.documents.categories)
+
+    def get(self, category: str, n_documents: Optional[int] = None) -> Optional[Tuple[LexicalIndex, array]]:
+        """
+        Args:
+            category (str): Categoria
+            n_documents (Optional[int]): Considerar só os n primeiros documentos globais
+                (snapshot do sub-índice; padrão: todos)
+
+        Returns:
+            Optional[Tuple[LexicalIndex, array]]: sub-índice da categoria e o ID global
+            de cada documento local, ou None se a categoria não existir
+        """
+        subindex = self._subindexes.get(category)
+        if subindex is None and category in self.documents.categories:
+            with self._lock:
+                subindex = self._subindexes.get(category)
+                if subindex is None:
+                    subindex = self._subindexes[category] = self._build(category)
+        if subindex is not None and n_documents is not None:
+            index, doc_ids = subindex
+            # IDs globais crescentes: os documentos locais da versão são um prefixo
+            subindex = index.snapshot(bisect.bisect_left(doc_ids, n_documents)), doc_ids
+        return subindex
+
+    def _build(self, category: str) -> Tuple[LexicalIndex, array]:
+        # Recortar o CSR documento -> termos do índice completo nos documentos da categoria
+        n_documents = self.index.n_documents
+        doc_offsets, doc_terms, doc_counts = self.index.forward_arrays(n_documents)
+        category_ids = self.documents.category_ids(n_documents)
+        doc_ids = np.flatnonzero(category_ids == self.documents.categories.index(category))
+        offsets, terms, counts = select_rows(doc_offsets, doc_terms, doc_counts, doc_ids)
+        subindex = LexicalIndex.from_arrays(offsets, terms, counts, self.index.vocabulary, self.index.terms)
+        return subindex, array('i', doc_ids.astype(np.int32).tobytes())
+
+    def add_document(self, doc_id: int, category: str, term_counts: Dict[int, int]) -> None:
+        # Chamado sob o lock de escrita do RAGManager, depois da inclusão no índice completo
+        with self._lock:
+            subindex = self._subindexes.get(category)
+            if subindex is not None and (not subindex[1] or subindex[1][-1] < doc_id):
+                subindex[0].add_document(term_counts)
+                subindex[1].append(doc_id)
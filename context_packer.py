@@ -0,0 +1,69 @@
+import re
+from typing import List, Sequence, Tuple
+
+from tokenizer import tokenize
+
+# Palavras e sinais de pontuação; palavras longas contam um token a cada 4 caracteres
+_TOKEN_PIECES = re.compile(r'\w+|[^\w\s]')
+# Fim de frase: pontuação final seguida de espaço (ou quebras de linha)
+_SENTENCE_END = re.compile(r'(?<=[.!?;])\s+|\n+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa rápida da quantidade de tokens do texto para modelos com tokenizador
+    BPE/SentencePiece (como os do Ollama), sem carregar o tokenizador. É aditiva:
+    a estimativa de textos unidos por espaços é a soma das partes.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PIECES.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def _sentence_key(sentence: str) -> str:
+    return ' '.join(sentence.lower().split())
+
+
+def pack_context(query: str, passages: Sequence[Tuple[str, str]], max_tokens: int) -> str:
+    """
+    Monta o contexto do LLM com os pares (pergunta, resposta) mais relevantes que
+    cabem em max_tokens (estimados por estimate_tokens).
+
+    Os pares são considerados na ordem recebida (similaridade decrescente). Frases
+    da resposta que já apareceram no contexto são descartadas, e um par cuja resposta
+    já está toda no contexto é pulado. Uma resposta que não cabe no espaço restante é
+    reduzida às frases que mais compartilham termos com a query, na ordem original.
+
+    Returns:
+        str: Blocos "Pergunta: ...\\nResposta: ..." separados por linha em branco
+    """
+    query_terms = set(tokenize(query))
+    seen = set()
+    blocks = []
+    used = 0
+    for question, answer in passages:
+        sentences = [sentence for sentence in split_sentences(answer) if _sentence_key(sentence) not in seen]
+        if not sentences:
+            continue
+        available = max_tokens - used - estimate_tokens(f"Pergunta: {question}\nResposta:")
+        costs = [estimate_tokens(sentence) for sentence in sentences]
+        if sum(costs) > available:
+            # Frases mais relevantes primeiro (termos da query em comum; empate: a mais próxima do início)
+            ranked = sorted(range(len(sentences)),
+                            key=lambda i: (-len(query_terms.intersection(tokenize(sentences[i]))), i))
+            chosen = set()
+            total = 0
+            for i in ranked:
+                if total + costs[i] <= available:
+                    chosen.add(i)
+                    total += costs[i]
+            if not chosen:
+                continue
+            sentences = [sentence for i, sentence in enumerate(sentences) if i in chosen]
+        seen.update(_sentence_key(sentence) for sentence in sentences)
+        block = f"Pergunta: {question}\nResposta: {' '.join(sentences)}"
+        blocks.append(block)
+        used += estimate_tokens(block)
+    return "\n\n".join(blocks)
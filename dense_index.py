@@ -0,0 +1,210 @@
+import re
+import zlib
+import numpy as np
+from typing import Any, List, Tuple, Optional, Dict
+
+
+class Embedder:
+    """
+    Interface dos geradores de embeddings usados na busca densa.
+
+    embed deve retornar vetores float32 normalizados (norma L2 = 1), de modo que o
+    produto escalar seja a similaridade de cosseno.
+    """
+    dim = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Embedder local e determinístico baseado em hashing de atributos.
+
+    Palavras e trigramas de caracteres são mapeados por CRC32 para uma dimensão e
+    um sinal (uma projeção aleatória fixa dos atributos one-hot). Funciona offline,
+    não precisa de treinamento e tolera pequenas variações de grafia.
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 3, ngram_weight: float = 0.5):
+        self.dim = dim
+        self.ngram = ngram
+        self.ngram_weight = ngram_weight
+        self._word_pattern = re.compile(r'\w+')
+        self._feature_cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _word_features(self, word: str) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._feature_cache.get(word)
+        if cached is not None:
+            return cached
+        padded = f"#{word}#"
+        features = [word] + [padded[i:i + self.ngram] for i in range(len(padded) - self.ngram + 1)]
+        weights = [1.0] + [self.ngram_weight] * (len(features) - 1)
+        hashes = np.array([zlib.crc32(feature.encode('utf-8')) for feature in features], dtype=np.uint32)
+        indices = (hashes % self.dim).astype(np.int64)
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32) * np.array(weights, dtype=np.float32)
+        if len(self._feature_cache) < 500_000:
+            self._feature_cache[word] = (indices, signs)
+        return indices, signs
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in self._word_pattern.findall(text.lower()):
+                indices, signs = self._word_features(word)
+                np.add.at(vectors[row], indices, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantização int8 simétrica por vetor: v ~= codes * scale.
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def contains(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """
+    Máscara dos ids presentes em sorted_ids (em ordem crescente), por busca binária.
+    """
+    if not len(sorted_ids):
+        return np.zeros(len(ids), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return sorted_ids[positions] == ids
+
+
+class IVFIndex:
+    """
+    Índice aproximado de vizinhos mais próximos do tipo IVF (inverted file).
+
+    Os vetores são agrupados por k-means esférico em n_lists listas; a busca visita
+    apenas as n_probe listas cujos centróides são mais próximos da query. Os vetores
+    ficam quantizados em int8, contíguos e ordenados por lista. Inclusões vão para um
+    buffer delta (varrido por força bruta) e são incorporadas às listas em lote.
+
+    Listas e buffer delta ficam em uma única tupla, substituída de uma vez na
+    incorporação: uma busca concorrente vê o estado anterior ou o novo, sem
+    documentos faltando ou repetidos.
+    """
+
+    def __init__(self, dim: int, n_lists: Optional[int] = None, n_probe: int = 8,
+                 merge_threshold: int = 4096, seed: int = 0):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.merge_threshold = merge_threshold
+        self.seed = seed
+        # (centróides, códigos int8, escalas, ids, offsets das listas, vetores e ids do delta),
+        # substituídos em conjunto; o delta só recebe inclusões no fim até a próxima substituição
+        self._lists: Tuple[Any, ...] = (
+            np.zeros((1, dim), dtype=np.float32), np.zeros((0, dim), dtype=np.int8), np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.int64), np.zeros(2, dtype=np.int64), [], [])
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        lists = self._lists
+        return len(lists[3]) + len(lists[6])
+
+    @property
+    def centroids(self) -> np.ndarray:
+        return self._lists[0]
+
+    def _train(self, vectors: np.ndarray) -> np.ndarray:
+        n_lists = self.n_lists or int(np.clip(np.sqrt(len(vectors)), 1, 4096))
+        n_lists = max(1, min(n_lists, len(vectors)))
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), 64 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(10):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = sample[assignments == list_id]
+                if len(members):
+                    centroids[list_id] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            np.divide(centroids, norms, out=centroids, where=norms > 0)
+        self._trained_size = len(vectors)
+        return centroids.astype(np.float32)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk_size)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def build(self, vectors: np.ndarray, ids: Optional[np.ndarray] = None) -> None:
+        ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        centroids = self._train(vectors) if len(vectors) else self.centroids
+        self._fill_lists(vectors, ids, centroids)
+
+    def _fill_lists(self, vectors: np.ndarray, ids: np.ndarray, centroids: np.ndarray) -> None:
+        assignments = self._assign(vectors, centroids)
+        order = np.argsort(assignments, kind='stable')
+        codes, scales = quantize(vectors[order])
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=len(centroids)), out=offsets[1:])
+        self._lists = (centroids, codes, scales, ids[order], offsets, [], [])
+
+    def add(self, vectors: np.ndarray, ids: List[int]) -> None:
+        # Vetores antes dos ids: quem lê len(ids) ids sempre encontra os vetores correspondentes
+        delta_vectors, delta_ids = self._lists[5:]
+        delta_vectors.extend(vectors)
+        delta_ids.extend(ids)
+        if len(delta_ids) >= self.merge_threshold:
+            self._merge()
+
+    def _merge(self) -> None:
+        # Reincorporar o delta às listas; com o corpus 4x maior que o de treino, retreinar
+        centroids, codes, scales, list_ids, _, delta_vectors, delta_ids = self._lists
+        vectors = np.vstack([codes.astype(np.float32) * scales[:, None],
+                             np.asarray(delta_vectors, dtype=np.float32).reshape(-1, self.dim)])
+        ids = np.concatenate([list_ids, np.asarray(delta_ids, dtype=np.int64)])
+        if len(vectors) > 4 * max(self._trained_size, 1) or len(centroids) == 1:
+            self.build(vectors, ids)
+        else:
+            self._fill_lists(vectors, ids, centroids)
+
+    def search(self, query: np.ndarray, k: int, n_probe: Optional[int] = None,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna (ids, similaridades) dos k vetores mais próximos, em ordem decrescente.
+
+        Args:
+            query (np.ndarray): Vetor da query (normalizado)
+            k (int): Quantidade de vizinhos
+            n_probe (Optional[int]): Listas visitadas (padrão: self.n_probe)
+            allowed (Optional[np.ndarray]): IDs aceitos, em ordem crescente; os demais
+                são descartados antes da seleção dos k (ex.: documentos de uma categoria)
+        """
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        centroids, codes, scales, list_ids, offsets, delta_vectors, delta_ids = self._lists
+        n_probe = min(self.n_probe if n_probe is None else n_probe, len(centroids))
+        probes = np.argpartition(-(centroids @ query), n_probe - 1)[:n_probe]
+        rows = np.concatenate([np.arange(offsets[p], offsets[p + 1]) for p in probes])
+        if allowed is not None:
+            rows = rows[contains(allowed, list_ids[rows])]
+
+        scores = (codes[rows] @ query) * scales[rows]
+        ids = list_ids[rows]
+        delta_ids = delta_ids[:]
+        if delta_ids:
+            delta = np.asarray(delta_vectors[:len(delta_ids)], dtype=np.float32)
+            delta_ids = np.asarray(delta_ids, dtype=np.int64)
+            if allowed is not None:
+                keep = contains(allowed, delta_ids)
+                delta, delta_ids = delta[keep], delta_ids[keep]
+            scores = np.concatenate([scores, delta @ query])
+            ids = np.concatenate([ids, delta_ids])
+
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[keep], scores[keep]
+        order = np.argsort(-scores, kind='stable')
+        return ids[order], scores[order].astype(np.float64)
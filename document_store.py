@@ -0,0 +1,221 @@
+import copy
+import json
+import mmap
+import numpy as np
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+from lexical_index import write_snapshot, read_snapshot_header, map_snapshot
+
+DEFAULT_CATEGORY = 'geral'
+FIELDS = ('question', 'answer', 'category')
+
+
+class QARecord:
+    """
+    Par de QA lido do DocumentStore.
+
+    Guarda apenas o documento e a categoria; pergunta e resposta são decodificadas
+    da arena de texto quando acessadas. Aceita também o acesso no estilo dos
+    dicionários de qa_pairs.json (qa['question'], qa.get('category')).
+    """
+    __slots__ = ('store', 'doc_id', 'category')
+
+    def __init__(self, store: 'DocumentStore', doc_id: int, category: str):
+        self.store = store
+        self.doc_id = doc_id
+        self.category = category
+
+    @property
+    def question(self) -> str:
+        return self.store.text(self.doc_id, 0)
+
+    @property
+    def answer(self) -> str:
+        return self.store.text(self.doc_id, 1)
+
+    def __getitem__(self, field: str) -> str:
+        if field not in FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return getattr(self, field) if field in FIELDS else default
+
+    def to_dict(self) -> Dict[str, str]:
+        return {'question': self.question, 'answer': self.answer, 'category': self.category}
+
+
+class DocumentStore:
+    """
+    Armazenamento compacto dos pares de QA, em dois segmentos como o LexicalIndex.
+
+    Perguntas e respostas ficam uma única vez em uma arena de texto UTF-8 (pergunta
+    e resposta de cada documento em sequência, localizadas por offsets) e só são
+    decodificadas quando lidas. A categoria de cada documento é um ID em um array,
+    que aponta para a tabela de categorias. O segmento base pode ser mapeado de um
+    snapshot em disco; documentos incluídos depois vão para arrays em memória.
+    Como os documentos só recebem inclusões, um snapshot para leitura compartilha os
+    mesmos arrays limitado aos documentos existentes quando foi criado.
+    """
+    SNAPSHOT_KIND = 'documents'
+
+    def __init__(self):
+        self.categories: List[str] = []
+        self._category_ids: Dict[str, int] = {}
+
+        # Segmento base (somente leitura)
+        self._base_documents = 0
+        self._base_text = np.zeros(0, dtype=np.uint8)
+        self._base_offsets = np.zeros(1, dtype=np.int64)
+        self._base_categories = np.zeros(0, dtype=np.int32)
+        self._mmap: Optional[mmap.mmap] = None
+
+        # Segmento delta: arena de texto, offsets (2 por documento) e IDs de categoria
+        self._text = bytearray()
+        self._offsets = array('q', [0])
+        self._doc_categories = array('i')
+        # Documentos visíveis (snapshot); None: todos
+        self._limit: Optional[int] = None
+
+    def __len__(self) -> int:
+        if self._limit is not None:
+            return self._limit
+        return self._base_documents + len(self._doc_categories)
+
+    def snapshot(self) -> 'DocumentStore':
+        """
+        Versão imutável para leitura com os documentos atuais, sem cópia dos dados
+        (ver LexicalIndex.snapshot).
+        """
+        view = copy.copy(self)
+        view._limit = len(self)
+        return view
+
+    def _category_id(self, category: str) -> int:
+        category_id = self._category_ids.get(category)
+        if category_id is None:
+            category_id = self._category_ids[category] = len(self.categories)
+            self.categories.append(category)
+        return category_id
+
+    def append(self, question: str, answer: str, category: Optional[str] = None) -> int:
+        doc_id = len(self)
+        self._text += str(question).encode('utf-8')
+        self._offsets.append(len(self._text))
+        self._text += str(answer).encode('utf-8')
+        self._offsets.append(len(self._text))
+        self._doc_categories.append(self._category_id(str(category or DEFAULT_CATEGORY)))
+        return doc_id
+
+    def text(self, doc_id: int, field: int) -> str:
+        """
+        Decodifica a pergunta (field=0) ou a resposta (field=1) do documento.
+        """
+        if doc_id < self._base_documents:
+            position = 2 * doc_id + field
+            start, end = self._base_offsets[position], self._base_offsets[position + 1]
+            return self._base_text[start:end].tobytes().decode('utf-8')
+        position = 2 * (doc_id - self._base_documents) + field
+        return self._text[self._offsets[position]:self._offsets[position + 1]].decode('utf-8')
+
+    def category(self, doc_id: int) -> str:
+        if doc_id < self._base_documents:
+            return self.categories[self._base_categories[doc_id]]
+        return self.categories[self._doc_categories[doc_id - self._base_documents]]
+
+    def encoded_texts(self, field: int) -> List[bytes]:
+        """
+        Pergunta (field=0) ou resposta (field=1) de todos os documentos em UTF-8, sem
+        decodificar (comparação em massa, ver RAGManager.reload).
+        """
+        base_text = self._base_text.tobytes()
+        base_offsets = self._base_offsets.tolist()
+        texts = [base_text[base_offsets[position]:base_offsets[position + 1]]
+                 for position in range(field, 2 * self._base_documents, 2)]
+        text = bytes(self._text)
+        offsets = self._offsets
+        texts.extend(text[offsets[position]:offsets[position + 1]]
+                     for position in range(field, 2 * (len(self) - self._base_documents), 2))
+        return texts
+
+    def category_ids(self, n_documents: Optional[int] = None) -> np.ndarray:
+        """
+        IDs de categoria (posições em categories) dos n primeiros documentos.
+        """
+        n_documents = len(self) if n_documents is None else n_documents
+        n_base = min(n_documents, self._base_documents)
+        delta = np.frombuffer(self._doc_categories[:n_documents - n_base], dtype=np.int32)
+        return np.concatenate([self._base_categories[:n_base], delta])
+
+    def __getitem__(self, doc_id: int) -> QARecord:
+        if doc_id < 0:
+            doc_id += len(self)
+        if not 0 <= doc_id < len(self):
+            raise IndexError('documento fora do intervalo')
+        return QARecord(self, doc_id, self.category(doc_id))
+
+    def __iter__(self) -> Iterator[QARecord]:
+        for doc_id in range(len(self)):
+            yield self[doc_id]
+
+    def write_json(self, f: TextIO, n_documents: Optional[int] = None, wrapped: bool = False) -> None:
+        """
+        Grava os n primeiros documentos no formato de qa_pairs.json, em streaming
+        (mesma saída de json.dump(..., ensure_ascii=False, indent=4)).
+        """
+        n_documents = len(self) if n_documents is None else n_documents
+        indent = ' ' * (8 if wrapped else 4)
+        f.write('{\n    "qa_pairs": [' if wrapped else '[')
+        for doc_id in range(n_documents):
+            entry = json.dumps(self[doc_id].to_dict(), ensure_ascii=False, indent=4)
+            f.write((',\n' if doc_id else '\n') + indent + entry.replace('\n', '\n' + indent))
+        if n_documents:
+            f.write('\n' + indent[4:])
+        f.write(']\n}' if wrapped else ']')
+
+    def save(self, path: str, source: Dict[str, Any], n_documents: Optional[int] = None) -> None:
+        """
+        Grava um snapshot binário dos n primeiros documentos (ver write_snapshot).
+        """
+        n_documents = len(self) if n_documents is None else n_documents
+        n_base = min(n_documents, self._base_documents)
+        n_delta = n_documents - n_base
+        base_end = int(self._base_offsets[2 * n_base])
+
+        # Offsets do delta deslocados para depois do texto da base
+        delta_offsets = np.frombuffer(self._offsets[1:2 * n_delta + 1], dtype=np.int64) + base_end
+        delta_categories = np.frombuffer(self._doc_categories[:n_delta], dtype=np.int32)
+        arrays = {
+            'text': [self._base_text[:base_end],
+                     np.frombuffer(self._text[:self._offsets[2 * n_delta]], dtype=np.uint8)],
+            'offsets': [self._base_offsets[:2 * n_base + 1], delta_offsets],
+            'categories': [self._base_categories[:n_base], delta_categories],
+        }
+        write_snapshot(path, self.SNAPSHOT_KIND,
+                       {'source': source, 'n_documents': n_documents, 'categories': self.categories}, arrays)
+
+    @classmethod
+    def read_header(cls, path: str) -> Optional[Dict[str, Any]]:
+        return read_snapshot_header(path, cls.SNAPSHOT_KIND)
+
+    @classmethod
+    def load(cls, path: str, header: Optional[Dict[str, Any]] = None) -> 'DocumentStore':
+        """
+        Carrega um snapshot mapeando a arena em memória: o texto só é lido do disco
+        quando um documento é acessado.
+        """
+        header = header or cls.read_header(path)
+        if header is None:
+            raise ValueError(f"Snapshot inválido: {path}")
+
+        mapped, arrays = map_snapshot(path, header)
+        store = cls()
+        store._mmap = mapped
+        store.categories = list(header['categories'])
+        store._category_ids = {category: category_id for category_id, category in enumerate(store.categories)}
+        store._base_documents = header['n_documents']
+        store._base_text = arrays['text']
+        store._base_offsets = arrays['offsets']
+        store._base_categories = arrays['categories']
+        return store
@@ -0,0 +1,53 @@
+import os
+import threading
+from typing import Callable, Optional, Tuple
+
+
+class FileWatcher:
+    """
+    Observa um arquivo por polling do tamanho e do mtime, em uma thread em segundo plano.
+
+    Uma alteração só é avisada (on_change) depois de ficar estável por um intervalo,
+    para não ler um arquivo ainda sendo gravado. Quem recebe o aviso confirma pelo
+    conteúdo (hash) se algo realmente mudou.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[], None], interval: float = 2.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._state = self._stat()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='nabu-file-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    def _run(self) -> None:
+        pending = None
+        while not self._stop.wait(self.interval):
+            state = self._stat()
+            if state == self._state:
+                pending = None
+            elif state != pending:
+                # Alteração nova: esperar mais um intervalo sem mudanças
+                pending = state
+            else:
+                self._state = state
+                pending = None
+                self.on_change()
@@ -0,0 +1,224 @@
+import copy
+import threading
+import numpy as np
+from array import array
+from typing import Dict, List, Optional
+
+from lexical_index import LexicalIndex
+
+# Termos mais longos que isso não são corrigidos nem usados como correção
+MAX_TERM_LENGTH = 32
+
+
+def trigrams(term: str) -> List[str]:
+    """
+    Trigramas distintos do termo com duas posições de borda de cada lado
+    ("ferias" -> "$$f", "$fe", "fer", ..., "s$$").
+    """
+    padded = f"$${term}$$"
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Distância de edição entre dois termos (ver edit_distances), limitada a max_distance + 1.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def edit_distances(term: str, chars: np.ndarray, lengths: np.ndarray, max_distance: int) -> np.ndarray:
+    """
+    Distância de edição (inserção, remoção, substituição e troca de duas letras
+    vizinhas) entre term e vários termos de uma vez.
+
+    Args:
+        term (str): Termo da query
+        chars (np.ndarray): Um termo por coluna (posição x termo), em code points,
+            completado com zeros
+        lengths (np.ndarray): Tamanho de cada termo de chars
+        max_distance (int): Distâncias maiores são devolvidas como max_distance + 1
+
+    Returns:
+        np.ndarray: Distância de cada termo, limitada a max_distance + 1
+    """
+    width, n_terms = chars.shape
+    positions = np.arange(width + 1)[:, None]
+    columns = np.arange(n_terms)
+    # Linhas da programação dinâmica transpostas: posição no termo x termo
+    previous2 = previous = np.broadcast_to(positions, (width + 1, n_terms))
+    codes = [ord(char) for char in term]
+    for i, code in enumerate(codes, start=1):
+        current = np.empty((width + 1, len(columns)), dtype=np.int64)
+        current[0] = i
+        # Substituição (ou letra igual) e remoção; a inserção vem do mínimo acumulado abaixo
+        np.minimum(previous[:-1] + (chars != code), previous[1:] + 1, out=current[1:])
+        if i > 1:
+            swapped = (chars[:-1] == code) & (chars[1:] == codes[i - 2])
+            np.minimum(current[2:], previous2[:-2] + 1, out=current[2:], where=swapped)
+        current = np.minimum.accumulate(current - positions, axis=0) + positions
+        # Descartar os termos que já passaram de max_distance em todas as posições
+        alive = current.min(axis=0) <= max_distance
+        if not alive.all():
+            columns, chars, current, previous = columns[alive], chars[:, alive], current[:, alive], previous[:, alive]
+            if not len(columns):
+                break
+        previous2, previous = previous, current
+    distances = np.full(n_terms, max_distance + 1, dtype=np.int64)
+    if len(columns):
+        distances[columns] = np.minimum(previous[lengths[columns], np.arange(len(columns))], max_distance + 1)
+    return distances
+
+
+class _TrigramIndex:
+    """
+    Índice invertido trigrama -> termos, compartilhado pelas versões do FuzzyTermIndex
+    de um mesmo vocabulário e estendido sob demanda (termos só são acrescentados).
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, array] = {}
+        self.lengths = array('i')
+        # Code points dos termos, um por linha (capacidade dobrada conforme o vocabulário cresce)
+        self.chars = np.zeros((0, MAX_TERM_LENGTH), dtype=np.uint32)
+        self.lock = threading.Lock()
+
+    def sync(self, terms: List[str], n_terms: int) -> None:
+        # Indexar os termos até n_terms ainda não indexados (chamado com lock)
+        start = len(self.lengths)
+        if start >= n_terms:
+            return
+        new_terms = terms[start:n_terms]
+        for term_id, term in enumerate(new_terms, start):
+            for gram in trigrams(term):
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array('i')
+                postings.append(term_id)
+            self.lengths.append(len(term))
+        if n_terms > len(self.chars):
+            chars = np.zeros((max(n_terms, 2 * len(self.chars)), MAX_TERM_LENGTH), dtype=np.uint32)
+            chars[:start] = self.chars[:start]
+            self.chars = chars
+        self.chars[start:n_terms] = np.array(new_terms, dtype=f'U{MAX_TERM_LENGTH}').view(np.uint32) \
+            .reshape(-1, MAX_TERM_LENGTH)
+
+
+class FuzzyTermIndex:
+    """
+    Correção de termos da query fora do vocabulário (erros de digitação).
+
+    Usa um índice invertido trigrama -> termos sobre o vocabulário do LexicalIndex,
+    atualizado sob demanda com os termos incluídos depois. Para um termo desconhecido,
+    os candidatos são os termos de tamanho parecido que compartilham trigramas
+    suficientes: cada edição altera no máximo 4 trigramas, então um termo a distância d
+    compartilha ao menos len(trigramas) - 4 * d deles. Só os candidatos passam pela
+    distância de edição (vetorizada), e o termo escolhido é o mais próximo (empate: o
+    que aparece em mais documentos). Termos curtos não são corrigidos.
+
+    Cada instância vale para um índice (em geral o snapshot de uma IndexVersion): só
+    os termos existentes na criação, com documentos nesse índice, são correções
+    possíveis, e o cache de correções é próprio da instância. snapshot() cria a
+    instância da próxima versão, reaproveitando o índice de trigramas.
+    """
+
+    def __init__(self, index: LexicalIndex, min_length: int = 5, cache_size: int = 4096, scalar_limit: int = 16):
+        self.index = index
+        self.min_length = min_length
+        self.cache_size = cache_size
+        self.scalar_limit = scalar_limit
+        # Termos visíveis (o vocabulário é compartilhado e pode crescer depois)
+        self.n_terms = len(index.terms)
+        self._trigrams = _TrigramIndex()
+        self._corrections: Dict[str, Optional[int]] = {}
+
+    def snapshot(self, index: LexicalIndex) -> 'FuzzyTermIndex':
+        """
+        Instância para um novo snapshot do mesmo índice (mesmo vocabulário, com os termos
+        e documentos incluídos desde então), com o cache de correções vazio.
+        """
+        view = copy.copy(self)
+        view.index = index
+        view.n_terms = len(index.terms)
+        view._corrections = {}
+        return view
+
+    @staticmethod
+    def max_distance(term: str) -> int:
+        return 1 if len(term) <= 8 else 2
+
+    def candidates(self, term: str, max_distance: int) -> np.ndarray:
+        """
+        IDs dos termos que podem estar a até max_distance edições do termo (filtro por
+        trigramas em comum e por tamanho, sem calcular distâncias).
+        """
+        with self._trigrams.lock:
+            self._trigrams.sync(self.index.terms, self.n_terms)
+            return self._candidates(term, max_distance)
+
+    def _candidates(self, term: str, max_distance: int) -> np.ndarray:
+        # Chamado com o lock do índice de trigramas
+        term_grams = trigrams(term)
+        postings = self._trigrams.postings
+        grams = [postings[gram] for gram in term_grams if gram in postings]
+        if not grams:
+            return np.zeros(0, dtype=np.int64)
+        lengths = np.frombuffer(self._trigrams.lengths, dtype=np.int32)[:self.n_terms]
+        term_ids = np.concatenate([np.frombuffer(gram_postings, dtype=np.int32) for gram_postings in grams])
+        shared = np.bincount(term_ids[term_ids < self.n_terms], minlength=len(lengths))
+        needed = max(1, len(term_grams) - 4 * max_distance)
+        mask = (shared >= needed) & (np.abs(lengths - len(term)) <= max_distance) & (lengths <= MAX_TERM_LENGTH)
+        return np.flatnonzero(mask)
+
+    def correct(self, term: str) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: ID do termo do vocabulário mais próximo de term, ou None se
+            nenhum estiver a até max_distance(term) edições
+        """
+        if not self.min_length <= len(term) <= MAX_TERM_LENGTH:
+            return None
+        with self._trigrams.lock:
+            if term in self._corrections:
+                return self._corrections[term]
+            self._trigrams.sync(self.index.terms, self.n_terms)
+            correction = None
+            all_lengths = np.frombuffer(self._trigrams.lengths, dtype=np.int32)
+            # Primeiro só a distância 1 (filtro de trigramas mais seletivo): se houver um termo
+            # a essa distância, ele é a correção e a busca mais ampla não é necessária
+            for max_distance in range(1, self.max_distance(term) + 1):
+                candidates = self._candidates(term, max_distance)
+                if not len(candidates):
+                    continue
+                if len(candidates) <= self.scalar_limit:
+                    # Poucos candidatos: mais rápido sem o custo fixo das operações vetorizadas
+                    distances = np.array([edit_distance(term, self.index.terms[term_id], max_distance)
+                                          for term_id in candidates.tolist()])
+                else:
+                    lengths = all_lengths[candidates]
+                    chars = np.ascontiguousarray(self._trigrams.chars[candidates, :int(lengths.max())].T)
+                    distances = edit_distances(term, chars, lengths, max_distance)
+                # Termos sem documentos no índice (ex.: de entradas removidas) não corrigem nada
+                close = candidates[distances <= max_distance].tolist()
+                frequencies = {term_id: self.index.document_frequency(term_id) for term_id in close}
+                close = [term_id for term_id in close if frequencies[term_id]]
+                if close:
+                    distance_of = dict(zip(candidates.tolist(), distances.tolist()))
+                    correction = min(close, key=lambda term_id: (distance_of[term_id], -frequencies[term_id], term_id))
+                    break
+            if len(self._corrections) >= self.cache_size:
+                self._corrections.clear()
+            self._corrections[term] = correction
+            return correction
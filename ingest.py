@@ -0,0 +1,187 @@
+import os
+import re
+import csv
+import json
+from typing import Dict, Iterator, Iterable, Optional, Any
+
+# Nomes de coluna aceitos nas exportações (inglês e português)
+FIELD_ALIASES = {
+    'question': ('question', 'pergunta'),
+    'answer': ('answer', 'resposta'),
+    'category': ('category', 'categoria'),
+}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def normalize_record(raw: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """
+    Converte um registro bruto no formato {'question', 'answer', 'category'}.
+
+    Returns:
+        Optional[Dict[str, str]]: Registro normalizado ou None se faltar pergunta/resposta
+    """
+    record = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = raw.get(alias)
+            if value:
+                record[field] = str(value).strip()
+                break
+    if not record.get('question') or not record.get('answer'):
+        return None
+    record.setdefault('category', 'geral')
+    return record
+
+
+class QARecordReader:
+    """
+    Leitor em streaming de pares de QA em JSONL ou CSV.
+
+    O arquivo é lido linha a linha em modo binário, de modo que o consumo de memória
+    não depende do tamanho do arquivo e os bytes lidos podem ser usados para progresso.
+    """
+
+    def __init__(self, path: str, encoding: str = 'utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        self.skipped = 0
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.jsonl', '.ndjson'):
+            self._parse = self._parse_jsonl
+        elif extension == '.csv':
+            self._parse = self._parse_csv
+        else:
+            raise ValueError(f"Formato não suportado para ingestão em streaming: {extension}")
+
+    def _lines(self) -> Iterator[str]:
+        with open(self.path, 'rb') as f:
+            for line in f:
+                self.bytes_read += len(line)
+                yield line.decode(self.encoding)
+
+    def _parse_jsonl(self) -> Iterator[Dict[str, Any]]:
+        for line in self._lines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                self.skipped += 1
+
+    def _parse_csv(self) -> Iterator[Dict[str, Any]]:
+        lines = self._lines()
+        # Remover BOM comum em exportações de planilhas
+        first = next(lines, '').lstrip('﻿')
+        yield from csv.DictReader(_prepend(first, lines))
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for raw in self._parse():
+            record = normalize_record(raw) if isinstance(raw, dict) else None
+            if record is None:
+                self.skipped += 1
+                continue
+            yield record
+
+
+class JSONArrayReader:
+    """
+    Leitor em streaming de um array JSON de registros, no topo do arquivo ou na
+    chave `key` de um objeto ({"qa_pairs": [...]}).
+
+    O texto é lido em blocos e cada elemento é decodificado individualmente, de
+    modo que a lista completa nunca existe em memória. Depois da leitura, wrapped
+    indica se o array estava dentro do objeto. Outros conteúdos resultam em zero registros.
+    """
+
+    def __init__(self, path: str, key: str = 'qa_pairs', encoding: str = 'utf-8', block_size: int = 1 << 20):
+        self.path = path
+        self.key = key
+        self.encoding = encoding
+        self.block_size = block_size
+        self.wrapped = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        # Descarta o trecho já consumido e lê mais um bloco; False no fim do arquivo
+        block = self._file.read(self.block_size)
+        self._buffer = self._buffer[self._pos:] + block
+        self._pos = 0
+        return bool(block)
+
+    def _peek(self) -> str:
+        # Próximo caractere após espaços em branco ('' no fim do arquivo)
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def _decode(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Elemento incompleto no fim do bloco: ler mais e tentar de novo
+                if self._fill():
+                    continue
+                raise
+            # Um número no fim do bloco pode continuar no bloco seguinte
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"JSON inválido em {self.path}: esperado '{char}'")
+        self._pos += 1
+
+    def _find_array(self) -> bool:
+        first = self._peek()
+        if first == '[':
+            self._pos += 1
+            return True
+        if first != '{':
+            return False
+        self._pos += 1
+        while True:
+            char = self._peek()
+            if char in ('}', ''):
+                return False
+            if char == ',':
+                self._pos += 1
+                continue
+            name = self._decode()
+            self._expect(':')
+            if name == self.key and self._peek() == '[':
+                self._pos += 1
+                self.wrapped = True
+                return True
+            # Valor de outra chave: decodificar e descartar
+            self._decode()
+
+    def __iter__(self) -> Iterator[Any]:
+        with open(self.path, 'r', encoding=self.encoding) as self._file:
+            self._buffer = ''
+            self._pos = 0
+            self.wrapped = False
+            if not self._find_array():
+                return
+            while True:
+                char = self._peek()
+                if char in (']', ''):
+                    return
+                if char == ',':
+                    self._pos += 1
+                    continue
+                yield self._decode()
+
+
+def _prepend(first: str, rest: Iterable[str]) -> Iterator[str]:
+    if first:
+        yield first
+    yield from rest
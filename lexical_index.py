@@ -0,0 +1,390 @@
+import os
+import sys
+import copy
+import json
+import mmap
+import shutil
+import bisect
+import hashlib
+import tempfile
+import numpy as np
+from array import array
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Any, IO, Callable
+from collections import Counter
+
+SNAPSHOT_MAGIC = b'NABUIDX\0'
+SNAPSHOT_VERSION = 2
+_ALIGNMENT = 8
+
+
+def file_fingerprint(path: str, with_hash: bool = True) -> Dict[str, Any]:
+    """
+    Identifica o conteúdo de um arquivo para validar snapshots derivados dele.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'w', encoding: Optional[str] = 'utf-8',
+                 before_replace: Optional[Callable[[str], None]] = None) -> Iterator[IO]:
+    """
+    Grava path por um arquivo temporário no mesmo diretório, com nome único (vários
+    processos ou threads podem gravar o mesmo arquivo), que substitui path com
+    os.replace quando o bloco termina sem erros. Quem lê path vê o conteúdo antigo
+    ou o novo completo, nunca um arquivo pela metade; em caso de erro, o temporário
+    é removido e path continua intacto. before_replace, se informado, recebe o
+    caminho do temporário já gravado, imediatamente antes da substituição.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp cria o arquivo só com permissão para o dono: manter a do arquivo substituído
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        if before_replace is not None:
+            before_replace(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_snapshot(path: str, kind: str, header: Dict[str, Any], arrays: Dict[str, Any]) -> None:
+    """
+    Grava arrays em um snapshot binário, substituindo o arquivo de forma atômica.
+
+    Formato: MAGIC, tamanho do cabeçalho (uint64), cabeçalho JSON com a versão, o
+    tipo do snapshot, os campos de header e a posição de cada array, seguidos dos
+    arrays alinhados em 8 bytes. Um array pode ser dado em partes (lista de arrays
+    do mesmo dtype), gravadas em sequência sem concatenar em memória.
+    """
+    parts = {name: values if isinstance(values, list) else [values] for name, values in arrays.items()}
+    layout = {}
+    position = 0
+    for name, values in parts.items():
+        dtype = values[0].dtype
+        nbytes = sum(part.nbytes for part in values)
+        layout[name] = {'dtype': dtype.str, 'offset': position, 'length': nbytes // dtype.itemsize}
+        position += -(-nbytes // _ALIGNMENT) * _ALIGNMENT
+    encoded = json.dumps({'version': SNAPSHOT_VERSION, 'kind': kind, **header, 'arrays': layout}).encode('utf-8')
+    encoded += b' ' * (-(len(SNAPSHOT_MAGIC) + 8 + len(encoded)) % _ALIGNMENT)
+
+    with atomic_write(path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(len(encoded).to_bytes(8, 'little'))
+        f.write(encoded)
+        for values in parts.values():
+            nbytes = 0
+            for part in values:
+                f.write(memoryview(np.ascontiguousarray(part)).cast('B'))
+                nbytes += part.nbytes
+            f.write(b'\0' * (-nbytes % _ALIGNMENT))
+
+
+def read_snapshot_header(path: str, kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Lê o cabeçalho de um snapshot; None se o arquivo não existir, for de outra
+    versão ou de outro tipo.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length))
+    except (OSError, ValueError):
+        return None
+    if header.get('version') != SNAPSHOT_VERSION or (kind is not None and header.get('kind') != kind):
+        return None
+    header['data_offset'] = len(SNAPSHOT_MAGIC) + 8 + header_length
+    return header
+
+
+def map_snapshot(path: str, header: Dict[str, Any]) -> Tuple[mmap.mmap, Dict[str, np.ndarray]]:
+    """
+    Mapeia os arrays de um snapshot em memória, sem copiá-los: as páginas só são
+    lidas do disco quando acessadas.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        arrays[name] = np.frombuffer(mapped, dtype=np.dtype(spec['dtype']), count=spec['length'],
+                                     offset=header['data_offset'] + spec['offset'])
+    return mapped, arrays
+
+
+def invert_forward(doc_offsets: np.ndarray, doc_terms: np.ndarray, doc_counts: np.ndarray,
+                   n_terms: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Inverte o índice documento -> termos (CSR) em termo -> documentos.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: offsets por termo, documentos e
+        frequências (ordem estável: documentos crescentes em cada termo)
+    """
+    n_documents = len(doc_offsets) - 1
+    doc_ids = np.repeat(np.arange(n_documents, dtype=np.int32), np.diff(doc_offsets))
+    order = np.argsort(doc_terms, kind='stable')
+    post_offsets = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(doc_terms, minlength=n_terms), out=post_offsets[1:])
+    return post_offsets, doc_ids[order], doc_counts[order]
+
+
+def select_rows(doc_offsets: np.ndarray, doc_terms: np.ndarray, doc_counts: np.ndarray,
+                rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Recorta as linhas rows (documentos, em qualquer ordem) do índice documento -> termos (CSR).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: offsets, termos e frequências das linhas selecionadas
+    """
+    starts = doc_offsets[rows]
+    lengths = doc_offsets[rows + 1] - starts
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+    return offsets, doc_terms[positions], doc_counts[positions]
+
+
+class LexicalIndex:
+    """
+    Índice invertido em dois segmentos.
+
+    O segmento base é imutável e guardado em arrays contíguos (CSR), podendo ser
+    mapeado diretamente de um snapshot em disco. Documentos adicionados depois
+    vão para um segmento delta em memória, consultado junto com a base.
+
+    Os dois segmentos só recebem inclusões no fim, então uma versão de leitura
+    (snapshot) pode compartilhar os mesmos arrays limitada aos documentos que
+    existiam quando foi criada.
+    """
+    SNAPSHOT_KIND = 'lexical_index'
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.doc_lengths = array('q')
+        self.total_length = 0
+        # Documentos visíveis (snapshot); None: todos, inclusive os que ainda serão incluídos
+        self._limit: Optional[int] = None
+
+        # Segmento base (termo -> documentos e documento -> termos)
+        self._base_documents = 0
+        self._post_offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_counts = np.zeros(0, dtype=np.int32)
+        self._doc_offsets = np.zeros(1, dtype=np.int64)
+        self._doc_terms = np.zeros(0, dtype=np.int32)
+        self._doc_counts = np.zeros(0, dtype=np.int32)
+        self._mmap: Optional[mmap.mmap] = None
+
+        # Segmento delta, também em arrays contíguos: termo -> (documentos, frequências)
+        # e documento -> termos por offsets
+        self._delta_postings: Dict[int, Tuple[array, array]] = {}
+        self._delta_offsets = array('q', [0])
+        self._delta_terms = array('i')
+        self._delta_counts = array('i')
+
+    @property
+    def n_documents(self) -> int:
+        return len(self.doc_lengths) if self._limit is None else self._limit
+
+    @property
+    def base_documents(self) -> int:
+        # Documentos no segmento base (cobertos pelo snapshot mapeado, se houver)
+        return self._base_documents
+
+    def snapshot(self, n_documents: Optional[int] = None) -> 'LexicalIndex':
+        """
+        Versão imutável para leitura com os n primeiros documentos (padrão: todos os
+        atuais). Compartilha os arrays com este índice, sem cópia: inclusões feitas
+        depois continuam aqui e não aparecem no snapshot.
+        """
+        n_documents = self.n_documents if n_documents is None else n_documents
+        view = copy.copy(self)
+        view._limit = n_documents
+        # Documentos fora do snapshot ainda não foram publicados: só os seus comprimentos são descontados
+        view.total_length = self.total_length - sum(self.doc_lengths[n_documents:self.n_documents])
+        return view
+
+    def term_id(self, term: str) -> int:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            term_id = self.vocabulary[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def add_document(self, term_counts: Counter) -> int:
+        """
+        Indexa um documento a partir das frequências por ID de termo (ver tokenizer.encode).
+        """
+        doc_id = self.n_documents
+        for term_id, count in term_counts.items():
+            postings = self._delta_postings.get(term_id)
+            if postings is None:
+                postings = self._delta_postings[term_id] = (array('i'), array('i'))
+            postings[0].append(doc_id)
+            postings[1].append(count)
+        self._delta_terms.extend(term_counts)
+        self._delta_counts.extend(term_counts.values())
+        self._delta_offsets.append(len(self._delta_terms))
+        self.doc_lengths.append(sum(term_counts.values()))
+        self.total_length += self.doc_lengths[-1]
+        return doc_id
+
+    def _delta_end(self, doc_ids: array) -> int:
+        # Postings do delta (documentos crescentes) visíveis no snapshot
+        if self._limit is None or not doc_ids or doc_ids[-1] < self._limit:
+            return len(doc_ids)
+        return bisect.bisect_left(doc_ids, self._limit)
+
+    def postings(self, term_id: int) -> Iterable[Tuple[int, int]]:
+        """
+        Retorna os pares (documento, frequência) do termo nos dois segmentos.
+        """
+        if term_id < 0:
+            return ()
+        postings: List[Tuple[int, int]] = []
+        if term_id + 1 < len(self._post_offsets):
+            start, end = self._base_range(term_id)
+            postings.extend(zip(self._post_docs[start:end].tolist(), self._post_counts[start:end].tolist()))
+        delta = self._delta_postings.get(term_id)
+        if delta is not None:
+            end = self._delta_end(delta[0])
+            postings.extend(zip(delta[0][:end], delta[1][:end]))
+        return postings
+
+    def document_frequency(self, term_id: int) -> int:
+        # Quantidade de documentos com o termo nos dois segmentos
+        frequency = 0
+        if 0 <= term_id and term_id + 1 < len(self._post_offsets):
+            start, end = self._base_range(term_id)
+            frequency += int(end - start)
+        delta = self._delta_postings.get(term_id)
+        if delta is not None:
+            frequency += self._delta_end(delta[0])
+        return frequency
+
+    def _base_range(self, term_id: int) -> Tuple[int, int]:
+        # Posição da lista de postings do termo no segmento base (ordenada por documento)
+        start, end = self._post_offsets[term_id], self._post_offsets[term_id + 1]
+        if self._limit is not None and self._limit < self._base_documents:
+            # Snapshot com parte da base (ex.: sub-índice de categoria construído depois da versão)
+            end = start + int(np.searchsorted(self._post_docs[start:end], self._limit))
+        return start, end
+
+    def document_terms(self, doc_id: int) -> Counter:
+        if doc_id < self._base_documents:
+            start, end = self._doc_offsets[doc_id], self._doc_offsets[doc_id + 1]
+            term_ids, counts = self._doc_terms[start:end].tolist(), self._doc_counts[start:end].tolist()
+        else:
+            start, end = self._delta_offsets[doc_id - self._base_documents], self._delta_offsets[doc_id - self._base_documents + 1]
+            term_ids, counts = self._delta_terms[start:end], self._delta_counts[start:end]
+        return Counter(dict(zip(term_ids, counts)))
+
+    def forward_arrays(self, n_documents: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Retorna o índice documento -> termos dos n primeiros documentos em formato CSR
+        (offsets, termos, frequências), juntando base e delta.
+        """
+        n_documents = self.n_documents if n_documents is None else n_documents
+        n_base = min(n_documents, self._base_documents)
+        base_end = self._doc_offsets[n_base]
+        n_delta = max(0, n_documents - self._base_documents)
+        delta_end = self._delta_offsets[n_delta]
+
+        # Fatias copiadas dos arrays delta: o segmento pode crescer durante a leitura
+        delta_offsets = np.frombuffer(self._delta_offsets[1:n_delta + 1], dtype=np.int64)
+        offsets = np.concatenate([self._doc_offsets[:n_base + 1], base_end + delta_offsets])
+        terms = np.concatenate([self._doc_terms[:base_end],
+                                np.frombuffer(self._delta_terms[:delta_end], dtype=np.int32)])
+        counts = np.concatenate([self._doc_counts[:base_end],
+                                 np.frombuffer(self._delta_counts[:delta_end], dtype=np.int32)])
+        return offsets.astype(np.int64), terms.astype(np.int32), counts.astype(np.int32)
+
+    def save(self, path: str, source: Dict[str, Any], n_documents: Optional[int] = None) -> None:
+        """
+        Grava um snapshot binário dos n primeiros documentos (ver write_snapshot), com
+        a identificação do arquivo de origem. O vocabulário é um bloco UTF-8 separado por '\\n'.
+        """
+        n_documents = self.n_documents if n_documents is None else n_documents
+        doc_offsets, doc_terms, doc_counts = self.forward_arrays(n_documents)
+        n_terms = int(doc_terms.max()) + 1 if len(doc_terms) else 0
+        post_offsets, post_docs, post_counts = invert_forward(doc_offsets, doc_terms, doc_counts, n_terms)
+
+        arrays = {
+            'vocabulary': np.frombuffer('\n'.join(self.terms[:n_terms]).encode('utf-8'), dtype=np.uint8),
+            'doc_lengths': np.asarray(self.doc_lengths[:n_documents], dtype=np.int32),
+            'doc_offsets': doc_offsets,
+            'doc_terms': doc_terms,
+            'doc_counts': doc_counts,
+            'post_offsets': post_offsets,
+            'post_docs': post_docs,
+            'post_counts': post_counts,
+        }
+        write_snapshot(path, self.SNAPSHOT_KIND, {'source': source, 'n_documents': n_documents, 'n_terms': n_terms},
+                       arrays)
+
+    @classmethod
+    def from_arrays(cls, doc_offsets: np.ndarray, doc_terms: np.ndarray, doc_counts: np.ndarray,
+                    vocabulary: Dict[str, int], terms: List[str]) -> 'LexicalIndex':
+        """
+        Monta em memória um índice com os documentos dados (CSR documento -> termos)
+        no segmento base. O vocabulário é compartilhado, não copiado: os IDs de
+        termo são os do índice de origem (usado pelos sub-índices por categoria).
+        """
+        index = cls()
+        index.vocabulary = vocabulary
+        index.terms = terms
+        n_terms = int(doc_terms.max()) + 1 if len(doc_terms) else 0
+        index._post_offsets, index._post_docs, index._post_counts = invert_forward(doc_offsets, doc_terms, doc_counts, n_terms)
+        index._doc_offsets, index._doc_terms, index._doc_counts = doc_offsets, doc_terms, doc_counts
+        # Comprimento = soma das frequências de cada documento
+        totals = np.concatenate([[0], np.cumsum(doc_counts, dtype=np.int64)])
+        index.doc_lengths = array('q', (totals[doc_offsets[1:]] - totals[doc_offsets[:-1]]).tobytes())
+        index.total_length = int(totals[-1])
+        index._base_documents = len(doc_offsets) - 1
+        return index
+
+    @classmethod
+    def read_header(cls, path: str) -> Optional[Dict[str, Any]]:
+        return read_snapshot_header(path, cls.SNAPSHOT_KIND)
+
+    @classmethod
+    def load(cls, path: str, header: Optional[Dict[str, Any]] = None) -> 'LexicalIndex':
+        """
+        Carrega um snapshot mapeando os arrays em memória, sem reprocessar o texto.
+        """
+        header = header or cls.read_header(path)
+        if header is None:
+            raise ValueError(f"Snapshot inválido: {path}")
+
+        mapped, arrays = map_snapshot(path, header)
+        index = cls()
+        index._mmap = mapped
+        vocabulary = arrays['vocabulary'].tobytes().decode('utf-8')
+        index.terms = [sys.intern(term) for term in vocabulary.split('\n')] if header['n_terms'] else []
+        index.vocabulary = {term: term_id for term_id, term in enumerate(index.terms)}
+        index.doc_lengths = array('q', arrays['doc_lengths'].astype(np.int64).tobytes())
+        index.total_length = int(arrays['doc_lengths'].sum(dtype=np.int64))
+        index._base_documents = header['n_documents']
+        for name in ('post_offsets', 'post_docs', 'post_counts', 'doc_offsets', 'doc_terms', 'doc_counts'):
+            setattr(index, f"_{name}", arrays[name])
+        return index
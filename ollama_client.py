@@ -0,0 +1,485 @@
+import re
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from context_packer import estimate_tokens
+from tracing import Tracer
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+# Tempo que o Ollama mantém o modelo carregado após a última requisição (o padrão do Ollama é 5 min)
+DEFAULT_KEEP_ALIVE = "30m"
+
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+# Opções de geração otimizadas para CPU (contexto curto, 4 threads, respostas curtas)
+DEFAULT_OPTIONS = {
+    'temperature': 0.3,
+    'num_ctx': 512,
+    'num_thread': 4,
+    'stop': ["\n\n", "Human:", "Assistant:"],
+}
+
+PROMPT_TEMPLATE = """Você é o Nabu, um assistente virtual corporativo. Responda em português, de forma direta, usando apenas as informações do contexto abaixo. Se o contexto não tiver a resposta, diga que não encontrou a informação.
+
+Contexto:
+{context}
+
+Pergunta: {question}
+Resposta:"""
+
+
+def build_prompt(question: str, context: str) -> str:
+    return PROMPT_TEMPLATE.format(context=context, question=question)
+
+
+def keep_alive_seconds(keep_alive: Union[str, float, None]) -> Optional[float]:
+    """
+    Converte o keep_alive do Ollama (segundos ou duração como "30m" e "1h30m") em
+    segundos; sem keep_alive, vale o padrão do Ollama (5 min). Valores negativos
+    mantêm o modelo carregado indefinidamente (None).
+    """
+    if keep_alive is None:
+        return 300.0
+    if isinstance(keep_alive, (int, float)):
+        seconds = float(keep_alive)
+    else:
+        text = keep_alive.strip()
+        sign = -1.0 if text.startswith('-') else 1.0
+        parts = _DURATION_PART.findall(text.lstrip('+-'))
+        if not parts or ''.join(number + unit for number, unit in parts) != text.lstrip('+-'):
+            raise ValueError(f"keep_alive inválido: {keep_alive!r}")
+        seconds = sign * sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    return None if seconds < 0 else seconds
+
+
+def context_budget(question: str, options: Optional[Dict[str, Any]] = None, answer_tokens: int = 128) -> int:
+    """
+    Tokens (estimados) disponíveis para o contexto: a janela num_ctx menos o restante
+    do prompt e a reserva para a resposta.
+    """
+    num_ctx = (options or DEFAULT_OPTIONS)['num_ctx']
+    return max(0, num_ctx - estimate_tokens(build_prompt(question, '')) - answer_tokens)
+
+
+@dataclass
+class GenerationStats:
+    """
+    Métricas de uma geração em streaming.
+
+    Attributes:
+        model (str): Modelo usado
+        time_to_first_token (Optional[float]): Segundos até o primeiro token chegar
+        total_time (float): Duração total da geração em segundos
+        completion_tokens (int): Tokens gerados
+        prompt_tokens (int): Tokens do prompt avaliados pelo modelo
+        tokens_per_second (float): Vazão de geração após o primeiro token
+        load_time (Optional[float]): Segundos gastos pelo Ollama carregando o modelo (load_duration)
+        warm (Optional[bool]): Se o modelo já estava carregado (aquecido) quando a geração começou
+    """
+    model: str
+    time_to_first_token: Optional[float] = None
+    total_time: float = 0.0
+    completion_tokens: int = 0
+    prompt_tokens: int = 0
+    tokens_per_second: float = 0.0
+    load_time: Optional[float] = None
+    warm: Optional[bool] = None
+
+
+class OllamaUnavailable(RuntimeError):
+    """
+    O servidor Ollama está fora do ar (ou o circuito está aberto).
+    """
+
+
+class OllamaStream:
+    """
+    Iterador sobre os trechos de texto gerados por /api/generate em modo streaming.
+
+    Pode ser passado diretamente para st.write_stream. Ao final da iteração, stats
+    contém o tempo até o primeiro token e a vazão em tokens/s (usando eval_count e
+    eval_duration informados pelo Ollama quando disponíveis), e on_complete, se
+    informado, recebe o texto completo de uma geração concluída sem erros.
+    """
+
+    def __init__(self, model: str, prompt: str, base_url: str = DEFAULT_BASE_URL,
+                 options: Optional[Dict[str, Any]] = None, timeout: tuple = (3.05, 120),
+                 session: Optional[requests.Session] = None,
+                 breaker: Optional['CircuitBreaker'] = None,
+                 on_complete: Optional[Callable[[str], None]] = None,
+                 keep_alive: Union[str, float, None] = None):
+        self.model = model
+        self.prompt = prompt
+        self.base_url = base_url.rstrip('/')
+        self.options = dict(DEFAULT_OPTIONS if options is None else options)
+        self.timeout = timeout
+        self.session = session
+        self.breaker = breaker
+        self.on_complete = on_complete
+        self.keep_alive = keep_alive
+        self.stats = GenerationStats(model=model)
+
+    def _payload(self) -> Dict[str, Any]:
+        payload = {'model': self.model, 'prompt': self.prompt, 'stream': True, 'options': self.options}
+        if self.keep_alive is not None:
+            payload['keep_alive'] = self.keep_alive
+        return payload
+
+    def __iter__(self) -> Iterator[str]:
+        # A chamada de teste do disjuntor meio aberto só é liberada quando a geração começa
+        if self.breaker is not None and not self.breaker.allow():
+            raise OllamaUnavailable("Servidor Ollama indisponível")
+        chunks = []
+        reachable = True
+        try:
+            for text in self._generate():
+                chunks.append(text)
+                yield text
+        except requests.RequestException as e:
+            # Só falhas de conexão contam contra o servidor: um erro HTTP (ex.: modelo
+            # inexistente) mostra que ele está no ar
+            reachable = isinstance(e, requests.HTTPError)
+            raise
+        finally:
+            # Sempre resolver o disjuntor, inclusive após uma linha {"error": ...}, uma
+            # resposta inválida ou uma geração abandonada (GeneratorExit)
+            if self.breaker is not None:
+                if reachable:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+        if self.on_complete is not None:
+            self.on_complete(''.join(chunks))
+
+    def _generate(self) -> Iterator[str]:
+        post = self.session.post if self.session is not None else requests.post
+        start = time.perf_counter()
+        first_token_at = None
+        chunks = 0
+        final: Dict[str, Any] = {}
+
+        with post(f"{self.base_url}/api/generate", json=self._payload(), stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if 'error' in message:
+                    raise RuntimeError(message['error'])
+                text = message.get('response', '')
+                if text:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        self.stats.time_to_first_token = first_token_at - start
+                    chunks += 1
+                    yield text
+                if message.get('done'):
+                    final = message
+                    break
+
+        end = time.perf_counter()
+        self.stats.total_time = end - start
+        self.stats.completion_tokens = final.get('eval_count', chunks)
+        self.stats.prompt_tokens = final.get('prompt_eval_count', 0)
+        if 'load_duration' in final:
+            self.stats.load_time = final['load_duration'] / 1e9
+        if final.get('eval_duration'):
+            self.stats.tokens_per_second = final['eval_count'] / (final['eval_duration'] / 1e9)
+        elif first_token_at is not None and end > first_token_at:
+            self.stats.tokens_per_second = chunks / (end - first_token_at)
+
+
+
+@dataclass
+class WarmupStatus:
+    """
+    Estado do pré-carregamento (aquecimento) de um modelo no Ollama.
+
+    Attributes:
+        model (str): Modelo
+        state (str): 'loading', 'ready' ou 'failed'
+        load_time (Optional[float]): Duração da requisição de aquecimento em segundos
+        error (Optional[str]): Erro do último aquecimento, se falhou
+        last_used (float): time.monotonic() da última requisição concluída com o modelo
+    """
+    model: str
+    state: str = 'loading'
+    load_time: Optional[float] = None
+    error: Optional[str] = None
+    last_used: float = 0.0
+    # Sinalizado quando o carregamento termina (com sucesso ou não)
+    done: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+
+
+class CircuitBreaker:
+    """
+    Disjuntor para chamadas ao Ollama.
+
+    Após failure_threshold falhas seguidas o circuito abre e as chamadas falham
+    imediatamente, sem rede, por reset_timeout segundos. Depois disso uma única
+    chamada de teste é liberada (meio aberto): se funcionar o circuito fecha, se
+    falhar ele abre de novo. Só falhas de conexão contam: qualquer resposta do
+    servidor, mesmo de erro (ex.: modelo inexistente), mostra que ele está no ar.
+    """
+
+    def __init__(self, failure_threshold: int = 1, reset_timeout: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+                return False
+            # Meio aberto: liberar apenas uma chamada de teste
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class OllamaClient:
+    """
+    Acesso compartilhado ao servidor Ollama.
+
+    Usa uma única requests.Session (conexões keep-alive reaproveitadas entre as
+    execuções do script e as sessões do Streamlit), timeouts de conexão e leitura em
+    todas as chamadas e um CircuitBreaker. A lista de modelos fica em cache por
+    models_ttl segundos; quando expira, a versão anterior continua sendo devolvida
+    enquanto uma thread em segundo plano a atualiza.
+
+    warm_up carrega um modelo em segundo plano (requisição sem prompt) para que a
+    primeira pergunta não espere o carregamento. Todas as requisições enviam
+    keep_alive, e o modelo é considerado aquecido até keep_alive segundos após a
+    última requisição concluída (depois disso o Ollama o descarrega).
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, timeout: tuple = (1.0, 3.0),
+                 generate_timeout: tuple = (3.05, 120), models_ttl: float = 30.0,
+                 breaker: Optional[CircuitBreaker] = None, session: Optional[requests.Session] = None,
+                 keep_alive: Union[str, float, None] = DEFAULT_KEEP_ALIVE, tracer: Optional[Tracer] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.generate_timeout = generate_timeout
+        self.models_ttl = models_ttl
+        self.keep_alive = keep_alive
+        self._keep_alive_seconds = keep_alive_seconds(keep_alive)
+        self.tracer = tracer
+        self.breaker = breaker or CircuitBreaker()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.last_error: Optional[str] = None
+
+        self._models: Optional[List[str]] = None
+        self._models_fetched_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._warmup: Dict[str, WarmupStatus] = {}
+
+    def _fetch_models(self) -> List[str]:
+        if not self.breaker.allow():
+            raise OllamaUnavailable(self.last_error or "Servidor Ollama indisponível")
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            self.last_error = str(e)
+            raise OllamaUnavailable(self.last_error) from e
+        # O servidor respondeu: o circuito fecha mesmo que a resposta seja um erro
+        self.breaker.record_success()
+        try:
+            response.raise_for_status()
+            models = [model["name"] for model in response.json().get("models", [])]
+        except (requests.RequestException, ValueError) as e:
+            self.last_error = str(e)
+            raise OllamaUnavailable(self.last_error) from e
+
+        self.last_error = None
+        with self._lock:
+            self._models = models
+            self._models_fetched_at = time.monotonic()
+        return models
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self._fetch_models()
+        except OllamaUnavailable:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def list_models(self) -> List[str]:
+        """
+        Retorna os nomes dos modelos instalados, ou [] se o Ollama estiver fora do ar.
+        """
+        with self._lock:
+            models = self._models
+            stale = time.monotonic() - self._models_fetched_at >= self.models_ttl
+            if models is not None and stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        if models is not None:
+            return models if self.last_error is None else []
+
+        try:
+            return self._fetch_models()
+        except OllamaUnavailable:
+            return []
+
+    def is_available(self) -> bool:
+        self.list_models()
+        return self.last_error is None and self.breaker.state != 'open'
+
+    def has_model(self, model_name: str) -> bool:
+        return model_name in self.list_models()
+
+    def _is_warm(self, status: Optional[WarmupStatus]) -> bool:
+        if status is None or status.state != 'ready':
+            return False
+        return self._keep_alive_seconds is None or time.monotonic() - status.last_used < self._keep_alive_seconds
+
+    def is_warm(self, model: str) -> bool:
+        """
+        Se o modelo foi carregado e usado há menos de keep_alive segundos.
+        """
+        with self._lock:
+            return self._is_warm(self._warmup.get(model))
+
+    def warmup_status(self, model: str) -> Optional[WarmupStatus]:
+        with self._lock:
+            return self._warmup.get(model)
+
+    def warm_up(self, model: str, options: Optional[Dict[str, Any]] = None, wait: bool = False) -> WarmupStatus:
+        """
+        Carrega o modelo no Ollama em uma thread em segundo plano, se ele ainda não
+        estiver aquecido nem sendo carregado. Com wait, espera o carregamento terminar.
+
+        As opções devem ser as mesmas das gerações (padrão: DEFAULT_OPTIONS): o Ollama
+        recarrega o modelo quando opções como num_ctx mudam.
+        """
+        with self._lock:
+            status = self._warmup.get(model)
+            start = status is None or (status.state != 'loading' and not self._is_warm(status))
+            if start:
+                status = self._warmup[model] = WarmupStatus(model)
+        if start:
+            threading.Thread(target=self._load, args=(status, options), daemon=True,
+                             name=f"nabu-warmup-{model}").start()
+        if wait and status.state == 'loading':
+            status.done.wait()
+        return status
+
+    def _load(self, status: WarmupStatus, options: Optional[Dict[str, Any]]) -> None:
+        # Requisição sem prompt: o Ollama só carrega o modelo e o mantém por keep_alive
+        payload = {'model': status.model, 'prompt': '', 'stream': False,
+                   'options': dict(DEFAULT_OPTIONS if options is None else options)}
+        if self.keep_alive is not None:
+            payload['keep_alive'] = self.keep_alive
+        if not self.breaker.allow():
+            self._finish_load(status, 'failed', 0.0, self.last_error or "Servidor Ollama indisponível")
+            return
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload,
+                                         timeout=self.generate_timeout)
+        except requests.RequestException as e:
+            # Servidor fora do ar: abre o circuito como as demais chamadas
+            self.breaker.record_failure()
+            self._finish_load(status, 'failed', time.perf_counter() - start, str(e))
+            return
+        self.breaker.record_success()
+        try:
+            # Erros do Ollama (ex.: modelo inexistente) vêm no corpo, inclusive com status 4xx
+            message = response.json()
+            if 'error' in message:
+                raise RuntimeError(message['error'])
+            response.raise_for_status()
+        except (requests.RequestException, ValueError, RuntimeError) as e:
+            # Modelo inexistente ou resposta inválida: o servidor continua disponível
+            self._finish_load(status, 'failed', time.perf_counter() - start, str(e))
+            return
+        load_time = time.perf_counter() - start
+        self._finish_load(status, 'ready', load_time)
+        if self.tracer is not None:
+            self.tracer.record('llm_warmup', load_time)
+
+    def _finish_load(self, status: WarmupStatus, state: str, load_time: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            status.load_time = load_time
+            status.error = error
+            status.last_used = time.monotonic()
+            status.state = state
+        status.done.set()
+
+    def _mark_used(self, model: str) -> None:
+        # Geração concluída: o modelo está carregado e o keep_alive recomeça a contar
+        with self._lock:
+            status = self._warmup.get(model)
+            if status is None or status.state == 'failed':
+                status = self._warmup[model] = WarmupStatus(model, state='ready')
+                status.done.set()
+            status.last_used = time.monotonic()
+
+    def unload(self, model: str) -> None:
+        """
+        Pede ao Ollama para descarregar o modelo (keep_alive=0), ex.: para medir a latência com o modelo frio.
+        """
+        with self._lock:
+            self._warmup.pop(model, None)
+        response = self.session.post(f"{self.base_url}/api/generate", json={'model': model, 'keep_alive': 0},
+                                     timeout=self.generate_timeout)
+        response.raise_for_status()
+
+    def stream(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+               on_complete: Optional[Callable[[str], None]] = None) -> OllamaStream:
+        # Circuito aberto: falhar já, sem rede (a chamada de teste é liberada na iteração)
+        if self.breaker.state == 'open':
+            raise OllamaUnavailable(self.last_error or "Servidor Ollama indisponível")
+
+        def completed(text: str) -> None:
+            self._mark_used(model)
+            if on_complete is not None:
+                on_complete(text)
+
+        stream = OllamaStream(model, prompt, self.base_url, options, self.generate_timeout,
+                              session=self.session, breaker=self.breaker, on_complete=completed,
+                              keep_alive=self.keep_alive)
+        stream.stats.warm = self.is_warm(model)
+        return stream
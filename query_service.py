@@ -0,0 +1,287 @@
+"""
+Serviço HTTP headless (asyncio) para consultas ao RAG, sem o Streamlit.
+
+Endpoints:
+    POST /answer   {"question": "...", "scorer": "bm25"}          -> {"answers": [...]}
+    POST /context  {"question": "...", "max_documents": 2}        -> {"context": "..."}
+                   ("max_tokens": 300 limita o contexto a um orçamento de tokens estimado)
+    (ambos aceitam "category": "..." para restringir a busca a uma categoria)
+    GET  /health                                                   -> estatísticas do serviço
+    GET  /metrics                                                  -> latência por etapa (Prometheus)
+
+As perguntas que chegam dentro de uma janela curta são agrupadas e pontuadas com
+uma única chamada a RAGManager.retrieve_batch, sobre um único índice em memória ou,
+com --shards N, distribuídas entre N processos (um shard do índice em cada).
+
+Uso:
+    python query_service.py --qa-file qa_pairs.json --port 8502
+    python query_service.py --qa-file qa_pairs.json --port 8502 --shards 4
+"""
+import json
+import asyncio
+import argparse
+import contextvars
+from collections import defaultdict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit, parse_qs
+
+from rag_manager import RAGManager, RetrievalResult
+from dense_index import HashingEmbedder
+from tracing import Tracer
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+MAX_BODY_SIZE = 1 << 20
+
+
+class MicroBatcher:
+    """
+    Agrupa as recuperações pedidas por requisições concorrentes.
+
+    A primeira pergunta da fila abre uma janela de window segundos; tudo o que chegar
+    nesse intervalo (até max_batch perguntas) é pontuado de uma vez, separado por
+    (algoritmo, k, categoria). Sem concorrência (lote anterior com uma única pergunta e fila
+    vazia) a janela é pulada. A pontuação roda em uma única thread de trabalho, para não
+    bloquear o loop de eventos; enquanto um lote é pontuado, o próximo se acumula. As
+    etapas medidas na thread de trabalho entram no trace de cada requisição do lote.
+    """
+
+    def __init__(self, rag_manager: RAGManager, window: float = 0.002, max_batch: int = 256):
+        self.rag_manager = rag_manager
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._last_batch_size = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rag-batch')
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def retrieve(self, query: str, k: int, scorer: Optional[str] = None,
+                       category: Optional[str] = None) -> RetrievalResult:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, k, scorer, category, future, Tracer.current_trace()))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # Só esperar a janela quando há concorrência; uma requisição isolada não paga o atraso
+            if self.window > 0 and (self._last_batch_size > 1 or not self._queue.empty()):
+                await asyncio.sleep(self.window)
+            else:
+                await asyncio.sleep(0)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            groups: Dict[Tuple[int, Optional[str], Optional[str]], List[tuple]] = defaultdict(list)
+            for item in batch:
+                groups[(item[1], item[2], item[3])].append(item)
+
+            for (k, scorer, category), items in groups.items():
+                queries = [item[0] for item in items]
+                try:
+                    with self.rag_manager.tracer.shared_spans([item[5] for item in items]):
+                        # O contexto (com o trace do lote) segue para a thread de trabalho
+                        context = contextvars.copy_context()
+                        results = await loop.run_in_executor(
+                            self._executor, context.run,
+                            partial(self.rag_manager.retrieve_batch, queries, k, scorer=scorer, category=category))
+                except Exception as e:
+                    for item in items:
+                        if not item[4].done():
+                            item[4].set_exception(e)
+                    continue
+                for item, result in zip(items, results):
+                    if not item[4].done():
+                        item[4].set_result(result)
+
+            self.batches += 1
+            self.requests += len(batch)
+            self._last_batch_size = len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+class QueryService:
+    """
+    Servidor HTTP/1.1 mínimo (keep-alive, corpo JSON) sobre asyncio.start_server.
+    """
+
+    def __init__(self, rag_manager: RAGManager, window: float = 0.002, max_batch: int = 256):
+        self.rag_manager = rag_manager
+        self.batcher = MicroBatcher(rag_manager, window, max_batch)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8502) -> asyncio.AbstractServer:
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port, backlog=1024)
+        return self._server
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {'error': 'Corpo da requisição muito grande'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version.strip() == 'HTTP/1.1'
+                status, payload = await self._dispatch(method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Union[Dict[str, Any], str],
+                       keep_alive: bool) -> None:
+        if isinstance(payload, str):
+            # Texto puro (formato de exposição do Prometheus)
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8'
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Union[Dict[str, Any], str]]:
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'documents': len(self.rag_manager.qa_pairs), **self.batcher.stats()}
+        if url.path == '/metrics':
+            return 200, self.rag_manager.tracer.prometheus_text()
+        if url.path not in ('/answer', '/context'):
+            return 404, {'error': f"Rota desconhecida: {url.path}"}
+
+        if method == 'GET':
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        elif method == 'POST':
+            try:
+                params = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {'error': 'JSON inválido'}
+        else:
+            return 405, {'error': f"Método não permitido: {method}"}
+
+        question = params.get('question') if isinstance(params, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            return 400, {'error': "Campo 'question' obrigatório"}
+        scorer = params.get('scorer')
+        if scorer is not None and scorer not in self.rag_manager.scorers:
+            return 400, {'error': f"Algoritmo de similaridade desconhecido: {scorer}"}
+        category = params.get('category')
+        if category is not None and not isinstance(category, str):
+            return 400, {'error': "Campo 'category' deve ser um texto"}
+
+        try:
+            if url.path == '/answer':
+                with self.rag_manager.tracer.trace('answer'):
+                    result = await self.batcher.retrieve(question, self.rag_manager.max_documents, scorer, category)
+                    return 200, {'answers': self.rag_manager.get_answer(question, result)}
+
+            max_documents = int(params.get('max_documents', 2))
+            if max_documents < 1:
+                return 400, {'error': "'max_documents' deve ser maior que zero"}
+            max_tokens = params.get('max_tokens')
+            if max_tokens is not None:
+                max_tokens = int(max_tokens)
+                if max_tokens < 1:
+                    return 400, {'error': "'max_tokens' deve ser maior que zero"}
+            with self.rag_manager.tracer.trace('context'):
+                result = await self.batcher.retrieve(question, max_documents, scorer, category)
+                context = self.rag_manager.get_relevant_context(question, max_documents, result, max_tokens=max_tokens)
+                return 200, {'context': context}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+
+async def serve(rag_manager: RAGManager, host: str, port: int, window: float, max_batch: int) -> None:
+    service = QueryService(rag_manager, window, max_batch)
+    server = await service.start(host, port)
+    port = server.sockets[0].getsockname()[1]
+    print(f"Nabu query service em http://{host}:{port} ({len(rag_manager.qa_pairs)} documentos)", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serviço HTTP de consultas do Nabu')
+    parser.add_argument('--qa-file', default='qa_pairs.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--max-documents', type=int, default=2)
+    parser.add_argument('--window-ms', type=float, default=2.0,
+                        help='Janela de agrupamento das requisições, em milissegundos')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--dense', action='store_true', help='Habilitar a busca semântica (HashingEmbedder)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Processos de pontuação (0: pontuar no próprio processo)')
+    parser.add_argument('--watch-interval', type=float, default=2.0,
+                        help='Intervalo em segundos para recarregar edições do --qa-file (0: desligado)')
+    parser.add_argument('--trace-file', help='Log JSONL com as etapas de cada requisição')
+    parser.add_argument('--metrics-file', help='Métricas no formato texto do Prometheus (pode ser o mesmo do app)')
+    args = parser.parse_args()
+
+    tracer = Tracer(trace_file=args.trace_file, metrics_file=args.metrics_file)
+    rag_manager = RAGManager(qa_file=args.qa_file, max_documents=args.max_documents,
+                             embedder=HashingEmbedder() if args.dense else None, shards=args.shards,
+                             watch_interval=args.watch_interval, tracer=tracer)
+    try:
+        asyncio.run(serve(rag_manager, args.host, args.port, args.window_ms / 1000, args.max_batch))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rag_manager.close()
+        tracer.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,113 +1,503 @@
 import os
 import json
-import re
+import time
+import threading
 import numpy as np
 import streamlit as st
-from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass, field, replace
+from itertools import chain, islice
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator, Callable, IO
 from collections import Counter
+from sparse_engine import SparseScoringEngine
+from scorers import Scorer, DenseScorer, SCORERS, select_top_k
+from dense_index import Embedder
+from ingest import QARecordReader, JSONArrayReader
+from lexical_index import LexicalIndex, atomic_write, file_fingerprint, select_rows
+from document_store import DocumentStore
+from category_index import CategoryIndex
+from fuzzy_index import FuzzyTermIndex
+from context_packer import pack_context
+from result_cache import QueryResultCache
+from tracing import Tracer
+from sharding import ShardPool
+from file_watcher import FileWatcher
+from tokenizer import TOKENIZER_VERSION, encode
+
+
+@dataclass(frozen=True)
+class RetrievalResult:
+    """
+    Resultado de uma única pontuação da query, reutilizável por get_answer e
+    get_relevant_context.
+    
+    Attributes:
+        query (str): Pergunta original
+        hits (List[Tuple[int, float]]): (índice do documento, similaridade) em ordem decrescente
+        k (int): Quantidade máxima de documentos selecionados
+        scorer (str): Nome do algoritmo de similaridade usado
+        category (Optional[str]): Categoria à qual a busca foi restrita (None: todas)
+    """
+    query: str
+    hits: List[Tuple[int, float]]
+    k: int
+    scorer: str = 'jaccard'
+    category: Optional[str] = None
+    # Versão do corpus pontuada: os documentos de hits são lidos dela
+    version: Optional['IndexVersion'] = field(default=None, repr=False, compare=False)
+
+
+@dataclass(frozen=True)
+class IndexVersion:
+    """
+    Versão imutável do corpus usada pelas leituras (snapshot isolation).
+    
+    Documentos, índice e scorers são snapshots que compartilham os arrays das
+    estruturas mantidas pelo RAGManager, limitados aos documentos existentes na
+    publicação. Uma consulta lê self._version uma única vez e usa só essa versão:
+    inclusões e recargas publicam uma versão nova com uma única atribuição, sem
+    esperar as leituras em andamento e sem alterar o que elas veem.
+    
+    Attributes:
+        documents (DocumentStore): Pares de QA da versão
+        index (LexicalIndex): Índice invertido da versão
+        scorers (Dict[str, Scorer]): Algoritmos de similaridade sobre o índice da versão
+        category_index (CategoryIndex): Sub-índices por categoria (consultados com n_documents)
+        fuzzy_index (Optional[FuzzyTermIndex]): Correção de erros de digitação
+        shards (Optional[ShardPool]): Processos dos shards (modo distribuído)
+    """
+    documents: DocumentStore
+    index: LexicalIndex
+    scorers: Dict[str, Scorer]
+    category_index: CategoryIndex
+    fuzzy_index: Optional[FuzzyTermIndex] = None
+    shards: Optional[ShardPool] = None
+    
+    @property
+    def n_documents(self) -> int:
+        return self.index.n_documents
+
 
 class RAGManager:
-    def __init__(self, qa_file: str = 'qa_pairs.json', max_documents: int = 3):
+    def __init__(self, qa_file: str = 'qa_pairs.json', max_documents: int = 3,
+                 compact_threshold: int = 1000, cache_size: int = 1024, cache_ttl: float = 3600.0,
+                 default_scorer: str = 'jaccard', embedder: Optional[Embedder] = None,
+                 tracer: Optional[Tracer] = None, shards: int = 0, watch_interval: float = 0.0,
+                 fuzzy: bool = True):
         self.qa_file = qa_file
         self.max_documents = max_documents
-        self.qa_pairs = []
-        self.keywords = []
+        self.default_scorer = default_scorer
+        # Journal append-only com as inclusões ainda não compactadas no arquivo principal
+        self.journal_file = f"{os.path.splitext(qa_file)[0]}.journal.jsonl"
+        self.compact_threshold = compact_threshold
+        self._compacted_count = 0
+        self._journal_count = 0
+        self._wrap_qa_pairs = False
+        self._write_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        # Snapshots binários do índice e dos documentos, atrelados ao conteúdo do arquivo principal
+        self.snapshot_file = f"{os.path.splitext(qa_file)[0]}.index.bin"
+        self.documents_file = f"{os.path.splitext(qa_file)[0]}.docs.bin"
+        self._source: Optional[Dict[str, Any]] = None
+        # Estruturas atualizadas pelas escritas (sob _write_lock); as leituras usam a versão publicada
+        # Pares de QA em arrays e em uma arena de texto (ver DocumentStore)
+        self._documents = DocumentStore()
+        # Índice invertido: termo -> postings (documento, frequência)
+        self._index = LexicalIndex()
+        # Algoritmos de similaridade disponíveis, com estatísticas mantidas a cada inclusão
+        self._scorers: Dict[str, Scorer] = {}
+        # Cache de resultados compartilhado entre as sessões (invalidado a cada alteração do corpus)
+        self.result_cache = QueryResultCache(max_size=cache_size, ttl=cache_ttl)
+        # Latência por etapa (normalize, score, rank)
+        self.tracer = tracer if tracer is not None else Tracer()
         
         # Carregar dados existentes
         self._load_data()
         
-        # Extrair keywords
-        self.keywords = self._extract_keywords()
+        # Construir o índice (a partir do snapshot quando ainda válido)
+        self._index = self._build_index()
+        self._scorers = {name: scorer_class(self._index) for name, scorer_class in SCORERS.items()}
+        # Busca densa opcional (embeddings das perguntas em um índice ANN)
+        if embedder is not None:
+            questions = [qa.question for qa in self._documents]
+            self._scorers[DenseScorer.name] = DenseScorer(self._index, embedder, questions)
+        # Sub-índices por categoria, construídos na primeira busca filtrada
+        category_index = CategoryIndex(self._index, self._documents)
+        # Correção de erros de digitação nas queries (trigramas sobre o vocabulário)
+        fuzzy_index = FuzzyTermIndex(self._index) if fuzzy else None
+        # Modo distribuído opcional: os scorers lexicais rodam em processos, um por shard
+        pool = None
+        if shards > 0:
+            snapshot_file = self.snapshot_file if self._index.base_documents else None
+            pool = ShardPool(self._index, snapshot_file, shards, tracer=self.tracer)
+        self._version: IndexVersion
+        self._publish(category_index, fuzzy_index, pool)
+        # Recarga automática quando o arquivo principal é editado
+        self.watcher: Optional[FileWatcher] = None
+        if watch_interval > 0:
+            self.watcher = FileWatcher(self.qa_file, self.reload, watch_interval)
+            self.watcher.start()
+    
+    def close(self) -> None:
+        """
+        Encerra a observação do arquivo principal e os processos dos shards (modo distribuído).
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        with self._write_lock:
+            shards = self.shards
+            if shards is not None:
+                # Leituras em andamento com a versão anterior pontuam no próprio processo
+                self._version = replace(self._version, shards=None)
+        if shards is not None:
+            shards.close()
+    
+    def _publish(self, category_index: CategoryIndex, fuzzy_index: Optional[FuzzyTermIndex],
+                 shards: Optional[ShardPool]) -> None:
+        # Nova versão de leitura com os documentos atuais, publicada em uma única atribuição
+        # (chamado sob _write_lock ou na inicialização); depois dela, o cache é invalidado
+        index = self._index.snapshot()
+        self._version = IndexVersion(
+            documents=self._documents.snapshot(),
+            index=index,
+            scorers={name: scorer.snapshot(index) for name, scorer in self._scorers.items()},
+            category_index=category_index,
+            # Correções só para termos com documentos nesta versão, com cache próprio
+            fuzzy_index=fuzzy_index.snapshot(index) if fuzzy_index is not None else None,
+            shards=shards,
+        )
+        self.result_cache.invalidate()
+    
+    # Visões da versão publicada (somente leitura)
+    @property
+    def qa_pairs(self) -> DocumentStore:
+        return self._version.documents
+    
+    @property
+    def index(self) -> LexicalIndex:
+        return self._version.index
+    
+    @property
+    def scorers(self) -> Dict[str, Scorer]:
+        return self._version.scorers
+    
+    @property
+    def category_index(self) -> CategoryIndex:
+        return self._version.category_index
+    
+    @property
+    def fuzzy_index(self) -> Optional[FuzzyTermIndex]:
+        return self._version.fuzzy_index
+    
+    @property
+    def shards(self) -> Optional[ShardPool]:
+        return self._version.shards
     
     def _load_data(self) -> None:
+        self._documents = DocumentStore()
         try:
             if os.path.exists(self.qa_file):
-                with open(self.qa_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict) and 'qa_pairs' in data:
-                        self.qa_pairs = data['qa_pairs']
-                    elif isinstance(data, list):
-                        self.qa_pairs = data
-                    else:
-                        self.qa_pairs = []
-            else:
-                self.qa_pairs = []
+                self._documents = self._read_qa_file()
         except Exception as e:
             st.warning(f"Erro ao carregar dados: {str(e)}")
-            self.qa_pairs = []
-    
-    def _extract_keywords(self) -> List[Counter]:
-        keywords = []
-        for qa in self.qa_pairs:
-            # Normalizar texto
-            text = qa['question'].lower()
-            # Remover pontuações
-            text = re.sub(r'[^\w\s]', '', text)
-            # Extrair palavras com mais de 3 caracteres
-            words = [word for word in text.split() if len(word) > 3]
-            # Contar frequência das palavras
-            word_counts = Counter(words)
-            keywords.append(word_counts)
-        return keywords
-    
-    def _compute_similarity(self, query: str) -> List[float]:
-        if not self.qa_pairs or not self.keywords:
-            return []
+            self._documents = DocumentStore()
         
-        # Normalizar query
-        query = query.lower()
-        query = re.sub(r'[^\w\s]', '', query)
-        query_words = [word for word in query.split() if len(word) > 3]
+        self._compacted_count = len(self._documents)
+        # Reaplicar inclusões registradas no journal (inclusive de uma compactação interrompida)
+        source_hash = self._file_fingerprint()['sha256'] if os.path.exists(self.qa_file) else None
+        for path in (self._compacting_file, self.journal_file):
+            self._replay_journal(path, self._documents, source_hash)
+        self._journal_count = len(self._documents) - self._compacted_count
+    
+    def _read_qa_file(self) -> DocumentStore:
+        documents = self._load_documents_snapshot()
+        if documents is None:
+            # Leitura em streaming: a lista de dicionários nunca existe inteira em memória
+            documents = DocumentStore()
+            reader = JSONArrayReader(self.qa_file)
+            for qa in reader:
+                documents.append(qa.get('question', ''), qa.get('answer', ''), qa.get('category'))
+            self._wrap_qa_pairs = reader.wrapped
+            if len(documents):
+                documents = self._seal(documents, self.documents_file)
+        return documents
+    
+    @property
+    def _compacting_file(self) -> str:
+        return f"{self.journal_file}.compacting"
+    
+    @staticmethod
+    def _journal_entries(f: IO) -> Iterator[Dict[str, Any]]:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Linha incompleta (escrita interrompida): ignorar
+                continue
+    
+    def _replay_journal(self, path: str, documents: DocumentStore, source_hash: Optional[str]) -> None:
+        """
+        Reaplica as inclusões do journal em documents, exceto as que já estão no arquivo
+        principal: as anteriores a uma marca de compactação com o hash (source_hash) do
+        arquivo principal atual (ver _mark_compacted).
+        """
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                compacted = 0
+                for position, entry in enumerate(self._journal_entries(f), 1):
+                    if 'compacted' in entry and entry['compacted'] == source_hash:
+                        compacted = position
+                f.seek(0)
+                for position, entry in enumerate(self._journal_entries(f), 1):
+                    if position > compacted and 'compacted' not in entry:
+                        documents.append(entry['question'], entry['answer'], entry.get('category'))
+        except Exception as e:
+            st.warning(f"Erro ao carregar journal: {str(e)}")
+    
+    # Versão da normalização de texto; snapshots gerados com outra versão são descartados
+    TOKENIZER_VERSION = TOKENIZER_VERSION
+    
+    def _encode(self, text: str, index: Optional[LexicalIndex] = None, add: bool = False) -> Counter:
+        # Frequências por ID de termo; na indexação, termos novos entram no vocabulário
+        index = self._index if index is None else index
+        return encode(text, index.vocabulary, index.term_id if add else None)
+    
+    @staticmethod
+    def _encode_query(query: str, version: IndexVersion) -> Counter:
+        # Nas queries, termos desconhecidos são trocados pelo termo mais próximo (se houver)
+        if version.fuzzy_index is not None:
+            return encode(query, version.index.vocabulary, correct=version.fuzzy_index.correct)
+        return encode(query, version.index.vocabulary)
+    
+    def _file_fingerprint(self) -> Dict[str, Any]:
+        # Hash do arquivo principal, recalculado apenas quando tamanho ou mtime mudam
+        current = file_fingerprint(self.qa_file, with_hash=False)
+        if self._source is None or (self._source['size'], self._source['mtime_ns']) != (current['size'], current['mtime_ns']):
+            self._source = file_fingerprint(self.qa_file)
+        return self._source
+    
+    def _snapshot_source(self) -> Dict[str, Any]:
+        return {**self._file_fingerprint(), 'tokenizer': self.TOKENIZER_VERSION}
+    
+    def _valid_snapshot(self, header: Optional[Dict[str, Any]]) -> bool:
+        if header is None:
+            return False
+        source = header['source']
+        current = file_fingerprint(self.qa_file, with_hash=False)
+        if source.get('tokenizer') != self.TOKENIZER_VERSION:
+            return False
+        if (source['size'], source['mtime_ns']) != (current['size'], current['mtime_ns']):
+            # mtime alterado sem mudança de tamanho: confirmar pelo hash do conteúdo
+            if source['size'] != current['size'] or self._file_fingerprint()['sha256'] != source['sha256']:
+                return False
+        return True
+    
+    def _load_documents_snapshot(self) -> Optional[DocumentStore]:
+        try:
+            header = DocumentStore.read_header(self.documents_file)
+            if not self._valid_snapshot(header):
+                return None
+            documents = DocumentStore.load(self.documents_file, header)
+        except Exception as e:
+            st.warning(f"Erro ao carregar snapshot dos documentos: {str(e)}")
+            return None
+        # O formato do arquivo principal ({"qa_pairs": [...]} ou lista) é preservado na compactação
+        with open(self.qa_file, 'r', encoding='utf-8') as f:
+            self._wrap_qa_pairs = f.read(64).lstrip().startswith('{')
+        return documents
+    
+    def _load_snapshot(self) -> Optional[LexicalIndex]:
+        header = LexicalIndex.read_header(self.snapshot_file)
+        if header is None or header['n_documents'] != self._compacted_count or not self._valid_snapshot(header):
+            return None
+        return LexicalIndex.load(self.snapshot_file, header)
+    
+    def _save_snapshot(self, index: LexicalIndex, n_documents: int) -> None:
+        try:
+            source = self._snapshot_source()
+            index.save(self.snapshot_file, source, n_documents)
+            self._documents.save(self.documents_file, source, n_documents)
+        except Exception as e:
+            st.warning(f"Erro ao salvar snapshot do índice: {str(e)}")
+    
+    def _seal(self, segment: Any, path: str) -> Any:
+        """
+        Grava o snapshot de uma estrutura recém-construída (LexicalIndex ou
+        DocumentStore) e a substitui pela versão mapeada do disco, liberando os
+        arrays em memória.
+        """
+        try:
+            segment.save(path, self._snapshot_source())
+            return type(segment).load(path)
+        except Exception as e:
+            st.warning(f"Erro ao salvar snapshot: {str(e)}")
+            return segment
+    
+    def _build_index(self) -> LexicalIndex:
+        index = None
+        if self._compacted_count and os.path.exists(self.qa_file):
+            try:
+                index = self._load_snapshot()
+            except Exception as e:
+                st.warning(f"Erro ao carregar snapshot do índice: {str(e)}")
         
-        if not query_words:
-            return [0] * len(self.qa_pairs)
+        if index is None:
+            index = LexicalIndex()
+            for doc_id in range(self._compacted_count):
+                # Contar frequência dos termos
+                index.add_document(self._encode(self._documents.text(doc_id, 0), index, add=True))
+            if self._compacted_count and os.path.exists(self.qa_file):
+                index = self._seal(index, self.snapshot_file)
+        # Indexar o que o snapshot não cobre (inclusões registradas no journal)
+        for doc_id in range(index.n_documents, len(self._documents)):
+            index.add_document(self._encode(self._documents.text(doc_id, 0), index, add=True))
+        return index
+    
+    @staticmethod
+    def _sharded(scorer: Scorer, version: IndexVersion) -> bool:
+        return version.shards is not None and scorer.name in version.shards.scorers
+    
+    def _shard_search(self, scorer: Scorer, queries: List[Counter], texts: List[str], k: int,
+                      version: IndexVersion) -> List[List[Tuple[int, float]]]:
+        try:
+            return version.shards.search(scorer.name, queries, k, version.n_documents)
+        except RuntimeError:
+            if version.shards is self.shards:
+                raise
+            # Shards da versão lida já encerrados (recarga ou close): pontuar no próprio processo
+            return [self._select_top_k(scorer.score(query_counts, text), k)
+                    for query_counts, text in zip(queries, texts)]
+    
+    def _get_scorer(self, scorer: Optional[str], version: Optional[IndexVersion] = None) -> Scorer:
+        scorers = (version or self._version).scorers
+        name = scorer or self.default_scorer
+        if name not in scorers:
+            raise ValueError(f"Algoritmo de similaridade desconhecido: {name}")
+        return scorers[name]
+    
+    @staticmethod
+    def _select_top_k(scores: Dict[int, float], k: int) -> List[Tuple[int, float]]:
+        return select_top_k(scores.items(), k)
+    
+    def categories(self) -> List[str]:
+        """
+        Categorias existentes na base, em ordem alfabética.
+        """
+        return self.category_index.categories()
+    
+    def _category_hits(self, scorer: Scorer, query_counts: Counter, query: str, k: int,
+                       category: str, version: IndexVersion) -> List[Tuple[int, float]]:
+        # Scorers lexicais percorrem só as postings do sub-índice da categoria (IDs locais,
+        # em ordem crescente dos IDs globais, então o desempate do top-k é o mesmo)
+        subindex = version.category_index.get(category, version.n_documents)
+        if subindex is None:
+            return []
+        index, doc_ids = subindex
+        if scorer.uses_text:
+            # Busca semântica restrita aos documentos da categoria (IDs globais da versão)
+            members = np.frombuffer(doc_ids[:index.n_documents], dtype=np.int32)
+            with self.tracer.span('score'):
+                scores = scorer.search(query, k, members)
+            with self.tracer.span('rank'):
+                return self._select_top_k(scores, k)
+        with self.tracer.span('score'):
+            scores = scorer.score(query_counts, query, index=index)
+        with self.tracer.span('rank'):
+            return [(doc_ids[doc_id], score) for doc_id, score in self._select_top_k(scores, k)]
+    
+    def retrieve(self, query: str, k: Optional[int] = None, scorer: Optional[str] = None,
+                 category: Optional[str] = None) -> RetrievalResult:
+        """
+        Pontua a query uma única vez e seleciona os k documentos mais similares.
         
-        # Contar frequência das palavras na query
-        query_counts = Counter(query_words)
+        Args:
+            query (str): Pergunta do usuário
+            k (Optional[int]): Quantidade de documentos (padrão: max_documents)
+            scorer (Optional[str]): Algoritmo de similaridade (padrão: default_scorer)
+            category (Optional[str]): Restringe a busca aos documentos da categoria
         
-        # Calcular similaridade com cada documento
-        similarities = []
-        for doc_counts in self.keywords:
-            if not doc_counts:
-                similarities.append(0)
-                continue
-                
-            # Calcular interseção de palavras
-            intersection = sum((query_counts & doc_counts).values())
-            # Calcular união de palavras
-            union = sum(query_counts.values()) + sum(doc_counts.values()) - intersection
-            
-            # Similaridade de Jaccard ponderada
-            if union > 0:
-                similarities.append(intersection / union)
-            else:
-                similarities.append(0)
+        Returns:
+            RetrievalResult: Resultado reutilizável por get_answer e get_relevant_context
+        """
+        k = self.max_documents if k is None else k
+        # Geração do cache lida antes da versão: um resultado de uma versão já substituída
+        # nunca é gravado no cache (ver _publish)
+        generation = self.result_cache.generation
+        version = self._version
+        scorer = self._get_scorer(scorer, version)
+        with self.tracer.span('normalize'):
+            query_counts = self._encode_query(query, version)
         
-        return similarities
+        # Perguntas com o mesmo multiconjunto de termos compartilham o resultado
+        # (scorers sobre o texto original usam o texto normalizado)
+        query_key = ' '.join(query.lower().split()) if scorer.uses_text else frozenset(query_counts.items())
+        cache_key = (query_key, k, scorer.name, category)
+        cached = self.result_cache.get(cache_key)
+        # Entre a publicação de uma versão e a invalidação do cache, o cache ainda pode ter
+        # resultados da versão anterior: só vale o resultado calculado na versão lida
+        if cached is not None and cached.version is version:
+            return replace(cached, query=query)
+        
+        if category is not None:
+            # Busca filtrada: no processo atual, sobre o sub-índice (menor que qualquer shard)
+            hits = self._category_hits(scorer, query_counts, query, k, category, version)
+        elif self._sharded(scorer, version):
+            with self.tracer.span('score'):
+                hits = self._shard_search(scorer, [query_counts], [query], k, version)[0]
+        else:
+            with self.tracer.span('score'):
+                scores = scorer.score(query_counts, query)
+            with self.tracer.span('rank'):
+                hits = self._select_top_k(scores, k)
+        result = RetrievalResult(query, hits, k, scorer.name, category, version)
+        self.result_cache.put(cache_key, result, generation)
+        return result
+    
+    def _resolve_result(self, query: str, k: int, result: Optional[RetrievalResult],
+                        scorer: Optional[str] = None, category: Optional[str] = None) -> RetrievalResult:
+        # Reaproveitar o resultado recebido quando ele cobre a mesma query, algoritmo, categoria e k
+        if result is not None and result.query == query and result.k >= k \
+                and (scorer is None or result.scorer == scorer) \
+                and (category is None or result.category == category):
+            if result.version is None:
+                # Resultado montado fora de retrieve: documentos da versão atual
+                result = replace(result, version=self._version)
+            return result
+        return self.retrieve(query, k, scorer, category)
     
-    def get_relevant_context(self, query: str, max_documents: int = 2) -> str:
+    def get_relevant_context(self, query: str, max_documents: int = 2,
+                             result: Optional[RetrievalResult] = None, scorer: Optional[str] = None,
+                             category: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+        """
+        Contexto para o LLM com os pares de QA mais relevantes.
+        
+        Com max_tokens, o contexto é montado por pack_context: cabe no orçamento de
+        tokens estimado, sem frases repetidas entre as respostas e com as respostas
+        grandes reduzidas às frases mais relevantes.
+        """
         if not self.qa_pairs:
             return ""
         
         try:
-            # Calcular similaridade com todos os documentos
-            similarities = self._compute_similarity(query)
+            # Pegar os top-k documentos mais relevantes (apenas candidatos do índice)
+            result = self._resolve_result(query, max_documents, result, scorer, category)
+            top_k = result.hits[:max_documents]
+            documents = result.version.documents
             
-            if not similarities:
-                return ""
-                
-            # Converter para array numpy para usar argsort
-            similarities = np.array(similarities)
-            
-            # Pegar os top-k documentos mais relevantes
-            top_k_indices = np.argsort(similarities)[-max_documents:][::-1]
+            if max_tokens is not None:
+                passages = [(qa.question, qa.answer) for qa in
+                            (documents[idx] for idx, similarity in top_k if similarity > 0.1)]
+                return pack_context(query, passages, max_tokens)
             
             # Construir contexto
             context = ""
-            for idx in top_k_indices:
-                if similarities[idx] > 0.1:  # Threshold para similaridade
-                    qa = self.qa_pairs[idx]
-                    context += f"Pergunta: {qa['question']}\nResposta: {qa['answer']}\n\n"
+            for idx, similarity in top_k:
+                if similarity > 0.1:  # Threshold para similaridade
+                    qa = documents[idx]
+                    context += f"Pergunta: {qa.question}\nResposta: {qa.answer}\n\n"
             
             return context.strip()
         except Exception as e:
@@ -115,49 +505,42 @@ class RAGManager:
             # Fallback: retornar primeiro documento se existir
             if self.qa_pairs:
                 qa = self.qa_pairs[0]
-                return f"Pergunta: {qa['question']}\nResposta: {qa['answer']}"
+                return f"Pergunta: {qa.question}\nResposta: {qa.answer}"
             return ""
     
-    def get_answer(self, query: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _format_answers(top_k: List[Tuple[int, float]], documents: DocumentStore) -> List[Dict[str, Any]]:
+        results = []
+        for idx, similarity in top_k:
+            if similarity > 0.1:  # Threshold para similaridade
+                qa = documents[idx]
+                results.append({
+                    'question': qa.question,
+                    'answer': qa.answer,
+                    'category': qa.category,
+                    'similarity': float(similarity)
+                })
+        
+        # Se não encontrou nada, retornar resposta padrão
+        if not results and documents:
+            qa = documents[0]
+            results.append({
+                'question': qa.question,
+                'answer': "Desculpe, não encontrei uma resposta específica para sua pergunta. Tente reformular ou perguntar sobre outro tema.",
+                'category': qa.category,
+                'similarity': 0.1
+            })
+        return results
+    
+    def get_answer(self, query: str, result: Optional[RetrievalResult] = None,
+                   scorer: Optional[str] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
         if not self.qa_pairs:
             return []
         
         try:
-            # Calcular similaridade com todos os documentos
-            similarities = self._compute_similarity(query)
-            
-            if not similarities:
-                return []
-                
-            # Converter para array numpy para usar argsort
-            similarities = np.array(similarities)
-            
-            # Pegar os top-k documentos mais relevantes
-            top_k_indices = np.argsort(similarities)[-self.max_documents:][::-1]
-            
-            # Retornar resultados
-            results = []
-            for idx in top_k_indices:
-                if similarities[idx] > 0.1:  # Threshold para similaridade
-                    qa = self.qa_pairs[idx]
-                    results.append({
-                        'question': qa['question'],
-                        'answer': qa['answer'],
-                        'category': qa.get('category', 'geral'),
-                        'similarity': float(similarities[idx])
-                    })
-            
-            # Se não encontrou nada, retornar resposta padrão
-            if not results and self.qa_pairs:
-                qa = self.qa_pairs[0]
-                results.append({
-                    'question': qa['question'],
-                    'answer': "Desculpe, não encontrei uma resposta específica para sua pergunta. Tente reformular ou perguntar sobre outro tema.",
-                    'category': qa.get('category', 'geral'),
-                    'similarity': 0.1
-                })
-                
-            return results
+            # Pegar os top-k documentos mais relevantes (apenas candidatos do índice)
+            result = self._resolve_result(query, self.max_documents, result, scorer, category)
+            return self._format_answers(result.hits[:self.max_documents], result.version.documents)
         except Exception as e:
             st.warning(f"Erro ao obter resposta: {str(e)}")
             # Fallback: retornar resposta genérica
@@ -168,24 +551,357 @@ class RAGManager:
                 'similarity': 0.0
             }]
   
+    def retrieve_batch(self, queries: List[str], k: Optional[int] = None,
+                       batch_size: int = 1024, scorer: Optional[str] = None,
+                       category: Optional[str] = None) -> List[RetrievalResult]:
+        """
+        Versão em lote de retrieve: pontua as perguntas com uma única multiplicação
+        de matrizes esparsas por lote. Com category, as perguntas são pontuadas uma a
+        uma no sub-índice da categoria (ver retrieve).
+        """
+        k = self.max_documents if k is None else k
+        version = self._version
+        scorer = self._get_scorer(scorer, version)
+        if not version.n_documents:
+            return [RetrievalResult(query, [], k, scorer.name, category, version) for query in queries]
+        if category is not None:
+            return [self.retrieve(query, k, scorer.name, category) for query in queries]
+        
+        # Todas as queries do lote são pontuadas na mesma versão
+        results = []
+        for start in range(0, len(queries), batch_size):
+            chunk = queries[start:start + batch_size]
+            with self.tracer.span('normalize'):
+                query_counts = [self._encode_query(query, version) for query in chunk]
+            if self._sharded(scorer, version):
+                # Mesmo resultado de retrieve: cada shard pontua as queries do lote individualmente
+                with self.tracer.span('score'):
+                    hits = self._shard_search(scorer, query_counts, chunk, k, version)
+                results.extend(RetrievalResult(query, query_hits, k, scorer.name, version=version)
+                               for query, query_hits in zip(chunk, hits))
+                continue
+            with self.tracer.span('score'):
+                scores = scorer.score_batch(query_counts, chunk)
+            with self.tracer.span('rank'):
+                for row, query in enumerate(chunk):
+                    results.append(RetrievalResult(query, SparseScoringEngine.top_k(scores, row, k), k, scorer.name,
+                                                   version=version))
+        return results
+    
+    def get_answers_batch(self, queries: List[str], batch_size: int = 1024,
+                          scorer: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Responde várias perguntas de uma vez usando o motor esparso, com uma única
+        multiplicação de matrizes por lote.
+        
+        Args:
+            queries (List[str]): Perguntas a serem respondidas
+            batch_size (int): Quantidade de perguntas pontuadas por multiplicação
+        
+        Returns:
+            List[List[Dict[str, Any]]]: Para cada pergunta, o mesmo retorno de get_answer
+        """
+        if not self.qa_pairs:
+            return [[] for _ in queries]
+        
+        try:
+            results = self.retrieve_batch(queries, batch_size=batch_size, scorer=scorer)
+            return [self.get_answer(result.query, result) for result in results]
+        except Exception as e:
+            st.warning(f"Erro ao obter respostas em lote: {str(e)}")
+            # Fallback: caminho individual
+            return [self.get_answer(query, scorer=scorer) for query in queries]
+  
     def add_qa_pair(self, question: str, answer: str, category: str = 'geral') -> bool:
+        # Adicionar novo par de QA
+        new_qa = {
+            'question': question,
+            'answer': answer,
+            'category': category
+        }
+        return self.add_qa_pairs([new_qa]) == 1
+    
+    def add_qa_pairs(self, qa_pairs: Iterable[Dict[str, str]]) -> int:
+        """
+        Adiciona vários pares de QA com uma única escrita no journal.
+        
+        Pares sem pergunta ou resposta em texto são ignorados. Os demais são validados e
+        tokenizados antes de qualquer alteração, indexados e só então registrados no journal.
+        
+        Args:
+            qa_pairs (Iterable[Dict[str, str]]): Pares com 'question', 'answer' e 'category'
+        
+        Returns:
+            int: Quantidade de pares adicionados
+        """
+        added = 0
+        invalid = 0
         try:
-            # Adicionar novo par de QA
-            new_qa = {
-                'question': question,
-                'answer': answer,
-                'category': category
-            }
-            self.qa_pairs.append(new_qa)
-            
-            # Atualizar keywords para o novo par
-            self.keywords = self._extract_keywords()
-            
-            # Salvar dados
-            with open(self.qa_file, 'w', encoding='utf-8') as f:
-                json.dump(self.qa_pairs, f, ensure_ascii=False, indent=4)
+            with self._write_lock:
+                entries = []
+                for qa in qa_pairs:
+                    question, answer = qa.get('question'), qa.get('answer')
+                    category = qa.get('category') or 'geral'
+                    if not isinstance(question, str) or not question.strip() or not isinstance(answer, str) \
+                            or not isinstance(category, str):
+                        invalid += 1
+                        continue
+                    entries.append(({'question': question, 'answer': answer, 'category': category},
+                                    self._encode(question, add=True)))
+                if not entries:
+                    return added
                 
-            return True
+                # Indexar apenas os novos documentos, fora da versão publicada (as leituras
+                # em andamento continuam vendo só os documentos anteriores)
+                version = self._version
+                indexed = []
+                lines = []
+                try:
+                    for new_qa, term_counts in entries:
+                        self._documents.append(new_qa['question'], new_qa['answer'], new_qa['category'])
+                        new_id = self._index.add_document(term_counts)
+                        for scorer in self._scorers.values():
+                            scorer.add_document(new_id, term_counts, new_qa['question'])
+                        # Só o sub-índice da categoria do documento é atualizado
+                        version.category_index.add_document(new_id, self._documents.category(new_id), term_counts)
+                        indexed.append((new_id, term_counts))
+                        lines.append(json.dumps(new_qa, ensure_ascii=False) + '\n')
+                    if version.shards is not None:
+                        version.shards.add_documents(indexed)
+                    
+                    # Registrar no journal só o que foi indexado
+                    with open(self.journal_file, 'a', encoding='utf-8') as f:
+                        f.writelines(lines)
+                    self._journal_count += len(lines)
+                    added = len(indexed)
+                finally:
+                    # Publicar o que já está nas estruturas de escrita, mesmo após uma falha,
+                    # para que a versão de leitura e as estruturas não divirjam
+                    if indexed:
+                        self._publish(version.category_index, version.fuzzy_index, version.shards)
+            
+            self._maybe_compact()
         except Exception as e:
             st.warning(f"Erro ao adicionar par de QA: {str(e)}")
-            return False
\ No newline at end of file
+        finally:
+            if invalid:
+                st.warning(f"{invalid} pares de QA sem pergunta ou resposta ignorados")
+        return added
+    
+    def load_stream(self, path: str, chunk_size: int = 10000,
+                    progress: Optional[Callable[[int, int, int], None]] = None) -> int:
+        """
+        Ingere um arquivo JSONL ou CSV em streaming, indexando em blocos.
+        
+        Apenas um bloco de registros fica em memória por vez além do próprio índice.
+        
+        Args:
+            path (str): Arquivo .jsonl/.ndjson ou .csv
+            chunk_size (int): Quantidade de registros por bloco
+            progress (Optional[Callable[[int, int, int], None]]): Chamado após cada bloco
+                com (registros carregados, bytes lidos, bytes totais)
+        
+        Returns:
+            int: Quantidade de pares carregados
+        """
+        reader = QARecordReader(path)
+        records = iter(reader)
+        loaded = 0
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            loaded += self.add_qa_pairs(chunk)
+            if progress is not None:
+                progress(loaded, reader.bytes_read, reader.total_bytes)
+        if reader.skipped:
+            st.warning(f"{reader.skipped} registros inválidos ignorados em {path}")
+        return loaded
+    
+    def _maybe_compact(self) -> None:
+        # Compactar quando o journal passa do limite e de metade do arquivo principal,
+        # mantendo o custo de reescrita amortizado O(1) por inclusão
+        if self._journal_count < max(self.compact_threshold, self._compacted_count // 2):
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compaction_thread.start()
+    
+    def compact(self) -> bool:
+        """
+        Incorpora o journal ao arquivo principal.
+        
+        O journal atual é renomeado para que novas inclusões continuem sendo registradas
+        durante a reescrita; o arquivo principal é gravado em um arquivo temporário e
+        substituído atomicamente. Antes da substituição, o hash do novo arquivo é
+        registrado no journal renomeado: se o processo parar antes de removê-lo, as
+        inclusões já gravadas no arquivo principal não são reaplicadas.
+        
+        Returns:
+            bool: True se a compactação foi concluída
+        """
+        with self._compaction_lock:
+            try:
+                with self._write_lock:
+                    if os.path.exists(self._compacting_file):
+                        # Compactação anterior interrompida: juntar ao journal que será compactado
+                        with open(self._compacting_file, 'a', encoding='utf-8') as dst:
+                            if os.path.exists(self.journal_file):
+                                with open(self.journal_file, 'r', encoding='utf-8') as src:
+                                    dst.write(src.read())
+                                os.remove(self.journal_file)
+                    elif os.path.exists(self.journal_file):
+                        os.replace(self.journal_file, self._compacting_file)
+                    # Os documentos só recebem inclusões: os n primeiros não mudam mais
+                    n_documents = len(self._documents)
+                    self._journal_count = 0
+                
+                with atomic_write(self.qa_file, before_replace=self._mark_compacted) as f:
+                    self._documents.write_json(f, n_documents, self._wrap_qa_pairs)
+                
+                self._compacted_count = n_documents
+                if os.path.exists(self._compacting_file):
+                    os.remove(self._compacting_file)
+                
+                # Atualizar os snapshots do índice e dos documentos para o novo arquivo principal
+                self._save_snapshot(self._index, n_documents)
+                return True
+            except Exception as e:
+                st.warning(f"Erro ao compactar dados: {str(e)}")
+                return False
+    
+    def _mark_compacted(self, path: str) -> None:
+        # Chamado por atomic_write com o novo arquivo principal ainda no temporário
+        with open(self._compacting_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'compacted': file_fingerprint(path)['sha256']}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def reload(self) -> Optional[Dict[str, int]]:
+        """
+        Recarrega o arquivo principal após uma edição externa, sem reconstruir tudo.
+        
+        O novo estado (documentos, índice, scorers, sub-índices por categoria e shards)
+        é montado ao lado do atual e publicado de uma vez como uma nova IndexVersion
+        (consultas em andamento terminam na versão anterior); o cache de resultados é
+        invalidado. O resultado é o mesmo de reiniciar o RAGManager com o arquivo novo
+        (com o journal reaplicado), mas só as perguntas novas são tokenizadas.
+        
+        Returns:
+            Optional[Dict[str, int]]: entradas adicionadas, removidas, alteradas e
+            inalteradas, ou None se o conteúdo não mudou ou a recarga falhou
+        """
+        with self._compaction_lock, self._write_lock:
+            if not os.path.exists(self.qa_file):
+                st.warning(f"{self.qa_file} não encontrado: mantendo os dados carregados")
+                return None
+            # O snapshot dos documentos corresponde ao conteúdo carregado: conferir pelo hash
+            if self._valid_snapshot(DocumentStore.read_header(self.documents_file)):
+                return None
+            
+            start = time.perf_counter()
+            documents = None
+            try:
+                before = file_fingerprint(self.qa_file, with_hash=False)
+                documents = self._read_qa_file()
+                if file_fingerprint(self.qa_file, with_hash=False) != before:
+                    # Arquivo alterado durante a leitura: a próxima verificação recarrega de novo
+                    if os.path.exists(self.documents_file):
+                        os.remove(self.documents_file)
+                    return None
+                compacted_count = len(documents)
+                source_hash = self._file_fingerprint()['sha256']
+                for path in (self._compacting_file, self.journal_file):
+                    self._replay_journal(path, documents, source_hash)
+                index, changes = self._reindex(documents, compacted_count)
+                
+                scorers = {name: scorer_class(index) for name, scorer_class in SCORERS.items()}
+                dense = self._scorers.get(DenseScorer.name)
+                if dense is not None:
+                    scorers[DenseScorer.name] = DenseScorer(index, dense.embedder, [qa.question for qa in documents])
+                shards = old_shards = self.shards
+                if old_shards is not None:
+                    snapshot_file = self.snapshot_file if index.base_documents else None
+                    shards = ShardPool(index, snapshot_file, old_shards.n_shards, tracer=self.tracer)
+            except Exception as e:
+                st.warning(f"Erro ao recarregar {self.qa_file}: {str(e)}")
+                if documents is not None and os.path.exists(self.documents_file):
+                    # O snapshot já descreve o arquivo novo, mas o estado publicado ainda é o antigo
+                    os.remove(self.documents_file)
+                return None
+            
+            # Publicar o novo estado em um único passo (uma nova versão de leitura)
+            self._documents, self._index, self._scorers = documents, index, scorers
+            self._compacted_count = compacted_count
+            self._journal_count = len(documents) - compacted_count
+            self._publish(CategoryIndex(index, documents),
+                          FuzzyTermIndex(index) if self.fuzzy_index is not None else None, shards)
+        
+        if old_shards is not None:
+            old_shards.close()
+        self.tracer.record('reload', time.perf_counter() - start)
+        return changes
+    
+    @staticmethod
+    def _entry_keys(documents: DocumentStore) -> Tuple[List[bytes], List[tuple]]:
+        # Perguntas e entradas (pergunta, resposta, categoria) em UTF-8, sem decodificar
+        questions = documents.encoded_texts(0)
+        categories = [documents.categories[category_id] for category_id in documents.category_ids().tolist()]
+        return questions, list(zip(questions, documents.encoded_texts(1), categories))
+    
+    def _reindex(self, documents: DocumentStore, compacted_count: int) -> Tuple[LexicalIndex, Dict[str, int]]:
+        old_questions, old_entries = self._entry_keys(self._documents)
+        new_questions, new_entries = self._entry_keys(documents)
+        # Linha do índice atual por pergunta (o mesmo texto gera os mesmos termos)
+        old_rows = {question: doc_id for doc_id, question in reversed(list(enumerate(old_questions)))}
+        remaining_questions = Counter(old_questions)
+        remaining_entries = Counter(old_entries)
+        
+        # Vocabulário copiado do índice atual: os IDs de termo das linhas reaproveitadas continuam válidos
+        vocabulary = LexicalIndex()
+        vocabulary.vocabulary = dict(self._index.vocabulary)
+        vocabulary.terms = list(self._index.terms)
+        rows = np.empty(len(documents), dtype=np.int64)
+        fresh: List[Counter] = []
+        added = unmatched = 0
+        for doc_id, (question, entry) in enumerate(zip(new_questions, new_entries)):
+            if remaining_entries[entry]:
+                remaining_entries[entry] -= 1
+            else:
+                unmatched += 1
+            if remaining_questions[question]:
+                remaining_questions[question] -= 1
+            else:
+                added += 1
+            row = old_rows.get(question)
+            if row is None:
+                # Pergunta nova: a única que precisa ser tokenizada
+                row = old_rows[question] = len(old_questions) + len(fresh)
+                fresh.append(self._encode(question.decode('utf-8'), vocabulary, add=True))
+            rows[doc_id] = row
+        
+        # Linhas do índice atual seguidas das perguntas novas, recortadas na ordem do arquivo novo
+        doc_offsets, doc_terms, doc_counts = self._index.forward_arrays()
+        fresh_lengths = np.fromiter((len(term_counts) for term_counts in fresh), dtype=np.int64, count=len(fresh))
+        doc_offsets = np.concatenate([doc_offsets, doc_offsets[-1] + np.cumsum(fresh_lengths)])
+        doc_terms = np.concatenate([doc_terms, np.fromiter(chain.from_iterable(fresh), dtype=np.int32)])
+        doc_counts = np.concatenate([doc_counts, np.fromiter(
+            chain.from_iterable(term_counts.values() for term_counts in fresh), dtype=np.int32)])
+        
+        index = LexicalIndex.from_arrays(*select_rows(doc_offsets, doc_terms, doc_counts, rows[:compacted_count]),
+                                         vocabulary.vocabulary, vocabulary.terms)
+        if compacted_count:
+            index = self._seal(index, self.snapshot_file)
+        # Inclusões do journal no segmento delta, como em _build_index
+        for row in rows[compacted_count:]:
+            start, end = doc_offsets[row], doc_offsets[row + 1]
+            index.add_document(dict(zip(doc_terms[start:end].tolist(), doc_counts[start:end].tolist())))
+        
+        changes = {
+            'added': added,
+            'removed': len(old_questions) - (len(new_questions) - added),
+            'changed': unmatched - added,
+            'unchanged': len(new_questions) - unmatched,
+        }
+        return index, changes
@@ -0,0 +1,266 @@
+import copy
+import math
+import heapq
+import numpy as np
+from scipy import sparse
+from typing import List, Dict, Optional, Sequence, Iterable, Tuple
+from collections import Counter, defaultdict
+from lexical_index import LexicalIndex
+from sparse_engine import SparseScoringEngine
+from dense_index import Embedder, IVFIndex
+
+
+def select_top_k(hits: Iterable[Tuple[int, float]], k: int) -> List[Tuple[int, float]]:
+    """
+    Seleção parcial com heap dos k pares (documento, similaridade) mais altos:
+    O(C log k) sobre os C candidatos, em vez de ordenar tudo (empate: documento mais antigo primeiro).
+    """
+    return heapq.nlargest(k, hits, key=lambda item: (item[1], -item[0]))
+
+
+def weighted_jaccard(a: Dict[str, int], b: Dict[str, int]) -> float:
+    """
+    Similaridade de Jaccard ponderada entre duas contagens de termos, a mesma do
+    JaccardScorer: soma de min(a, b) / (|a| + |b| - interseção).
+    """
+    intersection = sum(min(count, b[term]) for term, count in a.items() if term in b)
+    union = sum(a.values()) + sum(b.values()) - intersection
+    return intersection / union if union else 0.0
+
+
+class Scorer:
+    """
+    Interface dos algoritmos de similaridade usados pelo RAGManager.
+
+    Um scorer mantém as estatísticas que precisa a partir do LexicalIndex, é avisado
+    de cada documento novo (add_document) e pontua apenas os documentos candidatos
+    encontrados nas listas de postings dos termos da query. Scorers com uses_text
+    trabalham sobre o texto original em vez dos termos normalizados.
+
+    As estatísticas do corpus são lidas do índice na consulta, então o mesmo scorer
+    sobre um snapshot do índice (ver snapshot) pontua só os documentos daquela versão.
+    """
+    name = ''
+    label = ''
+    uses_text = False
+
+    def __init__(self, index: LexicalIndex):
+        self.index = index
+
+    def add_document(self, doc_id: int, term_counts: Counter, text: str = '') -> None:
+        pass
+
+    def snapshot(self, index: LexicalIndex) -> 'Scorer':
+        """
+        Cópia rasa do scorer para ler um snapshot do índice (LexicalIndex.snapshot); os
+        dados internos são compartilhados e as inclusões continuam sendo feitas no original.
+        """
+        view = copy.copy(self)
+        view.index = index
+        return view
+
+    def score(self, query_counts: Counter, query: str = '', index: Optional[LexicalIndex] = None) -> Dict[int, float]:
+        """
+        Args:
+            query_counts (Counter): ID do termo -> frequência (desconhecidos em UNKNOWN_TERM)
+            query (str): Texto original da query
+            index (Optional[LexicalIndex]): Sub-índice (ex.: de uma categoria) cujas postings
+                são percorridas no lugar das do índice completo; as estatísticas continuam
+                as do índice completo e os documentos retornados são os IDs locais do sub-índice.
+                Não suportado pelos scorers com uses_text.
+
+        Returns:
+            Dict[int, float]: índice do documento -> similaridade (> 0)
+        """
+        raise NotImplementedError
+
+    def score_batch(self, queries: List[Counter], texts: Sequence[str] = ()) -> sparse.csr_matrix:
+        """
+        Returns:
+            sparse.csr_matrix: matriz (queries x documentos) com as similaridades não nulas
+        """
+        raise NotImplementedError
+
+
+class JaccardScorer(Scorer):
+    """
+    Similaridade de Jaccard ponderada: soma de min(q, d) / (|q| + |d| - interseção).
+    """
+    name = 'jaccard'
+    label = 'Jaccard ponderado'
+
+    def __init__(self, index: LexicalIndex):
+        super().__init__(index)
+        self._engine: Optional[SparseScoringEngine] = None
+
+    def score(self, query_counts: Counter, query: str = '', index: Optional[LexicalIndex] = None) -> Dict[int, float]:
+        if not query_counts:
+            return {}
+        index = self.index if index is None else index
+
+        # Acumular a interseção percorrendo somente as listas de postings dos termos da query
+        intersections = defaultdict(int)
+        for term_id, query_count in query_counts.items():
+            for doc_id, doc_count in index.postings(term_id):
+                intersections[doc_id] += min(query_count, doc_count)
+
+        # Similaridade de Jaccard ponderada: interseção / união
+        query_total = sum(query_counts.values())
+        doc_lengths = index.doc_lengths
+        return {
+            doc_id: intersection / (query_total + doc_lengths[doc_id] - intersection)
+            for doc_id, intersection in intersections.items()
+        }
+
+    def score_batch(self, queries: List[Counter], texts: Sequence[str] = ()) -> sparse.csr_matrix:
+        if self._engine is None or self._engine.n_documents != self.index.n_documents:
+            self._engine = SparseScoringEngine(self.index)
+        return self._engine.score_batch(queries)
+
+
+class BM25Scorer(Scorer):
+    """
+    Okapi BM25 normalizado pela pontuação da própria query.
+
+    A frequência de documentos de cada termo e o comprimento total do corpus vêm do
+    índice (mantidos na indexação e limitados aos documentos de um snapshot); na
+    consulta só é preciso calcular o IDF dos termos da query e acumular as listas de postings.
+    A pontuação é dividida pelo máximo atingível, (k1 + 1) * sum(qtf * idf), e fica
+    em [0, 1); uma pergunta idêntica à query pontua em torno de 0.4-0.5, acima dos
+    limiares 0.1/0.2 usados com o Jaccard.
+    """
+    name = 'bm25'
+    label = 'BM25'
+
+    def __init__(self, index: LexicalIndex, k1: float = 1.2, b: float = 0.75):
+        super().__init__(index)
+        self.k1 = k1
+        self.b = b
+        self._weights: Optional[sparse.csr_matrix] = None
+
+    def idf(self, term_id: int) -> float:
+        df = self.index.document_frequency(term_id)
+        n_documents = self.index.n_documents
+        return math.log(1 + (n_documents - df + 0.5) / (df + 0.5))
+
+    def _length_normalization(self):
+        # tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) = tf * (k1 + 1) / (tf + base + slope * dl)
+        avgdl = self.index.total_length / self.index.n_documents if self.index.n_documents else 1.0
+        base = self.k1 * (1 - self.b)
+        slope = self.k1 * self.b / avgdl if avgdl else 0.0
+        return base, slope
+
+    def score(self, query_counts: Counter, query: str = '', index: Optional[LexicalIndex] = None) -> Dict[int, float]:
+        if not query_counts or not self.index.n_documents:
+            return {}
+        index = self.index if index is None else index
+
+        base, slope = self._length_normalization()
+        k1_plus_1 = self.k1 + 1
+        doc_lengths = index.doc_lengths
+        scores = defaultdict(float)
+        query_norm = 0.0
+        for term_id, query_count in query_counts.items():
+            weight = query_count * self.idf(term_id)
+            query_norm += weight * k1_plus_1
+            for doc_id, tf in index.postings(term_id):
+                scores[doc_id] += weight * tf * k1_plus_1 / (tf + base + slope * doc_lengths[doc_id])
+
+        return {doc_id: score / query_norm for doc_id, score in scores.items()}
+
+    def _weight_matrix(self) -> sparse.csr_matrix:
+        # Pesos BM25 por (termo, documento), recalculados quando o corpus muda
+        if self._weights is None or self._weights.shape[1] != self.index.n_documents:
+            doc_offsets, doc_terms, doc_counts = self.index.forward_arrays()
+            base, slope = self._length_normalization()
+            doc_lengths = np.asarray(self.index.doc_lengths, dtype=np.float64)
+            doc_ids = np.repeat(np.arange(len(doc_offsets) - 1), np.diff(doc_offsets))
+            tf = doc_counts.astype(np.float64)
+            weights = tf * (self.k1 + 1) / (tf + base + slope * doc_lengths[doc_ids])
+            self._weights = sparse.csr_matrix(
+                (weights, (doc_terms, doc_ids)),
+                shape=(len(self.index.terms), len(doc_offsets) - 1)
+            )
+        return self._weights
+
+    def score_batch(self, queries: List[Counter], texts: Sequence[str] = ()) -> sparse.csr_matrix:
+        weights = self._weight_matrix()
+        rows, columns, data = [], [], []
+        for row, query_counts in enumerate(queries):
+            query_weights = {term_id: count * self.idf(term_id) for term_id, count in query_counts.items()}
+            query_norm = sum(query_weights.values()) * (self.k1 + 1)
+            for term_id, weight in query_weights.items():
+                if 0 <= term_id < weights.shape[0]:
+                    rows.append(row)
+                    columns.append(term_id)
+                    data.append(weight / query_norm)
+        query_matrix = sparse.csr_matrix((data, (rows, columns)), shape=(len(queries), weights.shape[0]))
+        scores = (query_matrix @ weights).tocsr()
+        scores.eliminate_zeros()
+        return scores
+
+
+class DenseScorer(Scorer):
+    """
+    Busca semântica por similaridade de cosseno entre embeddings das perguntas.
+
+    Os embeddings são gerados pelo Embedder configurado e guardados em um IVFIndex
+    quantizado em int8; a query visita apenas as listas mais próximas.
+    """
+    name = 'dense'
+    label = 'Semântico (denso)'
+    uses_text = True
+
+    def __init__(self, index: LexicalIndex, embedder: Embedder, texts: Sequence[str],
+                 candidates: int = 50, n_probe: int = 8, chunk_size: int = 4096):
+        super().__init__(index)
+        self.embedder = embedder
+        self.candidates = candidates
+        self.ann = IVFIndex(embedder.dim, n_probe=n_probe)
+        vectors = np.zeros((len(texts), embedder.dim), dtype=np.float32)
+        for start in range(0, len(texts), chunk_size):
+            vectors[start:start + chunk_size] = embedder.embed(list(texts[start:start + chunk_size]))
+        self.ann.build(vectors)
+
+    def add_document(self, doc_id: int, term_counts: Counter, text: str = '') -> None:
+        self.ann.add(self.embedder.embed([text]), [doc_id])
+
+    def score(self, query_counts: Counter, query: str = '', index: Optional[LexicalIndex] = None) -> Dict[int, float]:
+        doc_ids, scores = self.ann.search(self.embedder.embed([query])[0], self.candidates)
+        # Documentos incluídos depois do snapshot do índice ficam de fora
+        n_documents = self.index.n_documents
+        return {doc_id: score for doc_id, score in zip(doc_ids.tolist(), scores.tolist())
+                if score > 0 and doc_id < n_documents}
+
+    def search(self, query: str, k: int, allowed: np.ndarray) -> Dict[int, float]:
+        """
+        Busca restrita aos documentos de allowed (IDs em ordem crescente, ex.: os de uma
+        categoria). Filtrar os candidatos globais deixaria poucos ou nenhum da categoria:
+        aqui o filtro vem antes da seleção, e as listas visitadas dobram até restarem k
+        documentos ou todas serem visitadas.
+        """
+        vector = self.embedder.embed([query])[0]
+        n_documents = self.index.n_documents
+        allowed = allowed[allowed < n_documents]
+        n_probe = self.ann.n_probe
+        while True:
+            doc_ids, scores = self.ann.search(vector, k, n_probe, allowed)
+            if len(doc_ids) >= k or n_probe >= len(self.ann.centroids):
+                break
+            n_probe *= 2
+        return {doc_id: score for doc_id, score in zip(doc_ids.tolist(), scores.tolist()) if score > 0}
+
+    def score_batch(self, queries: List[Counter], texts: Sequence[str] = ()) -> sparse.csr_matrix:
+        rows, columns, data = [], [], []
+        n_documents = self.index.n_documents
+        for row, vector in enumerate(self.embedder.embed(list(texts))):
+            doc_ids, scores = self.ann.search(vector, self.candidates)
+            positive = (scores > 0) & (doc_ids < n_documents)
+            rows.extend([row] * int(positive.sum()))
+            columns.extend(doc_ids[positive].tolist())
+            data.extend(scores[positive].tolist())
+        return sparse.csr_matrix((data, (rows, columns)), shape=(len(texts), n_documents))
+
+
+# Scorers lexicais, sempre disponíveis; o DenseScorer depende de um Embedder
+SCORERS = {scorer.name: scorer for scorer in (JaccardScorer, BM25Scorer)}
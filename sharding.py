@@ -0,0 +1,293 @@
+import time
+import threading
+from array import array
+import multiprocessing
+from itertools import chain, count
+from multiprocessing.connection import Connection
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from lexical_index import LexicalIndex
+from scorers import SCORERS, select_top_k
+from tracing import Tracer
+
+
+class ShardIndex(LexicalIndex):
+    """
+    Visão de um shard sobre o LexicalIndex completo.
+
+    O segmento base é o snapshot inteiro mapeado em memória (as páginas são
+    compartilhadas entre os processos pelo cache do sistema), mas as listas de
+    postings são recortadas para a faixa de documentos do shard. Documentos
+    incluídos depois pertencem ao shard doc_id % n_shards; dos demais, só o
+    comprimento e os IDs por termo (para a frequência de documentos) são registrados.
+    Comprimentos, frequências de documento e a quantidade de documentos continuam globais, de modo que os scorers de SCORERS calculam
+    exatamente as mesmas pontuações do índice completo.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.shard = 0
+        self.n_shards = 1
+        self.first_document = 0
+        self.end_document = 0
+        # Termo -> documentos do delta que pertencem a outros shards
+        self._other_postings: Dict[int, array] = {}
+
+    def assign(self, shard: int, n_shards: int) -> None:
+        self.shard = shard
+        self.n_shards = n_shards
+        # Faixas contíguas do segmento base, uma por shard
+        self.first_document = shard * self.base_documents // n_shards
+        self.end_document = (shard + 1) * self.base_documents // n_shards
+
+    def owns(self, doc_id: int) -> bool:
+        if doc_id < self.base_documents:
+            return self.first_document <= doc_id < self.end_document
+        return doc_id % self.n_shards == self.shard
+
+    def _base_range(self, term_id: int) -> Tuple[int, int]:
+        start, end = super()._base_range(term_id)
+        docs = self._post_docs[start:end]
+        return start + int(np.searchsorted(docs, self.first_document)), start + int(np.searchsorted(docs, self.end_document))
+
+    def document_frequency(self, term_id: int) -> int:
+        # Frequência global: base inteira (sem o recorte do shard) e delta de todos os shards
+        frequency = 0
+        if 0 <= term_id and term_id + 1 < len(self._post_offsets):
+            start, end = LexicalIndex._base_range(self, term_id)
+            frequency += int(end - start)
+        for postings in (self._delta_postings.get(term_id), self._other_postings.get(term_id)):
+            if postings is not None:
+                frequency += self._delta_end(postings[0])
+        return frequency
+
+    def add_document(self, term_counts: Dict[int, int]) -> int:
+        if self.owns(self.n_documents):
+            return super().add_document(term_counts)
+        # Documento de outro shard: sem postings, apenas o comprimento e os termos
+        doc_id = self.n_documents
+        for term_id in term_counts:
+            postings = self._other_postings.get(term_id)
+            if postings is None:
+                postings = self._other_postings[term_id] = (array('i'),)
+            postings[0].append(doc_id)
+        self._delta_offsets.append(len(self._delta_terms))
+        self.doc_lengths.append(sum(term_counts.values()))
+        self.total_length += self.doc_lengths[-1]
+        return doc_id
+
+
+def _shard_main(connection: Connection, snapshot_file: Optional[str], base_documents: int,
+                shard: int, n_shards: int) -> None:
+    """
+    Laço de um processo de shard: recebe inclusões e consultas pela conexão e
+    responde às consultas com o top-k local de cada uma (com o ID da consulta).
+    """
+    try:
+        if snapshot_file:
+            index = ShardIndex.load(snapshot_file)
+            if index.base_documents != base_documents:
+                raise RuntimeError(f"Snapshot com {index.base_documents} documentos; esperado {base_documents}")
+        else:
+            index = ShardIndex()
+        index.assign(shard, n_shards)
+        scorers = {name: scorer_class(index) for name, scorer_class in SCORERS.items()}
+    except Exception as e:
+        connection.send(('error', str(e)))
+        return
+    connection.send(('ready', index.end_document - index.first_document))
+
+    failure = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        command = message[0]
+        if command == 'close':
+            break
+        request_id = message[1] if command == 'search' else None
+        try:
+            if command == 'add':
+                # Todos os shards recebem todas as inclusões, para manter as estatísticas globais
+                for doc_id, term_counts in message[1]:
+                    index.add_document(term_counts)
+                    for scorer in scorers.values():
+                        scorer.add_document(doc_id, term_counts)
+            elif command == 'search':
+                if failure is not None:
+                    raise RuntimeError(failure)
+                _, _, scorer_name, queries, k, n_documents = message
+                # Tempo de CPU do processo: com um núcleo por shard, é a latência da pontuação
+                start = time.process_time()
+                # Apenas os documentos da versão lida pelo coordenador (inclusões posteriores já podem ter chegado)
+                scorer = scorers[scorer_name].snapshot(index.snapshot(n_documents))
+                hits = [select_top_k(scorer.score(query_counts).items(), k) for query_counts in queries]
+                connection.send(('ok', request_id, hits, time.process_time() - start))
+        except Exception as e:
+            if command == 'add':
+                # Inclusões não têm resposta: a falha é informada na próxima consulta
+                failure = f"Falha ao indexar no shard {shard}: {e}"
+            else:
+                connection.send(('error', request_id, str(e)))
+
+
+class ShardPool:
+    """
+    Pontuação distribuída em processos (scatter-gather).
+
+    Cada processo é dono de um shard dos documentos (ver ShardIndex) e mapeia o
+    mesmo snapshot do índice. Uma consulta é enviada a todos os shards, cada um
+    devolve o seu top-k e o coordenador junta os resultados no top-k global. Como
+    o top-k global está contido na união dos top-k locais e o desempate é o
+    mesmo, o resultado é idêntico ao da pontuação em um único processo.
+
+    Consultas concorrentes não esperam umas pelas outras: cada uma tem um ID, os
+    envios a um shard só são serializados pelo lock da conexão e uma thread por
+    shard entrega cada resposta à consulta correspondente. Assim, enquanto um shard
+    pontua uma consulta, os outros já podem estar na seguinte.
+
+    Apenas os scorers lexicais (SCORERS) são distribuídos.
+    """
+
+    def __init__(self, index: LexicalIndex, snapshot_file: Optional[str], n_shards: int,
+                 tracer: Optional[Tracer] = None, start_timeout: float = 120.0):
+        self.n_shards = n_shards
+        self.scorers = frozenset(SCORERS)
+        self.tracer = tracer
+        # Protege _pending e _alive; os envios usam o lock de cada conexão
+        self._lock = threading.Lock()
+        self._connections: List[Connection] = []
+        self._send_locks: List[threading.Lock] = []
+        self._processes = []
+        self._receivers: List[threading.Thread] = []
+        self._alive = False
+        # ID da consulta -> (respostas por shard, evento de conclusão)
+        self._pending: Dict[int, Tuple[Dict[int, tuple], threading.Event]] = {}
+        self._request_ids = count()
+
+        # spawn: o processo pai pode ter threads (Streamlit, compactação), o que torna o fork inseguro
+        context = multiprocessing.get_context('spawn')
+        base_documents = index.base_documents if snapshot_file else 0
+        for shard in range(n_shards):
+            parent, child = context.Pipe()
+            process = context.Process(target=_shard_main, name=f"nabu-shard-{shard}", daemon=True,
+                                      args=(child, snapshot_file, base_documents, shard, n_shards))
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._send_locks.append(threading.Lock())
+            self._processes.append(process)
+
+        try:
+            for shard, connection in enumerate(self._connections):
+                if not connection.poll(start_timeout):
+                    raise RuntimeError(f"Shard {shard} não iniciou em {start_timeout:.0f} s")
+                status, detail = connection.recv()
+                if status != 'ready':
+                    raise RuntimeError(f"Erro ao iniciar o shard {shard}: {detail}")
+        except (RuntimeError, EOFError):
+            self.close()
+            raise
+
+        self._alive = True
+        for shard, connection in enumerate(self._connections):
+            receiver = threading.Thread(target=self._receive, args=(shard, connection),
+                                        name=f"nabu-shard-{shard}-replies", daemon=True)
+            receiver.start()
+            self._receivers.append(receiver)
+
+        # Documentos fora do snapshot (journal ou índice sem snapshot)
+        self.add_documents((doc_id, dict(index.document_terms(doc_id)))
+                           for doc_id in range(base_documents, index.n_documents))
+
+    def add_documents(self, documents: Iterable[Tuple[int, Dict[int, int]]]) -> None:
+        documents = list(documents)
+        if not documents:
+            return
+        for connection, send_lock in zip(self._connections, self._send_locks):
+            with send_lock:
+                connection.send(('add', documents))
+
+    def _receive(self, shard: int, connection: Connection) -> None:
+        # Entrega as respostas do shard às consultas que as esperam
+        while True:
+            try:
+                reply = connection.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                pending = self._pending.get(reply[1])
+                if pending is not None:
+                    self._deliver(pending, shard, reply)
+        # Shard encerrado: as consultas em andamento falham, e as próximas também
+        with self._lock:
+            self._alive = False
+            for pending in self._pending.values():
+                if shard not in pending[0]:
+                    self._deliver(pending, shard, ('error', None, f"Shard {shard} encerrado"))
+
+    def _deliver(self, pending: Tuple[Dict[int, tuple], threading.Event], shard: int, reply: tuple) -> None:
+        # Chamado com _lock
+        replies, done = pending
+        replies[shard] = reply
+        if len(replies) == self.n_shards:
+            done.set()
+
+    def search(self, scorer: str, queries: List[Dict[int, int]], k: int,
+               n_documents: int) -> List[List[Tuple[int, float]]]:
+        """
+        Pontua as queries (frequências por ID de termo) em todos os shards, considerando
+        só os n_documents primeiros documentos (a versão do índice lida pelo chamador).
+
+        Returns:
+            List[List[Tuple[int, float]]]: para cada query, o top-k global (documento, similaridade)
+        """
+        request_id = next(self._request_ids)
+        pending = ({}, threading.Event())
+        with self._lock:
+            if not self._alive:
+                raise RuntimeError("Shards encerrados")
+            self._pending[request_id] = pending
+        try:
+            for connection, send_lock in zip(self._connections, self._send_locks):
+                with send_lock:
+                    connection.send(('search', request_id, scorer, queries, k, n_documents))
+            pending[1].wait()
+        finally:
+            with self._lock:
+                del self._pending[request_id]
+        replies = [pending[0][shard] for shard in range(self.n_shards)]
+
+        errors = [reply[2] for reply in replies if reply[0] != 'ok']
+        if errors:
+            raise RuntimeError(f"Erro nos shards: {'; '.join(errors)}")
+        if self.tracer is not None:
+            # Caminho crítico com um núcleo por shard: o shard mais lento
+            self.tracer.record('shard_score', max(reply[3] for reply in replies))
+        return [select_top_k(chain.from_iterable(reply[2][row] for reply in replies), k)
+                for row in range(len(queries))]
+
+    def close(self) -> None:
+        with self._lock:
+            self._alive = False
+            connections, self._connections = self._connections, []
+            processes, self._processes = self._processes, []
+            receivers, self._receivers = self._receivers, []
+        for connection, send_lock in zip(connections, self._send_locks):
+            try:
+                with send_lock:
+                    connection.send(('close',))
+            except (OSError, ValueError):
+                pass
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        # Com os processos encerrados, as threads de resposta recebem EOF
+        for receiver in receivers:
+            receiver.join(timeout=5)
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,104 @@
+import numpy as np
+from scipy import sparse
+from typing import List, Tuple
+from collections import Counter
+from lexical_index import LexicalIndex
+
+
+class SparseScoringEngine:
+    """
+    Motor de similaridade vetorizado sobre uma matriz documento-termo esparsa (CSR).
+
+    A similaridade de Jaccard ponderada usa min(q, d) na interseção, que não é um
+    produto escalar. Para calculá-la com uma única multiplicação de matrizes, cada
+    termo com frequência c é expandido em c colunas binárias (termo, 1..c): o produto
+    escalar das expansões binárias é exatamente a soma de min(q, d) por termo.
+    """
+
+    def __init__(self, index: LexicalIndex):
+        doc_offsets, doc_terms, doc_counts = index.forward_arrays()
+        self.n_terms = len(index.terms)
+        n_documents = len(doc_offsets) - 1
+
+        # Cada termo ocupa tantas colunas quanto sua maior frequência em um documento
+        self.max_counts = np.zeros(self.n_terms, dtype=np.int64)
+        np.maximum.at(self.max_counts, doc_terms, doc_counts)
+        self.feature_offsets = np.zeros(self.n_terms + 1, dtype=np.int64)
+        np.cumsum(self.max_counts, out=self.feature_offsets[1:])
+
+        # Expandir cada (documento, termo, c) nas colunas (termo, 1..c)
+        entries = np.repeat(np.arange(len(doc_terms)), doc_counts)
+        levels = np.arange(len(entries)) - np.repeat(np.cumsum(doc_counts) - doc_counts, doc_counts)
+        columns = self.feature_offsets[doc_terms[entries]] + levels
+        # O número de colunas expandidas de um documento é a soma das suas frequências
+        doc_lengths = np.asarray(index.doc_lengths, dtype=np.int64)[:n_documents]
+        self.doc_lengths = doc_lengths.astype(np.float64)
+        indptr = np.zeros(n_documents + 1, dtype=np.int64)
+        np.cumsum(doc_lengths, out=indptr[1:])
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.float64), columns, indptr),
+            shape=(n_documents, int(self.feature_offsets[-1]))
+        )
+        # Guardar a transposta (termos x documentos) para o produto Q @ D^T
+        self.matrix_t = matrix.T.tocsr()
+
+    @property
+    def n_documents(self) -> int:
+        return self.matrix_t.shape[1]
+
+    def _vectorize(self, queries: List[Counter]) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        indptr = [0]
+        indices = []
+        query_lengths = np.zeros(len(queries), dtype=np.float64)
+        for row, query_counts in enumerate(queries):
+            for term_id, count in query_counts.items():
+                # Termos fora do vocabulário não entram na interseção, mas contam na união
+                query_lengths[row] += count
+                if not 0 <= term_id < self.n_terms:
+                    continue
+                start = self.feature_offsets[term_id]
+                indices.extend(range(start, start + min(count, self.max_counts[term_id])))
+            indptr.append(len(indices))
+
+        data = np.ones(len(indices), dtype=np.float64)
+        matrix = sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(queries), self.matrix_t.shape[0])
+        )
+        return matrix, query_lengths
+
+    def score_batch(self, queries: List[Counter]) -> sparse.csr_matrix:
+        """
+        Calcula a similaridade de todas as queries contra todos os documentos.
+
+        Returns:
+            sparse.csr_matrix: matriz (queries x documentos) contendo apenas as
+            similaridades não nulas
+        """
+        query_matrix, query_lengths = self._vectorize(queries)
+        intersections = (query_matrix @ self.matrix_t).tocsr()
+        intersections.sum_duplicates()
+
+        # Jaccard ponderado sobre as entradas não nulas: inter / (|q| + |d| - inter)
+        rows = np.repeat(np.arange(len(queries)), np.diff(intersections.indptr))
+        unions = query_lengths[rows] + self.doc_lengths[intersections.indices] - intersections.data
+        intersections.data = intersections.data / unions
+        return intersections
+
+    @staticmethod
+    def top_k(scores: sparse.csr_matrix, row: int, k: int) -> List[Tuple[int, float]]:
+        if k <= 0:
+            return []
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        doc_ids = scores.indices[start:end]
+        values = scores.data[start:end]
+        if len(values) > k:
+            # Seleção parcial antes de ordenar apenas os k melhores
+            keep = np.argpartition(-values, k - 1)[:k]
+            # Incluir empates com o k-ésimo valor para manter o desempate por índice
+            threshold = values[keep].min()
+            keep = np.flatnonzero(values >= threshold)
+            doc_ids, values = doc_ids[keep], values[keep]
+        order = np.lexsort((doc_ids, -values))[:k]
+        return [(int(doc_ids[i]), float(values[i])) for i in order]
@@ -0,0 +1,88 @@
+import json
+import os
+import random
+import sys
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokenizer import tokenize  # noqa: E402
+from fake_ollama import FakeOllama  # noqa: E402
+
+# Vocabulário pequeno (com acentos, stopwords e palavras curtas) para gerar muitas sobreposições
+WORDS = """
+    férias benefícios salário plano carreira treinamento horário trabalho remoto home office
+    reembolso despesas viagem vale refeição transporte saúde odontológico seguro vida banco horas
+    promoção avaliação desempenho feedback metas bônus participação lucros admissão demissão
+    contrato estágio jornada ponto atestado licença maternidade paternidade aniversário folga
+    notebook senha acesso sistema chamado suporte impressora rede como para qual onde que o a de
+""".split()
+
+CATEGORIES = ['beneficios', 'carreira', 'rh', 'ti']
+
+
+def random_pairs(count: int, seed: int = 0, offset: int = 0) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    return [{
+        'question': ' '.join(rng.choices(WORDS, k=rng.randint(2, 9))) + '?',
+        'answer': f"Resposta {offset + i}: " + ' '.join(rng.choices(WORDS, k=rng.randint(5, 20))) + '.',
+        'category': rng.choice(CATEGORIES),
+    } for i in range(count)]
+
+
+def random_queries(count: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    # Algumas palavras fora do vocabulário: contam no tamanho da query, sem postings
+    words = WORDS + ['xyzwq', 'inexistente']
+    return [' '.join(rng.choices(words, k=rng.randint(1, 6))) for _ in range(count)]
+
+
+def write_qa_file(path: str, pairs: List[Dict[str, str]]) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'qa_pairs': pairs}, f, ensure_ascii=False, indent=4)
+
+
+def brute_force(query: str, pairs: List[Dict[str, str]], k: int,
+                category: Optional[str] = None) -> List[Tuple[int, float]]:
+    """
+    Caminho original (antes do índice invertido): Jaccard ponderado contra cada pergunta.
+    """
+    query_counts = Counter(tokenize(query))
+    scores = []
+    for doc_id, qa in enumerate(pairs):
+        if category is not None and qa['category'] != category:
+            continue
+        doc_counts = Counter(tokenize(qa['question']))
+        intersection = sum((query_counts & doc_counts).values())
+        union = sum(query_counts.values()) + sum(doc_counts.values()) - intersection
+        if intersection:
+            scores.append((doc_id, intersection / union))
+    scores.sort(key=lambda hit: (-hit[1], hit[0]))
+    return scores[:k]
+
+
+def assert_same_hits(hits: List[Tuple[int, float]], expected: List[Tuple[int, float]]) -> None:
+    assert [doc_id for doc_id, _ in hits] == [doc_id for doc_id, _ in expected]
+    assert [score for _, score in hits] == pytest.approx([score for _, score in expected])
+
+
+@pytest.fixture
+def pairs() -> List[Dict[str, str]]:
+    return random_pairs(600, seed=7)
+
+
+@pytest.fixture
+def qa_file(tmp_path, pairs) -> str:
+    path = str(tmp_path / 'qa_pairs.json')
+    write_qa_file(path, pairs)
+    return path
+
+
+@pytest.fixture
+def ollama() -> FakeOllama:
+    server = FakeOllama().start()
+    yield server
+    server.close()
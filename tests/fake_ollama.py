@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class FakeOllama:
+    """
+    Servidor HTTP local que imita as rotas /api/tags e /api/generate do Ollama.
+
+    Modelos instalados em models; um modelo ainda não carregado custa load_delay
+    segundos na primeira requisição (inclusive a de aquecimento, sem prompt) e fica
+    carregado até uma requisição com keep_alive=0. As gerações em streaming enviam
+    tokens em NDJSON, o primeiro após first_token_delay segundos, e terminam com as
+    métricas do Ollama (eval_count, eval_duration, prompt_eval_count, load_duration).
+    Com stream_error, uma linha {"error": ...} é enviada depois do primeiro token.
+    """
+
+    def __init__(self, models: Sequence[str] = ('mistral', 'llama3'), load_delay: float = 0.0,
+                 first_token_delay: float = 0.05,
+                 tokens: Sequence[str] = ('Olá', ', ', 'os ', 'benefícios ', 'são ', 'vários.')):
+        self.models = list(models)
+        self.load_delay = load_delay
+        self.first_token_delay = first_token_delay
+        self.tokens = list(tokens)
+        self.stream_error: Optional[str] = None
+        self.tags_status = 200
+        self.loaded = set()
+        self.requests: List[Tuple[str, str, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> 'FakeOllama':
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def generate_requests(self, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [payload for method, path, payload in self.requests
+                if path == '/api/generate' and (model is None or payload.get('model') == model)]
+
+    def _load(self, model: str) -> float:
+        # Carregamento do modelo na primeira requisição (segundos gastos, como load_duration)
+        with self._lock:
+            if model in self.loaded:
+                return 0.0
+        time.sleep(self.load_delay)
+        with self._lock:
+            self.loaded.add(model)
+        return self.load_delay
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, message: Dict[str, Any]) -> None:
+        data = (json.dumps(message) + '\n').encode()
+        self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        fake = self.server.fake
+        fake.requests.append(('GET', self.path, {}))
+        if fake.tags_status != 200:
+            self._send_json(fake.tags_status, {'error': 'indisponível'})
+            return
+        self._send_json(200, {'models': [{'name': f"{model}:latest"} for model in fake.models]})
+
+    def do_POST(self) -> None:
+        fake = self.server.fake
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        fake.requests.append(('POST', self.path, payload))
+        model = payload.get('model')
+        if model not in fake.models:
+            self._send_json(404, {'error': f"model '{model}' not found, try pulling it first"})
+            return
+        if payload.get('keep_alive') == 0:
+            fake.loaded.discard(model)
+            self._send_json(200, {'model': model, 'response': '', 'done': True, 'done_reason': 'unload'})
+            return
+        load_duration = int(fake._load(model) * 1e9)
+        if not payload.get('prompt') or not payload.get('stream', True):
+            self._send_json(200, {'model': model, 'response': '', 'done': True, 'load_duration': load_duration})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            time.sleep(fake.first_token_delay)
+            for i, token in enumerate(fake.tokens):
+                self._send_chunk({'model': model, 'response': token, 'done': False})
+                if i == 0 and fake.stream_error is not None:
+                    self._send_chunk({'error': fake.stream_error})
+                    break
+                time.sleep(0.005)
+            else:
+                self._send_chunk({'model': model, 'response': '', 'done': True, 'load_duration': load_duration,
+                                  'eval_count': len(fake.tokens), 'eval_duration': 50_000_000,
+                                  'prompt_eval_count': len(payload['prompt'].split())})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente abandonou a geração
+            pass
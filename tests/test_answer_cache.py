@@ -0,0 +1,104 @@
+from collections import Counter
+
+import pytest
+
+from answer_cache import AnswerCache
+from ollama_client import OllamaClient, build_prompt, context_budget
+from rag_manager import RAGManager
+from scorers import weighted_jaccard
+from tokenizer import tokenize
+from conftest import write_qa_file
+
+PAIRS = [
+    {'question': 'Como solicitar férias remuneradas no sistema?', 'answer': 'Pelo portal do RH, com 30 dias de antecedência.', 'category': 'rh'},
+    {'question': 'Qual o valor do vale refeição?', 'answer': 'R$ 40 por dia útil.', 'category': 'beneficios'},
+    {'question': 'Como pedir reembolso de despesas de viagem?', 'answer': 'Envie as notas pelo portal de despesas.', 'category': 'rh'},
+]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = str(tmp_path / 'qa_pairs.json')
+    write_qa_file(path, PAIRS)
+    manager = RAGManager(qa_file=path, cache_size=0)
+    yield manager
+    manager.close()
+
+
+def ask(manager: RAGManager, client: OllamaClient, cache: AnswerCache, query: str, model: str = 'mistral') -> str:
+    # Mesmo fluxo do modo de geração do app (chat_with_rag)
+    result = manager.retrieve(query)
+    context = manager.get_relevant_context(query, result.k, result, max_tokens=context_budget(query))
+    context_ids = [doc_id for doc_id, _ in result.hits]
+    cached = cache.get(model, query, context_ids, context)
+    if cached is not None:
+        return cached
+    stream = client.stream(model, build_prompt(query, context),
+                           on_complete=lambda answer: cache.put(model, query, context_ids, context, answer))
+    return ''.join(stream)
+
+
+def similarity(a: str, b: str) -> float:
+    return weighted_jaccard(Counter(tokenize(a)), Counter(tokenize(b)))
+
+
+def test_repeated_question_skips_the_model(ollama, manager):
+    client, cache = OllamaClient(ollama.url), AnswerCache()
+    answer = ask(manager, client, cache, 'Como solicitar férias remuneradas?')
+    assert ask(manager, client, cache, '  como SOLICITAR férias remuneradas? ') == answer
+    assert len(ollama.generate_requests()) == 1
+    assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_similar_questions_share_answers_above_threshold(ollama, manager):
+    client, cache = OllamaClient(ollama.url), AnswerCache(threshold=0.75)
+    original = 'Como solicitar férias remuneradas no sistema?'
+    close = 'Solicitar férias remuneradas no sistema, como?'
+    far = 'Como solicitar férias?'
+    assert similarity(original, close) >= 0.75 > similarity(original, far)
+    # Os três recuperam os mesmos documentos (mesma chave de contexto)
+    assert len({tuple(doc_id for doc_id, _ in manager.retrieve(query).hits) for query in (original, close, far)}) == 1
+
+    answer = ask(manager, client, cache, original)
+    assert ask(manager, client, cache, close) == answer
+    assert len(ollama.generate_requests()) == 1
+    # Abaixo do limiar: o modelo é chamado de novo
+    ollama.tokens = ['Outra ', 'resposta.']
+    assert ask(manager, client, cache, far) == 'Outra resposta.'
+    assert len(ollama.generate_requests()) == 2
+
+
+def test_edited_context_invalidates_the_answer(ollama, manager):
+    client, cache = OllamaClient(ollama.url), AnswerCache()
+    query = 'Qual o valor do vale refeição?'
+    ask(manager, client, cache, query)
+
+    edited = [dict(qa) for qa in PAIRS]
+    edited[1]['answer'] = 'R$ 45 por dia útil.'
+    write_qa_file(manager.qa_file, edited)
+    assert manager.reload()['changed'] == 1
+    # Mesmos documentos recuperados, mas o texto do contexto mudou
+    ollama.tokens = ['R$ ', '45.']
+    assert ask(manager, client, cache, query) == 'R$ 45.'
+    assert len(ollama.generate_requests()) == 2
+    assert ask(manager, client, cache, query) == 'R$ 45.'
+    assert len(ollama.generate_requests()) == 2
+    assert cache.stats()['size'] == 1
+
+
+def test_answers_persist_across_restart(ollama, manager, tmp_path):
+    path = str(tmp_path / 'answer_cache.json')
+    client = OllamaClient(ollama.url)
+    answer = ask(manager, client, AnswerCache(path=path), 'Como pedir reembolso de viagem?')
+
+    restarted = AnswerCache(path=path)
+    assert ask(manager, client, restarted, 'Como pedir reembolso de viagem?') == answer
+    assert len(ollama.generate_requests()) == 1
+    # O cache vale por modelo
+    ask(manager, client, restarted, 'Como pedir reembolso de viagem?', model='llama3')
+    assert len(ollama.generate_requests()) == 2
+
+    # Entradas expiradas não são recarregadas
+    expired = AnswerCache(path=path, ttl=-1)
+    expired.put('mistral', 'pergunta', [0], 'contexto', 'resposta')
+    assert AnswerCache(path=path).stats()['size'] == 2
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.bench_concurrency import stress
+
+
+@pytest.mark.parametrize('shards', [0, 2])
+def test_reads_stay_consistent_during_writes_and_reload(shards):
+    result = stress(entries=3000, readers=3, writers=1, duration=1.0, shards=shards, check_every=3)
+    assert result['violations'] == []
+    assert result['phases']['leitura']['reads'] > 0
+    assert result['phases']['escrita']['reads'] > 0
+    assert result['adds'] > 0
+    assert result['reload']['changes']['changed'] == 100
+    assert result['final_documents'] == 3000 + result['adds']
+
+
+def test_cached_reads_stay_consistent():
+    # Com o cache de resultados: nenhum resultado de uma versão substituída é reaproveitado
+    result = stress(entries=2000, readers=3, writers=1, duration=1.0, cache_size=256, check_every=3)
+    assert result['violations'] == []
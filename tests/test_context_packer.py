@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from context_packer import estimate_tokens, pack_context, split_sentences
+from ollama_client import DEFAULT_OPTIONS, build_prompt, context_budget
+from rag_manager import RAGManager
+from conftest import WORDS, random_queries, write_qa_file
+
+
+def random_passages(rng: random.Random, count: int, max_sentences: int = 6):
+    def sentence():
+        return ' '.join(rng.choices(WORDS, k=rng.randint(3, 15))).capitalize() + rng.choice('.!?')
+    return [(sentence(), ' '.join(sentence() for _ in range(rng.randint(1, max_sentences)))) for _ in range(count)]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    # Respostas longas: os 5 primeiros resultados não cabem juntos na janela do modelo
+    rng = random.Random(5)
+    pairs = [{'question': question, 'answer': answer, 'category': 'rh'}
+             for question, answer in random_passages(rng, 400, max_sentences=40)]
+    path = str(tmp_path / 'qa_pairs.json')
+    write_qa_file(path, pairs)
+    manager = RAGManager(qa_file=path, cache_size=0)
+    yield manager
+    manager.close()
+
+
+def test_packed_context_never_exceeds_the_budget():
+    rng = random.Random(3)
+    for query in random_queries(300, seed=12):
+        passages = random_passages(rng, rng.randint(1, 8))
+        max_tokens = rng.randint(0, 200)
+        context = pack_context(query, passages, max_tokens)
+        assert estimate_tokens(context) <= max_tokens
+        # Com orçamento de sobra, nada é cortado
+        full = pack_context(query, passages, 10 ** 6)
+        assert all(sentence in full for _, answer in passages for sentence in split_sentences(answer))
+
+
+def test_manager_context_fits_the_model_window(manager):
+    for query in random_queries(100, seed=13):
+        budget = context_budget(query)
+        context = manager.get_relevant_context(query, 5, max_tokens=budget)
+        assert estimate_tokens(context) <= budget
+        assert estimate_tokens(build_prompt(query, context)) <= DEFAULT_OPTIONS['num_ctx'] - 128
+        hits = manager.retrieve(query, 5).hits
+        if hits:
+            # O par mais bem classificado sempre entra, primeiro
+            assert context.startswith(f"Pergunta: {manager.qa_pairs[hits[0][0]].question}\nResposta: ")
+
+
+def test_truncation_keeps_the_highest_ranked_passage():
+    passages = [
+        ('Como pedir férias?', 'Acesse o portal do RH. Escolha as datas das férias. Aguarde a aprovação do gestor.'),
+        ('Qual o horário de trabalho?', 'Das 9h às 18h. Há uma hora de almoço.'),
+        ('Como pedir reembolso?', 'Envie as notas pelo portal.'),
+    ]
+    first = estimate_tokens(f"Pergunta: {passages[0][0]}\nResposta: {passages[0][1]}")
+    context = pack_context('pedir férias', passages, first)
+    assert context == f"Pergunta: {passages[0][0]}\nResposta: {passages[0][1]}"
+
+    # Orçamento menor que o primeiro par: ele continua no contexto, reduzido às frases
+    # com mais termos da query, e os demais pares ficam de fora
+    context = pack_context('datas das férias', passages, first - 5)
+    assert context.startswith(f"Pergunta: {passages[0][0]}\nResposta: ")
+    assert 'Escolha as datas das férias.' in context
+    assert 'horário' not in context and 'reembolso' not in context
+    assert estimate_tokens(context) <= first - 5
+
+
+def test_repeated_sentences_are_dropped():
+    passages = [
+        ('Como pedir férias?', 'Acesse o portal do RH. Escolha as datas.'),
+        ('Como marcar férias?', 'Acesse o portal do RH.'),
+        ('Quem aprova as férias?', 'O gestor. Acesse o portal do RH.'),
+    ]
+    context = pack_context('férias', passages, 1000)
+    assert context.count('Acesse o portal do RH.') == 1
+    assert 'Como marcar férias?' not in context
+    assert 'Pergunta: Quem aprova as férias?\nResposta: O gestor.' in context
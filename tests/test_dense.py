@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from rag_manager import RAGManager
+from dense_index import HashingEmbedder
+from benchmarks.corpus import CorpusGenerator
+
+K = 3
+
+
+@pytest.fixture(scope='module')
+def dense_manager(tmp_path_factory):
+    qa_file = str(tmp_path_factory.mktemp('dense') / 'qa_pairs.json')
+    CorpusGenerator(5000, seed=3).write(qa_file)
+    manager = RAGManager(qa_file=qa_file, embedder=HashingEmbedder(), cache_size=0)
+    yield manager
+    manager.close()
+
+
+def test_category_search_returns_k_hits_of_the_category(dense_manager):
+    categories = np.array([qa.category for qa in dense_manager.qa_pairs])
+    embedder = dense_manager.scorers['dense'].embedder
+    vectors = embedder.embed([qa.question for qa in dense_manager.qa_pairs])
+    queries = CorpusGenerator(5000, seed=3).queries(40, seed=5)
+    for query in queries:
+        cosines = vectors @ embedder.embed([query])[0]
+        for category in dense_manager.categories():
+            in_category = categories == category
+            hits = dense_manager.retrieve(query, K, scorer='dense', category=category).hits
+            assert all(categories[doc_id] == category for doc_id, _ in hits)
+            # Com documentos da categoria claramente similares, a busca filtrada nunca volta vazia
+            assert len(hits) >= min(K, int((cosines[in_category] > 0.1).sum()))
+
+
+def test_category_search_sees_added_documents(dense_manager):
+    question = 'Qual o procedimento para solicitar crachá provisório de visitante?'
+    category = dense_manager.categories()[0]
+    assert dense_manager.add_qa_pair(question, 'Na recepção, com documento.', category)
+    hits = dense_manager.retrieve(question, K, scorer='dense', category=category).hits
+    assert dense_manager.qa_pairs[hits[0][0]].question == question
+    other = dense_manager.categories()[1]
+    hits = dense_manager.retrieve(question, K, scorer='dense', category=other).hits
+    assert all(dense_manager.qa_pairs[doc_id].category == other for doc_id, _ in hits)
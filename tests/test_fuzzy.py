@@ -0,0 +1,89 @@
+import pytest
+
+from rag_manager import RAGManager
+from fuzzy_index import edit_distance
+from conftest import write_qa_file
+
+PAIRS = [
+    {'question': 'Quais são os benefícios da empresa?', 'answer': 'Vale refeição e plano de saúde.', 'category': 'beneficios'},
+    {'question': 'Como solicitar férias?', 'answer': 'Pelo portal do RH.', 'category': 'rh'},
+    {'question': 'Como funciona o treinamento?', 'answer': 'Trilhas online.', 'category': 'carreira'},
+    {'question': 'Qual a carga horária?', 'answer': '40 horas semanais.', 'category': 'rh'},
+    {'question': 'Posso reduzir a carga?', 'answer': 'Com acordo do gestor.', 'category': 'rh'},
+    {'question': 'Como pedir uma carta de referência?', 'answer': 'Pelo e-mail do RH.', 'category': 'rh'},
+]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = str(tmp_path / 'qa_pairs.json')
+    write_qa_file(path, PAIRS)
+    manager = RAGManager(qa_file=path, cache_size=0)
+    yield manager
+    manager.close()
+
+
+def term_id(manager: RAGManager, term: str) -> int:
+    return manager.index.vocabulary[term]
+
+
+def test_misspelled_query_reaches_the_right_answer(manager):
+    assert manager.fuzzy_index.correct('beneficos') == term_id(manager, 'beneficios')
+    answer = manager.get_answer('benefícos')[0]
+    assert answer['answer'] == PAIRS[0]['answer']
+    assert answer['question'] == PAIRS[0]['question']
+
+
+@pytest.mark.parametrize('typo, expected', [
+    ('feriax', 'ferias'),             # 6 letras: até 1 edição
+    ('fxriax', None),
+    ('frieas', None),                 # troca de vizinhas + substituição: 2 edições
+    ('treinamnto', 'treinamento'),    # mais de 8 letras: até 2 edições
+    ('trenamnto', 'treinamento'),
+    ('trnamnto', None),
+    ('ferx', None),                   # termos curtos não são corrigidos
+])
+def test_edit_distance_cutoff(manager, typo, expected):
+    correction = manager.fuzzy_index.correct(typo)
+    assert correction == (term_id(manager, expected) if expected else None)
+    if expected is None and len(typo) >= manager.fuzzy_index.min_length:
+        assert all(edit_distance(typo, term, 2) > manager.fuzzy_index.max_distance(typo)
+                   for term in manager.index.terms)
+
+
+def test_ties_prefer_the_more_frequent_term(manager):
+    # "carla" está a 1 edição de "carga" (2 documentos) e de "carta" (1 documento)
+    assert manager.fuzzy_index.correct('carla') == term_id(manager, 'carga')
+    assert {doc_id for doc_id, _ in manager.retrieve('carla', 5).hits} == {3, 4}
+
+
+def test_corrections_follow_added_pairs(manager):
+    assert manager.fuzzy_index.correct('carla') == term_id(manager, 'carga')
+    assert manager.fuzzy_index.correct('estacionamnto') is None
+    previous = manager.fuzzy_index
+
+    manager.add_qa_pair('Carta de apresentação para visto?', 'Solicite ao RH.', 'rh')
+    manager.add_qa_pair('Quanto tempo leva a carta?', 'Até 5 dias úteis.', 'rh')
+    manager.add_qa_pair('Onde fica o estacionamento?', 'No subsolo.', 'geral')
+    # Agora "carta" aparece em mais documentos e "estacionamento" está no vocabulário
+    assert manager.fuzzy_index.correct('carla') == term_id(manager, 'carta')
+    assert manager.fuzzy_index.correct('estacionamnto') == term_id(manager, 'estacionamento')
+    assert manager.get_answer('estacionamnto')[0]['answer'] == 'No subsolo.'
+    # A versão anterior continua com as suas correções (termos e frequências da época)
+    assert previous.correct('carla') == term_id(manager, 'carga')
+    assert previous.correct('estacionamnto') is None
+
+
+def test_unpublished_terms_are_not_corrections(manager):
+    version = manager._version
+    # Termo já no vocabulário compartilhado, mas o documento ainda não foi publicado
+    manager._index.term_id('estacionamento')
+    assert version.fuzzy_index.correct('estacionamnto') is None
+    assert manager.retrieve('estacionamnto').hits == []
+
+
+def test_removed_terms_are_not_corrections(manager):
+    write_qa_file(manager.qa_file, [qa for qa in PAIRS if 'férias' not in qa['question']])
+    assert manager.reload()['removed'] == 1
+    assert manager.fuzzy_index.correct('feriax') is None
+    assert manager.retrieve('feriax').hits == []
@@ -0,0 +1,107 @@
+import json
+import os
+
+from rag_manager import RAGManager
+from conftest import random_pairs, write_qa_file
+
+
+def read_journal(manager: RAGManager):
+    with open(manager.journal_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rejected_pair_is_not_journaled(qa_file, pairs):
+    manager = RAGManager(qa_file=qa_file)
+    assert manager.add_qa_pair(None, 'x') is False
+    assert manager.add_qa_pair('Como pedir reembolso de viagem?', 'Pelo portal de despesas.', 'rh') is True
+    assert [entry['question'] for entry in read_journal(manager)] == ['Como pedir reembolso de viagem?']
+    assert len(manager.qa_pairs) == len(pairs) + 1
+    manager.close()
+
+    restarted = RAGManager(qa_file=qa_file)
+    questions = [qa.question for qa in restarted.qa_pairs]
+    assert questions[len(pairs):] == ['Como pedir reembolso de viagem?']
+    assert 'None' not in questions
+    assert restarted.get_answer('reembolso viagem')[0]['answer'] == 'Pelo portal de despesas.'
+    restarted.close()
+
+
+def test_invalid_pairs_are_skipped_in_batches(qa_file, pairs):
+    manager = RAGManager(qa_file=qa_file)
+    batch = random_pairs(3, seed=11)
+    batch.insert(1, {'question': '   ', 'answer': 'vazia'})
+    batch.insert(3, {'question': 'sem resposta'})
+    assert manager.add_qa_pairs(batch) == 3
+    assert len(read_journal(manager)) == 3
+    assert len(manager.qa_pairs) == len(pairs) + 3
+    manager.close()
+
+
+def test_reload_keeps_journaled_pairs_after_external_append(qa_file, pairs):
+    manager = RAGManager(qa_file=qa_file, compact_threshold=10 ** 9)
+    journaled = random_pairs(2, seed=13, offset=len(pairs))
+    assert manager.add_qa_pairs(journaled) == 2
+    # Edição externa que aumenta o arquivo principal além dos IDs do journal
+    write_qa_file(qa_file, pairs + random_pairs(2, seed=14, offset=len(pairs) + 2))
+
+    assert manager.reload() == {'added': 2, 'removed': 0, 'changed': 0, 'unchanged': len(pairs) + 2}
+    answers = [qa.answer for qa in manager.qa_pairs]
+    assert len(answers) == len(pairs) + 4
+    assert answers[-2:] == [qa['answer'] for qa in journaled]
+    assert manager.compact()
+    manager.close()
+
+    restarted = RAGManager(qa_file=qa_file)
+    assert [qa.answer for qa in restarted.qa_pairs] == answers
+    restarted.close()
+
+
+def test_compaction_interrupted_after_replace_is_not_replayed(qa_file, pairs, monkeypatch):
+    manager = RAGManager(qa_file=qa_file, compact_threshold=10 ** 9)
+    manager.add_qa_pairs(random_pairs(3, seed=15, offset=len(pairs)))
+    remove = os.remove
+
+    def interrupted_remove(path):
+        # Processo interrompido depois de substituir o arquivo principal
+        if path == manager._compacting_file:
+            raise OSError('interrompido')
+        remove(path)
+
+    monkeypatch.setattr(os, 'remove', interrupted_remove)
+    assert not manager.compact()
+    monkeypatch.undo()
+    assert os.path.exists(manager._compacting_file)
+    manager.close()
+
+    restarted = RAGManager(qa_file=qa_file)
+    assert len(restarted.qa_pairs) == len(pairs) + 3
+    restarted.add_qa_pair('Onde fica o refeitório?', 'No térreo.')
+    assert restarted.compact()
+    assert not os.path.exists(restarted._compacting_file)
+    restarted.close()
+    restarted = RAGManager(qa_file=qa_file)
+    assert len(restarted.qa_pairs) == len(pairs) + 4
+    restarted.close()
+
+
+def test_compaction_interrupted_before_replace_is_replayed(qa_file, pairs, monkeypatch):
+    manager = RAGManager(qa_file=qa_file, compact_threshold=10 ** 9)
+    manager.add_qa_pairs(random_pairs(3, seed=16, offset=len(pairs)))
+    replace = os.replace
+
+    def interrupted_replace(src, dst):
+        # Processo interrompido depois da marca de compactação, antes da substituição
+        if dst == qa_file:
+            raise OSError('interrompido')
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', interrupted_replace)
+    assert not manager.compact()
+    monkeypatch.undo()
+    with open(manager._compacting_file, 'r', encoding='utf-8') as f:
+        assert '"compacted"' in f.read()
+    manager.close()
+
+    restarted = RAGManager(qa_file=qa_file)
+    assert len(restarted.qa_pairs) == len(pairs) + 3
+    restarted.close()
@@ -0,0 +1,212 @@
+import time
+
+import pytest
+import requests
+
+from ollama_client import (DEFAULT_KEEP_ALIVE, DEFAULT_OPTIONS, CircuitBreaker, OllamaClient, OllamaUnavailable,
+                           build_prompt, keep_alive_seconds)
+from tracing import Tracer
+
+
+def test_stream_yields_tokens_and_stats(ollama):
+    client = OllamaClient(ollama.url)
+    prompt = build_prompt('Quais são os benefícios?', 'Pergunta: Benefícios\nResposta: Vale refeição.')
+    stream = client.stream('mistral', prompt)
+    assert ''.join(stream) == 'Olá, os benefícios são vários.'
+
+    stats = stream.stats
+    assert stats.model == 'mistral'
+    assert ollama.first_token_delay <= stats.time_to_first_token < stats.total_time
+    assert stats.completion_tokens == len(ollama.tokens)
+    assert stats.tokens_per_second == pytest.approx(len(ollama.tokens) / 0.05)
+    assert stats.prompt_tokens == len(prompt.split())
+
+    payload = ollama.generate_requests('mistral')[-1]
+    assert payload['prompt'] == prompt and payload['stream'] is True
+    assert payload['options'] == DEFAULT_OPTIONS
+
+
+def test_on_complete_receives_full_text(ollama):
+    completed = []
+    stream = OllamaClient(ollama.url).stream('mistral', 'oi', on_complete=completed.append)
+    assert completed == []
+    text = ''.join(stream)
+    assert completed == [text]
+
+
+def test_on_complete_not_called_after_error(ollama):
+    ollama.stream_error = 'falha na geração'
+    completed = []
+    stream = OllamaClient(ollama.url).stream('mistral', 'oi', on_complete=completed.append)
+    with pytest.raises(RuntimeError, match='falha na geração'):
+        ''.join(stream)
+    assert completed == []
+
+
+def test_keep_alive_seconds():
+    assert keep_alive_seconds(None) == 300.0
+    assert keep_alive_seconds('30m') == 1800.0
+    assert keep_alive_seconds('1h30m') == 5400.0
+    assert keep_alive_seconds('500ms') == 0.5
+    assert keep_alive_seconds(90) == 90.0
+    assert keep_alive_seconds(-1) is None and keep_alive_seconds('-1m') is None
+    for invalid in ('abc', '5x', '10 m'):
+        with pytest.raises(ValueError):
+            keep_alive_seconds(invalid)
+
+
+def test_warm_up_loads_in_background_once(ollama):
+    ollama.load_delay = 0.3
+    tracer = Tracer()
+    client = OllamaClient(ollama.url, tracer=tracer)
+    start = time.perf_counter()
+    status = client.warm_up('mistral')
+    assert time.perf_counter() - start < 0.2
+    assert status.state == 'loading' and not client.is_warm('mistral')
+    # Chamadas repetidas (cada rerun do Streamlit) durante e após o carregamento não recarregam
+    assert client.warm_up('mistral') is status
+    assert status.done.wait(5)
+    assert client.warm_up('mistral') is status
+
+    assert status.state == 'ready' and client.is_warm('mistral')
+    assert status.load_time == pytest.approx(0.3, abs=0.2)
+    assert 'llm_warmup' in tracer.summary()
+    warmups = ollama.generate_requests('mistral')
+    assert len(warmups) == 1
+    assert warmups[0]['prompt'] == '' and warmups[0]['stream'] is False
+    assert warmups[0]['keep_alive'] == DEFAULT_KEEP_ALIVE and warmups[0]['options'] == DEFAULT_OPTIONS
+
+
+def test_stream_after_warm_up_is_warm(ollama):
+    ollama.load_delay = 0.3
+    client = OllamaClient(ollama.url, keep_alive='10m')
+    client.warm_up('mistral', wait=True)
+    stream = client.stream('mistral', 'oi')
+    ''.join(stream)
+    assert stream.stats.warm is True
+    assert stream.stats.time_to_first_token < ollama.load_delay
+    assert ollama.generate_requests('mistral')[-1]['keep_alive'] == '10m'
+
+
+def test_cold_stream_pays_load_time(ollama):
+    ollama.load_delay = 0.3
+    client = OllamaClient(ollama.url)
+    client.warm_up('mistral', wait=True)
+    client.unload('mistral')
+    assert 'mistral' not in ollama.loaded and not client.is_warm('mistral')
+    stream = client.stream('mistral', 'oi')
+    ''.join(stream)
+    assert stream.stats.warm is False
+    assert stream.stats.time_to_first_token >= ollama.load_delay
+    assert stream.stats.load_time == pytest.approx(0.3)
+    # Geração concluída: o modelo fica aquecido para as próximas perguntas
+    assert client.is_warm('mistral')
+
+
+def test_model_switch_warms_new_model(ollama):
+    client = OllamaClient(ollama.url)
+    first = client.warm_up('mistral', wait=True)
+    second = client.warm_up('llama3', wait=True)
+    assert second is not first and second.state == 'ready'
+    assert ollama.loaded == {'mistral', 'llama3'}
+    assert len(ollama.generate_requests('llama3')) == 1
+    # Voltar ao primeiro modelo, ainda dentro do keep_alive, não gera outra requisição
+    assert client.warm_up('mistral') is first
+    assert len(ollama.generate_requests('mistral')) == 1
+
+
+def test_warm_up_expires_with_keep_alive(ollama):
+    client = OllamaClient(ollama.url, keep_alive='200ms')
+    status = client.warm_up('mistral', wait=True)
+    time.sleep(0.3)
+    assert not client.is_warm('mistral')
+    assert client.warm_up('mistral', wait=True) is not status
+    assert len(ollama.generate_requests('mistral')) == 2
+
+
+def test_warm_up_failures(ollama):
+    client = OllamaClient(ollama.url)
+    missing = client.warm_up('inexistente', wait=True)
+    assert missing.state == 'failed' and 'not found' in missing.error
+    # Modelo inexistente não derruba o servidor: outros modelos continuam carregando
+    assert client.warm_up('mistral', wait=True).state == 'ready'
+
+    offline = OllamaClient('http://127.0.0.1:9')
+    failed = offline.warm_up('mistral', wait=True)
+    assert failed.state == 'failed' and failed.error
+    # Nova tentativa depois de uma falha (limitada pelo disjuntor)
+    assert offline.warm_up('mistral') is not failed
+
+
+def half_open_client(url: str) -> OllamaClient:
+    # Circuito aberto por uma falha anterior, já liberando a chamada de teste
+    client = OllamaClient(url, breaker=CircuitBreaker(reset_timeout=0.0))
+    client.breaker.record_failure()
+    assert client.breaker.state == 'half-open'
+    return client
+
+
+def test_list_models_is_cached(ollama):
+    client = OllamaClient(ollama.url)
+    assert client.list_models() == ['mistral:latest', 'llama3:latest']
+    assert client.list_models() == ['mistral:latest', 'llama3:latest']
+    assert client.is_available()
+    assert [path for method, path, _ in ollama.requests if method == 'GET'] == ['/api/tags']
+
+
+def test_breaker_opens_on_connection_failure():
+    client = OllamaClient('http://127.0.0.1:9', breaker=CircuitBreaker(reset_timeout=60.0))
+    assert client.list_models() == []
+    assert client.breaker.state == 'open' and not client.is_available()
+    with pytest.raises(OllamaUnavailable):
+        client.stream('mistral', 'oi')
+
+
+@pytest.mark.parametrize('outcome', ['error_line', 'model_not_found', 'abandoned', 'completed'])
+def test_half_open_probe_is_always_resolved(ollama, outcome):
+    client = half_open_client(ollama.url)
+    model = 'inexistente' if outcome == 'model_not_found' else 'mistral'
+    if outcome == 'error_line':
+        ollama.stream_error = 'falha na geração'
+    stream = client.stream(model, 'oi')
+    if outcome == 'abandoned':
+        tokens = iter(stream)
+        next(tokens)
+        tokens.close()
+    elif outcome == 'completed':
+        ''.join(stream)
+    else:
+        with pytest.raises((RuntimeError, requests.HTTPError)):
+            ''.join(stream)
+    # O servidor respondeu: o circuito fecha e as chamadas seguintes são liberadas
+    assert client.breaker.state == 'closed'
+    assert client.list_models() == ['mistral:latest', 'llama3:latest']
+    assert client.is_available()
+
+
+def test_half_open_probe_failure_reopens_circuit():
+    client = half_open_client('http://127.0.0.1:9')
+    client.breaker.reset_timeout = 60.0
+    client.breaker.opened_at -= 60.0
+    stream = client.stream('mistral', 'oi')
+    with pytest.raises(requests.ConnectionError):
+        ''.join(stream)
+    assert client.breaker.state == 'open'
+
+
+def test_only_one_probe_while_half_open(ollama):
+    client = half_open_client(ollama.url)
+    first = iter(client.stream('mistral', 'oi'))
+    next(first)
+    # Outra geração durante a chamada de teste falha sem rede
+    with pytest.raises(OllamaUnavailable):
+        ''.join(client.stream('mistral', 'oi'))
+    ''.join(first)
+    assert client.breaker.state == 'closed'
+
+
+def test_http_error_from_tags_keeps_circuit_closed(ollama):
+    ollama.tags_status = 500
+    client = OllamaClient(ollama.url)
+    assert client.list_models() == []
+    assert client.breaker.state == 'closed' and not client.is_available()
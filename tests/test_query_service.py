@@ -0,0 +1,99 @@
+import asyncio
+import json
+import random
+from urllib.parse import quote_plus
+
+import pytest
+
+from query_service import QueryService
+from rag_manager import RAGManager
+from tracing import Tracer
+from conftest import CATEGORIES, random_queries
+
+
+@pytest.fixture
+def manager(qa_file, tmp_path):
+    tracer = Tracer(trace_file=str(tmp_path / 'traces.jsonl'))
+    manager = RAGManager(qa_file=qa_file, cache_size=0, tracer=tracer)
+    yield manager
+    manager.close()
+    tracer.close()
+
+
+async def request(port: int, method: str, path: str, payload=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, json.loads(body) if body.startswith(b'{') else body.decode('utf-8')
+
+
+def run_service(manager: RAGManager, scenario, window: float = 0.005):
+    async def main():
+        service = QueryService(manager, window=window)
+        server = await service.start(port=0)
+        try:
+            return await scenario(service, server.sockets[0].getsockname()[1])
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_are_batched(manager):
+    rng = random.Random(0)
+    requests = [{'question': query, 'scorer': rng.choice([None, 'jaccard', 'bm25']),
+                 'category': rng.choice([None] + CATEGORIES)} for query in random_queries(120, seed=20)]
+
+    async def scenario(service, port):
+        responses = await asyncio.gather(*(request(port, 'POST', '/answer', payload) for payload in requests))
+        return responses, service.batcher.stats()
+
+    responses, stats = run_service(manager, scenario)
+    for payload, (status, body) in zip(requests, responses):
+        assert status == 200
+        result = manager.retrieve(payload['question'], manager.max_documents, payload['scorer'], payload['category'])
+        expected = manager.get_answer(payload['question'], result)
+        # Pontuação em lote (matricial) e individual diferem só no arredondamento
+        assert [{**answer, 'similarity': None} for answer in body['answers']] == \
+            [{**answer, 'similarity': None} for answer in expected]
+        assert [answer['similarity'] for answer in body['answers']] == \
+            pytest.approx([answer['similarity'] for answer in expected])
+    assert stats['requests'] == len(requests)
+    assert stats['batches'] < len(requests)
+
+    # As etapas pontuadas na thread do lote aparecem no trace de cada requisição
+    manager.tracer.flush()
+    with open(manager.tracer.trace_file, 'r', encoding='utf-8') as f:
+        traces = [json.loads(line) for line in f]
+    assert len(traces) == len(requests)
+    assert all(trace['trace'] == 'answer' and {'normalize', 'score', 'rank'} <= set(trace['spans_ms'])
+               for trace in traces)
+
+
+def test_context_and_errors(manager):
+    question = manager.qa_pairs[0].question
+
+    async def scenario(service, port):
+        results = await asyncio.gather(
+            request(port, 'POST', '/context', {'question': question, 'max_documents': 3, 'max_tokens': 50}),
+            request(port, 'GET', '/context?question=' + quote_plus(question)),
+            request(port, 'POST', '/answer', {'question': '  '}),
+            request(port, 'POST', '/answer', {'question': question, 'scorer': 'inexistente'}),
+            request(port, 'POST', '/context', {'question': question, 'max_documents': 0}),
+            request(port, 'GET', '/outra'),
+            request(port, 'PUT', '/answer'),
+        )
+        return results + [await request(port, 'GET', '/health')]
+
+    results = run_service(manager, scenario)
+    (status, body), (get_status, get_body) = results[:2]
+    assert status == 200 and body['context'] == manager.get_relevant_context(question, 3, max_tokens=50)
+    assert get_status == 200 and get_body['context'] == manager.get_relevant_context(question, 2)
+    assert [status for status, _ in results[2:7]] == [400, 400, 400, 404, 405]
+    status, health = results[7]
+    assert status == 200 and health['documents'] == len(manager.qa_pairs) and health['requests'] == 2
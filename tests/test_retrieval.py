@@ -0,0 +1,181 @@
+import json
+import threading
+
+import pytest
+
+from rag_manager import RAGManager
+from conftest import CATEGORIES, assert_same_hits, brute_force, random_pairs, random_queries, write_qa_file
+
+K = 5
+
+
+@pytest.fixture
+def manager(qa_file):
+    manager = RAGManager(qa_file=qa_file, fuzzy=False, cache_size=0)
+    yield manager
+    manager.close()
+
+
+def test_retrieve_matches_brute_force(manager, pairs):
+    for query in random_queries(300):
+        assert_same_hits(manager.retrieve(query, K).hits, brute_force(query, pairs, K))
+
+
+def test_get_answer_matches_brute_force(manager, pairs):
+    for query in random_queries(100, seed=2):
+        expected = [(doc_id, score) for doc_id, score in brute_force(query, pairs, manager.max_documents)
+                    if score > 0.1]
+        answers = manager.get_answer(query)
+        if expected:
+            assert [answer['answer'] for answer in answers] == [pairs[doc_id]['answer'] for doc_id, _ in expected]
+            assert [answer['similarity'] for answer in answers] == pytest.approx([score for _, score in expected])
+        else:
+            assert len(answers) == 1 and answers[0]['answer'].startswith('Desculpe')
+
+
+def test_snapshot_restart_matches_brute_force(manager, qa_file, pairs):
+    # Segunda inicialização: índice e documentos lidos dos snapshots binários
+    restarted = RAGManager(qa_file=qa_file, fuzzy=False, cache_size=0)
+    assert restarted.index.base_documents == len(pairs)
+    for query in random_queries(100, seed=3):
+        assert_same_hits(restarted.retrieve(query, K).hits, brute_force(query, pairs, K))
+    restarted.close()
+
+
+@pytest.mark.parametrize('scorer', ['jaccard', 'bm25'])
+def test_retrieve_batch_matches_retrieve(manager, scorer):
+    queries = random_queries(200, seed=4)
+    results = manager.retrieve_batch(queries, K, batch_size=64, scorer=scorer)
+    for query, result in zip(queries, results):
+        assert result.query == query
+        assert_same_hits(result.hits, manager.retrieve(query, K, scorer=scorer).hits)
+
+
+def test_bm25_scores_are_bounded(manager, pairs):
+    for query in random_queries(200, seed=9):
+        scores = [score for _, score in manager.retrieve(query, K, scorer='bm25').hits]
+        assert all(0 < score < 1 for score in scores)
+        assert scores == pytest.approx([score for _, score in manager.retrieve_batch([query], K, scorer='bm25')[0].hits])
+    # Perguntas idênticas à query continuam acima do limiar de "reformular" do app (0.2)
+    for qa in pairs[:50]:
+        assert manager.retrieve(qa['question'], 1, scorer='bm25').hits[0][1] > 0.2
+
+
+@pytest.mark.parametrize('category', CATEGORIES)
+def test_category_matches_brute_force(manager, pairs, category):
+    for query in random_queries(100, seed=5):
+        assert_same_hits(manager.retrieve(query, K, category=category).hits,
+                         brute_force(query, pairs, K, category))
+
+
+def test_add_qa_pairs_matches_brute_force(manager, pairs):
+    # Inclusões vão para o segmento delta do índice e para os sub-índices já construídos
+    manager.retrieve('férias', K, category='rh')
+    added = random_pairs(150, seed=8, offset=len(pairs))
+    assert manager.add_qa_pairs(added) == len(added)
+    corpus = pairs + added
+    for query in random_queries(100, seed=6):
+        assert_same_hits(manager.retrieve(query, K).hits, brute_force(query, corpus, K))
+        assert_same_hits(manager.retrieve(query, K, category='rh').hits, brute_force(query, corpus, K, 'rh'))
+
+
+@pytest.mark.parametrize('scorer', ['jaccard', 'bm25'])
+def test_sharded_matches_single_process(qa_file, scorer):
+    single = RAGManager(qa_file=qa_file, fuzzy=False, cache_size=0)
+    sharded = RAGManager(qa_file=qa_file, fuzzy=False, cache_size=0, shards=2)
+    try:
+        added = random_pairs(50, seed=9, offset=len(single.qa_pairs))
+        single.add_qa_pairs(added)
+        sharded.add_qa_pairs(added)
+        queries = random_queries(100, seed=7)
+        for query in queries:
+            assert_same_hits(sharded.retrieve(query, K, scorer=scorer).hits,
+                             single.retrieve(query, K, scorer=scorer).hits)
+        for result, expected in zip(sharded.retrieve_batch(queries, K, scorer=scorer),
+                                    single.retrieve_batch(queries, K, scorer=scorer)):
+            assert_same_hits(result.hits, expected.hits)
+    finally:
+        single.close()
+        sharded.close()
+
+
+def test_concurrent_sharded_queries_overlap(qa_file, monkeypatch):
+    single = RAGManager(qa_file=qa_file, fuzzy=False, cache_size=0)
+    sharded = RAGManager(qa_file=qa_file, fuzzy=False, cache_size=0, shards=2)
+    pool = sharded.shards
+    in_flight = []
+    deliver = pool._deliver
+
+    def observed_deliver(pending, shard, reply):
+        in_flight.append(len(pool._pending))
+        deliver(pending, shard, reply)
+
+    monkeypatch.setattr(pool, '_deliver', observed_deliver)
+    try:
+        queries = random_queries(200, seed=11)
+        expected = [single.retrieve(query, K).hits for query in queries]
+        batch = random_queries(3000, seed=12)
+        errors = []
+        start = threading.Barrier(5)
+
+        def read(offset):
+            start.wait()
+            for query, hits in list(zip(queries, expected))[offset::4]:
+                if sharded.retrieve(query, K).hits != hits:
+                    errors.append(query)
+
+        def read_batch():
+            start.wait()
+            for result, query in zip(sharded.retrieve_batch(batch, K, batch_size=3000), batch):
+                if result.hits != single.retrieve(query, K).hits:
+                    errors.append(query)
+
+        threads = [threading.Thread(target=read, args=(offset,)) for offset in range(4)]
+        threads.append(threading.Thread(target=read_batch))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        # Consultas de threads diferentes ficaram pendentes nos shards ao mesmo tempo
+        assert max(in_flight) > 1
+    finally:
+        single.close()
+        sharded.close()
+    with pytest.raises(RuntimeError):
+        pool.search('jaccard', [{0: 1}], K, 1)
+
+
+def test_reload_matches_fresh_manager(manager, qa_file, pairs):
+    edited = [dict(qa) for qa in pairs]
+    edited[3]['answer'] = 'Resposta alterada.'
+    edited[10]['question'] = 'treinamento carreira promoção'
+    del edited[20:30]
+    edited.extend(random_pairs(40, seed=10, offset=len(pairs)))
+    write_qa_file(qa_file, edited)
+
+    changes = manager.reload()
+    assert changes == {'added': 41, 'removed': 11, 'changed': 1, 'unchanged': len(edited) - 42}
+    fresh = RAGManager(qa_file=qa_file, fuzzy=False, cache_size=0)
+    try:
+        assert len(manager.qa_pairs) == len(fresh.qa_pairs) == len(edited)
+        for query in random_queries(100, seed=8):
+            expected = brute_force(query, edited, K)
+            assert_same_hits(manager.retrieve(query, K).hits, expected)
+            assert_same_hits(fresh.retrieve(query, K).hits, expected)
+            assert_same_hits(manager.retrieve(query, K, scorer='bm25').hits,
+                             fresh.retrieve(query, K, scorer='bm25').hits)
+            assert_same_hits(manager.retrieve(query, K, category='ti').hits, brute_force(query, edited, K, 'ti'))
+        assert manager.get_answer(edited[3]['question'])[0]['answer'] in {
+            qa['answer'] for qa in edited if qa['question'] == edited[3]['question']}
+    finally:
+        fresh.close()
+
+
+def test_reload_without_changes(manager, qa_file):
+    assert manager.reload() is None
+    with open(qa_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    write_qa_file(qa_file, data['qa_pairs'])
+    # Conteúdo igual (só o mtime mudou): nada a recarregar
+    assert manager.reload() is None
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+
+from tracing import Tracer
+
+
+def run_requests(tracer: Tracer, count: int) -> None:
+    for i in range(count):
+        with tracer.trace('request', index=i):
+            with tracer.span('score'):
+                pass
+    tracer.flush()
+
+
+def read_lines(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_trace_log_is_rotated_by_size(tmp_path):
+    path = str(tmp_path / 'traces.jsonl')
+    tracer = Tracer(trace_file=path, trace_max_bytes=2000, trace_backups=2)
+    run_requests(tracer, 200)
+
+    files = [path, f"{path}.1", f"{path}.2"]
+    assert all(os.path.getsize(name) <= 2000 for name in files)
+    assert not os.path.exists(f"{path}.3")
+    # Os arquivos mais recentes guardam as últimas requisições, em ordem e sem linhas cortadas
+    indexes = [entry['index'] for name in reversed(files) for entry in read_lines(name)]
+    assert indexes == list(range(200 - len(indexes), 200))
+    assert tracer.summary()['request']['count'] == 200
+
+
+def test_trace_log_without_backups_is_truncated(tmp_path):
+    path = str(tmp_path / 'traces.jsonl')
+    tracer = Tracer(trace_file=path, trace_max_bytes=1000, trace_backups=0)
+    run_requests(tracer, 100)
+    assert os.path.getsize(path) <= 1000
+    assert read_lines(path)[-1]['index'] == 99
+    assert os.listdir(tmp_path) == ['traces.jsonl']
+
+
+def test_concurrent_metric_writers_share_one_file(tmp_path):
+    path = str(tmp_path / 'nabu.prom')
+    # Dois tracers (ex.: app e query_service) gravando o mesmo arquivo de métricas
+    tracers = [Tracer(metrics_file=path), Tracer(metrics_file=path)]
+    for tracer in tracers:
+        run_requests(tracer, 3)
+
+    def write(tracer):
+        for _ in range(50):
+            tracer.write_metrics()
+
+    threads = [threading.Thread(target=write, args=(tracer,)) for tracer in tracers for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert os.listdir(tmp_path) == ['nabu.prom']
+    with open(path, 'r', encoding='utf-8') as f:
+        # Conteúdo completo de um dos escritores, nunca uma mistura ou um arquivo truncado
+        assert f.read() in {tracer.prometheus_text() for tracer in tracers}
+
+
+def test_traces_are_written_off_the_request_thread(tmp_path, monkeypatch):
+    tracer = Tracer(trace_file=str(tmp_path / 'traces.jsonl'))
+    threads = []
+    write_trace = tracer._write_trace
+    monkeypatch.setattr(tracer, '_write_trace', lambda trace: (threads.append(threading.current_thread()),
+                                                               write_trace(trace)))
+    run_requests(tracer, 5)
+    assert len(threads) == 5 and threading.current_thread() not in threads
+    tracer.close()
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(read_lines(tracer.trace_file)) == 5
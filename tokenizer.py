@@ -0,0 +1,85 @@
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+# Versão da normalização de texto; snapshots gerados com outra versão são descartados
+TOKENIZER_VERSION = 2
+
+# Termo da query fora do vocabulário: não tem postings, mas conta no tamanho da query
+UNKNOWN_TERM = -1
+
+# Palavras com mais de 3 caracteres (já sem acentos) que não ajudam a distinguir perguntas
+STOPWORDS = frozenset("""
+    aquela aquelas aquele aqueles aquilo ainda antes apenas assim cada como depois dela delas dele deles
+    desta deste disso disto dessa desse elas eles entao entre essa essas esse esses esta estao estar estas
+    este estes esteja estou isso isto mais mesma mesmo minha minhas muita muitas muito muitos nela nele
+    nossa nossas nosso nossos onde outra outras outro outros para pela pelas pelo pelos pode podem posso
+    pois porque qual quais qualquer quando quanta quantas quanto quantos sera serao seria seus sobre suas
+    tambem temos tenho toda todas todo todos voce voces
+""".split())
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_COMBINING_MARKS = re.compile(r'[\u0300-\u036f]')
+MIN_TERM_LENGTH = 4
+
+
+def fold_accents(text: str) -> str:
+    if text.isascii():
+        return text
+    return _COMBINING_MARKS.sub('', unicodedata.normalize('NFD', text))
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_token(token: str) -> Optional[str]:
+    """
+    Token (em minúsculas e sem pontuação) -> termo do índice, ou None se for
+    descartado. Memoizado: o vocabulário real é pequeno e se repete muito.
+    """
+    if len(token) < MIN_TERM_LENGTH:
+        return None
+    term = fold_accents(token)
+    if term in STOPWORDS:
+        return None
+    # Termos internados: o vocabulário, o cache e as queries compartilham a mesma string
+    return sys.intern(term)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normaliza o texto nos termos do índice: minúsculas, sem pontuação, sem acentos,
+    sem stopwords e com mais de 3 caracteres.
+    """
+    return [term for term in map(normalize_token, _PUNCTUATION.sub('', text.lower()).split()) if term is not None]
+
+
+def encode(text: str, vocabulary: Dict[str, int], add_term: Optional[Callable[[str], int]] = None,
+           correct: Optional[Callable[[str], Optional[int]]] = None) -> Dict[int, int]:
+    """
+    Converte o texto em frequências por ID de termo.
+
+    Args:
+        text (str): Texto a ser codificado
+        vocabulary (Dict[str, int]): Vocabulário do índice (termo -> ID)
+        add_term (Optional[Callable[[str], int]]): Registra termos novos (indexação);
+            sem ele, termos desconhecidos são contados como UNKNOWN_TERM (queries)
+        correct (Optional[Callable[[str], Optional[int]]]): Nas queries, ID do termo do
+            vocabulário que corrige um termo desconhecido (ver FuzzyTermIndex), ou None
+
+    Returns:
+        Dict[int, int]: ID do termo -> frequência
+    """
+    counts: Dict[int, int] = {}
+    get = vocabulary.get
+    for term in tokenize(text):
+        term_id = get(term)
+        if term_id is None:
+            if add_term is not None:
+                term_id = add_term(term)
+            else:
+                term_id = correct(term) if correct is not None else None
+                if term_id is None:
+                    term_id = UNKNOWN_TERM
+        counts[term_id] = counts.get(term_id, 0) + 1
+    return counts
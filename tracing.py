@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import queue
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Sequence
+from lexical_index import atomic_write
+
+# Limites (em segundos) dos buckets exportados para o Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Trace da requisição em andamento na thread/tarefa atual
+_current_trace: ContextVar[Optional[Dict[str, Any]]] = ContextVar('nabu_trace', default=None)
+
+
+class LatencyHistogram:
+    """
+    Latências de uma etapa: janela deslizante das últimas amostras (para p50/p95/p99
+    recentes) e contadores cumulativos por bucket (para o Prometheus).
+    """
+
+    def __init__(self, window: int = 2048):
+        self.samples: deque = deque(maxlen=window)
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.bucket_counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in quantiles}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+
+class _Span:
+    # Gerenciador de contexto sem gerador: span() fica no caminho quente das consultas
+    __slots__ = ('tracer', 'stage', 'start')
+
+    def __init__(self, tracer: 'Tracer', stage: str):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.tracer.record(self.stage, time.perf_counter() - self.start)
+
+
+class Tracer:
+    """
+    Instrumentação leve das etapas de uma requisição (normalize, score, rank, llm, render).
+
+    span(etapa) mede um trecho e alimenta o histograma da etapa. Dentro de
+    trace(nome), as etapas também são acumuladas no trace da requisição, que ao
+    final é gravado como uma linha do log JSONL (trace_file). Quando o log passa de
+    trace_max_bytes, ele é rotacionado para trace_file.1 ... trace_file.<trace_backups>
+    (o mais antigo é descartado). As métricas podem ser exportadas no formato texto
+    do Prometheus (prometheus_text / metrics_file).
+
+    A gravação dos arquivos (trace e métricas) fica em uma thread própria: o fim de
+    um trace só enfileira a linha, sem E/S no caminho da requisição (nem no loop de
+    eventos do query_service). flush() espera a fila esvaziar.
+    """
+
+    def __init__(self, window: int = 2048, trace_file: Optional[str] = None,
+                 metrics_file: Optional[str] = None, metrics_interval: float = 10.0,
+                 trace_max_bytes: int = 10 * 1024 * 1024, trace_backups: int = 3):
+        self.window = window
+        self.trace_file = trace_file
+        self.trace_max_bytes = trace_max_bytes
+        self.trace_backups = trace_backups
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._metrics_written_at = 0.0
+        self._pending: 'queue.Queue[Optional[Dict[str, Any]]]' = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram(self.window)
+            histogram.observe(seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            spans = trace['spans']
+            spans[stage] = spans.get(stage, 0.0) + seconds
+
+    def span(self, stage: str) -> '_Span':
+        return _Span(self, stage)
+
+    @staticmethod
+    def current_trace() -> Optional[Dict[str, Any]]:
+        # Trace da requisição em andamento no contexto atual (None fora de trace())
+        return _current_trace.get()
+
+    @contextmanager
+    def shared_spans(self, traces: Sequence[Optional[Dict[str, Any]]]) -> Iterator[None]:
+        """
+        Etapas de um trabalho feito por várias requisições de uma vez (ex.: um lote do
+        MicroBatcher): entram uma vez nos histogramas e, ao final do bloco, em cada um
+        dos traces. Para medir em outra thread, rode o trabalho com
+        contextvars.copy_context() criado dentro do bloco.
+        """
+        collected = {'spans': {}}
+        token = _current_trace.set(collected)
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+            for trace in traces:
+                if trace is not None:
+                    spans = trace['spans']
+                    for stage, seconds in collected['spans'].items():
+                        spans[stage] = spans.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Agrupa as etapas de uma requisição. O dicionário retornado aceita atributos
+        extras em trace['attributes'].
+        """
+        trace = {'name': name, 'timestamp': time.time(), 'spans': {}, 'attributes': attributes}
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            total = time.perf_counter() - start
+            _current_trace.reset(token)
+            self.record(name, total)
+            trace['total'] = total
+            if self.trace_file or self.metrics_file:
+                self._enqueue(trace)
+
+    def _enqueue(self, trace: Dict[str, Any]) -> None:
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_pending, name='nabu-tracer', daemon=True)
+                    self._writer.start()
+        self._pending.put(trace)
+
+    def _write_pending(self) -> None:
+        while True:
+            trace = self._pending.get()
+            try:
+                if trace is None:
+                    return
+                self._write_trace(trace)
+                self._maybe_write_metrics()
+            finally:
+                self._pending.task_done()
+
+    def flush(self) -> None:
+        """
+        Espera a gravação dos traces já encerrados.
+        """
+        if self._writer is not None:
+            self._pending.join()
+
+    def close(self) -> None:
+        # Grava o que está na fila e encerra a thread de gravação
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._pending.put(None)
+            writer.join()
+
+    def _write_trace(self, trace: Dict[str, Any]) -> None:
+        if not self.trace_file:
+            return
+        line = json.dumps({
+            'timestamp': trace['timestamp'],
+            'trace': trace['name'],
+            'total_ms': round(trace['total'] * 1000, 3),
+            'spans_ms': {stage: round(seconds * 1000, 3) for stage, seconds in trace['spans'].items()},
+            **trace['attributes'],
+        }, ensure_ascii=False, default=str)
+        data = (line + '\n').encode('utf-8')
+        try:
+            with self._file_lock:
+                if self.trace_max_bytes and os.path.exists(self.trace_file) and \
+                        os.path.getsize(self.trace_file) + len(data) > self.trace_max_bytes:
+                    self._rotate_traces()
+                with open(self.trace_file, 'ab') as f:
+                    f.write(data)
+        except OSError:
+            pass
+
+    def _rotate_traces(self) -> None:
+        # trace_file -> trace_file.1 -> ... -> trace_file.<trace_backups> (chamado com _file_lock)
+        if self.trace_backups <= 0:
+            os.remove(self.trace_file)
+            return
+        for i in range(self.trace_backups - 1, 0, -1):
+            source = f"{self.trace_file}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.trace_file}.{i + 1}")
+        os.replace(self.trace_file, f"{self.trace_file}.1")
+
+    def _maybe_write_metrics(self) -> None:
+        now = time.monotonic()
+        if self.metrics_file and now - self._metrics_written_at >= self.metrics_interval:
+            self._metrics_written_at = now
+            self.write_metrics()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns:
+            Dict[str, Dict[str, float]]: etapa -> count, p50, p95 e p99 (em segundos) da janela recente
+        """
+        with self._lock:
+            histograms = {stage: (histogram.count, histogram.percentiles())
+                          for stage, histogram in self._histograms.items()}
+        return {
+            stage: {'count': count, 'p50': quantiles[0.5], 'p95': quantiles[0.95], 'p99': quantiles[0.99]}
+            for stage, (count, quantiles) in histograms.items()
+        }
+
+    def prometheus_text(self) -> str:
+        lines = [
+            '# HELP nabu_stage_latency_seconds Latência por etapa do processamento das perguntas.',
+            '# TYPE nabu_stage_latency_seconds histogram',
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float('inf'),), histogram.bucket_counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'nabu_stage_latency_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'nabu_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'nabu_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self, path: Optional[str] = None) -> None:
+        """
+        Grava as métricas no formato texto do Prometheus (ex.: para o textfile collector
+        do node_exporter), substituindo o arquivo de forma atômica.
+        """
+        path = path or self.metrics_file
+        if not path:
+            return
+        text = self.prometheus_text()
+        try:
+            with atomic_write(path) as f:
+                f.write(text)
+        except OSError:
+            pass